@@ -0,0 +1,191 @@
+"""Substitutos em processo do Reddit, do Redis e do Elasticsearch para os benchmarks offline."""
+from elastic_transport import ApiResponseMeta, HttpHeaders, ObjectApiResponse
+from typing import Dict, List
+import asyncio
+import random
+
+import fakeredis
+import httpx
+
+# Assuntos dos títulos gerados: cada termo casa com uma fração dos posts, como em uma busca real
+TOPICS = ["python", "asyncio", "redis", "elasticsearch", "fastapi", "docker", "httpx", "pydantic"]
+
+class FakeReddit:
+    """
+    API de listagens do Reddit simulada (httpx.MockTransport), com latência e 429 configuráveis.
+
+    Cada listagem tem `posts_per_listing` posts determinísticos; uma fração `rate_limited` das
+    respostas é um 429 com reset imediato, como um pico de limite do Reddit.
+    """
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, rate_limited: float = 0.0,
+                 posts_per_listing: int = 100, seed: int = 42):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limited = rate_limited
+        self.posts_per_listing = posts_per_listing
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.throttled = 0
+
+    def listing(self, subreddit: str) -> Dict:
+        children = [
+            {
+                "data": {
+                    "name": f"t3_{subreddit}_{n}",
+                    "subreddit": subreddit,
+                    "title": f"Post {n} de {subreddit} sobre {TOPICS[n % len(TOPICS)]}",
+                    "author": f"autor_{n % 17}",
+                    "url": f"https://www.reddit.com/r/{subreddit}/comments/{n}/",
+                    "created_utc": 1700000000 + n,
+                    "score": (n * 37) % 1000
+                }
+            }
+            for n in range(self.posts_per_listing)
+        ]
+        return {"data": {"children": children, "after": None}}
+
+    async def handler(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+        headers = {"X-Ratelimit-Remaining": "1000", "X-Ratelimit-Reset": "60"}
+        if self.random.random() < self.rate_limited:
+            self.throttled += 1
+            return httpx.Response(429, headers={"X-Ratelimit-Remaining": "0", "X-Ratelimit-Reset": "0"})
+        subreddit = request.url.path.split("/")[2]
+        if request.url.path.endswith("/about"):
+            return httpx.Response(200, json={"data": {"display_name": subreddit}}, headers=headers)
+        return httpx.Response(200, json=self.listing(subreddit), headers=headers)
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler))
+
+class StubElasticsearch:
+    """
+    Elasticsearch em memória: recebe os lotes do PostIndexer e responde buscas por termo no título.
+
+    Suporta o suficiente de `search` para a rota (size, ordenação por score/created_utc e search_after).
+    Os termos ficam em um índice invertido e os resultados ordenados são memorizados até a próxima
+    gravação, para que o custo do stub não domine a medição da API.
+    """
+    def __init__(self, latency: float = 0.005):
+        self.latency = latency
+        self.documents: Dict[str, Dict] = {}
+        self.terms: Dict[str, set] = {}
+        self._sorted: Dict = {}
+
+    def bulk_index_posts(self, posts: List[Dict]) -> Dict:
+        for post in posts:
+            self.documents[post["id"]] = post
+            for term in post["title"].lower().split():
+                self.terms.setdefault(term, set()).add(post["id"])
+        self._sorted.clear()
+        return {"items": [{"index": {"_id": post["id"]}} for post in posts]}
+
+    def _matches(self, term: str, sort_field: str) -> List[Dict]:
+        cached = self._sorted.get((term, sort_field))
+        if cached is None:
+            key = (lambda post: post["score"]) if sort_field == "_score" else (lambda post: post[sort_field])
+            posts = [self.documents[post_id] for post_id in self.terms.get(term, ())]
+            posts.sort(key=lambda post: (-key(post), post["id"]))
+            cached = self._sorted[(term, sort_field)] = [{"_source": post, "sort": [key(post), post["id"]]} for post in posts]
+        return cached
+
+    async def search(self, **search) -> ObjectApiResponse:
+        await asyncio.sleep(self.latency)
+        must = search["query"]["bool"]["must"][0]
+        term = must.get("multi_match", {}).get("query", "").lower()
+        hits = self._matches(term, next(iter(search["sort"][0])))
+        if "search_after" in search:
+            cursor = search["search_after"]
+            hits = [hit for hit in hits if (-hit["sort"][0], hit["sort"][1]) > (-cursor[0], cursor[1])]
+        hits = hits[:search["size"]]
+        meta = ApiResponseMeta(status=200, http_version="1.1", headers=HttpHeaders(), duration=0.0, node=None)
+        return ObjectApiResponse(body={"hits": {"hits": hits}} if hits else {}, meta=meta)
+
+    async def close(self) -> None:
+        pass
+
+def fake_redis() -> fakeredis.FakeAsyncRedis:
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+def raw_listing(subreddit: str = "python", posts: int = 100, seed: int = 7) -> Dict:
+    """
+    Listagem no formato completo da API (`raw_json=1`): os ~100 campos de cada post, com selftext/HTML
+    nos posts de texto, preview com resoluções nas imagens e reddit_video nos vídeos.
+
+    Gera o fixture do benchmark do parser; o conteúdo é sintético, só o formato segue o do Reddit.
+    """
+    rng = random.Random(seed)
+    words = "python async redis api cache latency memory parser stream json event loop worker queue index search".split()
+
+    def text(count: int) -> str:
+        return " ".join(rng.choice(words) for _ in range(count))
+
+    children = []
+    for n in range(posts):
+        kind = ("self", "image", "video")[n % 3]
+        post_id = f"{rng.getrandbits(40):x}"
+        resolutions = [
+            {
+                "url": f"https://preview.redd.it/{post_id}.jpg?width={width}&crop=smart&auto=webp&s={rng.getrandbits(160):040x}",
+                "width": width,
+                "height": width * 3 // 4
+            }
+            for width in (108, 216, 320, 640, 960, 1080)
+        ]
+        selftext = text(250) if kind == "self" else ""
+        data = {
+            "approved_at_utc": None, "subreddit": subreddit, "selftext": selftext,
+            "author_fullname": f"t2_{rng.getrandbits(32):x}", "saved": False, "mod_reason_title": None, "gilded": 0,
+            "clicked": False, "title": text(12), "link_flair_richtext": [{"e": "text", "t": "Discussion"}],
+            "subreddit_name_prefixed": f"r/{subreddit}", "hidden": False, "pwls": 6, "link_flair_css_class": "discussion",
+            "downs": 0, "thumbnail_height": 105 if kind == "image" else None, "top_awarded_type": None, "hide_score": False,
+            "name": f"t3_{post_id}", "quarantine": False, "link_flair_text_color": "light",
+            "upvote_ratio": round(rng.random(), 2), "author_flair_background_color": None, "subreddit_type": "public",
+            "ups": rng.randint(0, 5000), "total_awards_received": 0, "media_embed": {},
+            "thumbnail_width": 140 if kind == "image" else None, "author_flair_template_id": None,
+            "is_original_content": False, "user_reports": [], "secure_media": None,
+            "is_reddit_media_domain": kind == "image", "is_meta": False, "category": None, "secure_media_embed": {},
+            "link_flair_text": "Discussion", "can_mod_post": False, "score": rng.randint(0, 5000), "approved_by": None,
+            "is_created_from_ads_ui": False, "author_premium": False,
+            "thumbnail": "self" if kind == "self" else f"https://b.thumbs.redditmedia.com/{post_id}.jpg",
+            "edited": False, "author_flair_css_class": None, "author_flair_richtext": [], "gildings": {},
+            "post_hint": "image" if kind == "image" else "link", "content_categories": None, "is_self": kind == "self",
+            "mod_note": None, "created": 1700000000.0 + n, "link_flair_type": "richtext", "wls": 6,
+            "removed_by_category": None, "banned_by": None, "author_flair_type": "text",
+            "domain": f"self.{subreddit}" if kind == "self" else "i.redd.it", "allow_live_comments": False,
+            "selftext_html": f"&lt;!-- SC_OFF --&gt;&lt;div class=\"md\"&gt;&lt;p&gt;{selftext}&lt;/p&gt;&lt;/div&gt;&lt;!-- SC_ON --&gt;" if selftext else None,
+            "likes": None, "suggested_sort": None, "banned_at_utc": None, "view_count": None, "archived": False,
+            "no_follow": False, "is_crosspostable": True, "pinned": False, "over_18": False,
+            "preview": {
+                "images": [{"source": {"url": resolutions[-1]["url"], "width": 1200, "height": 900}, "resolutions": resolutions, "variants": {}, "id": post_id}],
+                "enabled": True
+            } if kind != "self" else None,
+            "all_awardings": [], "awarders": [], "media_only": False,
+            "link_flair_template_id": f"{rng.getrandbits(128):032x}", "can_gild": False, "spoiler": False,
+            "locked": False, "author_flair_text": None, "treatment_tags": [], "visited": False, "removed_by": None,
+            "num_reports": None, "distinguished": None, "subreddit_id": "t5_2qh0y", "author_is_blocked": False,
+            "mod_reason_by": None, "num_crossposts": 0, "removal_reason": None, "link_flair_background_color": "#ffd635",
+            "id": post_id, "is_robot_indexable": True, "report_reasons": None, "author": f"user_{rng.getrandbits(24):x}",
+            "discussion_type": None, "num_comments": rng.randint(0, 800), "send_replies": True, "contest_mode": False,
+            "mod_reports": [], "author_patreon_flair": False, "author_flair_text_color": None,
+            "permalink": f"/r/{subreddit}/comments/{post_id}/{'_'.join(text(6).split())}/", "stickied": False,
+            "url": f"https://www.reddit.com/r/{subreddit}/comments/{post_id}/" if kind == "self" else f"https://i.redd.it/{post_id}.jpeg",
+            "subreddit_subscribers": 1300000, "created_utc": 1700000000.0 + n, "num_duplicates": 0,
+            "media": {
+                "reddit_video": {
+                    "bitrate_kbps": 2400, "fallback_url": f"https://v.redd.it/{post_id}/DASH_720.mp4", "height": 720,
+                    "width": 1280, "scrubber_media_url": f"https://v.redd.it/{post_id}/DASH_96.mp4",
+                    "dash_url": f"https://v.redd.it/{post_id}/DASHPlaylist.mpd", "duration": 30,
+                    "hls_url": f"https://v.redd.it/{post_id}/HLSPlaylist.m3u8", "is_gif": False,
+                    "transcoding_status": "completed"
+                }
+            } if kind == "video" else None,
+            "is_video": kind == "video"
+        }
+        children.append({"kind": "t3", "data": data})
+    return {
+        "kind": "Listing",
+        "data": {"after": children[-1]["data"]["name"] if children else None, "dist": posts, "modhash": "",
+                 "geo_filter": None, "children": children, "before": None}
+    }
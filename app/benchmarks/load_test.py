@@ -0,0 +1,181 @@
+"""
+Benchmark de carga offline da API: Reddit simulado (latência e 429), fakeredis e Elasticsearch em memória.
+
+Mede vazão e latência (p50/p95/p99) de GET /posts/{subreddit} (hit e miss) e de GET /search/posts
+(com e sem o cache de resultados) e compara com o baseline gravado em benchmarks/baseline.json.
+Os números absolutos dependem da máquina: compare execuções no mesmo ambiente.
+
+Uso, a partir de app/:
+    python -m benchmarks.load_test [--requests 500] [--concurrency 20] [--save-baseline]
+"""
+from unittest.mock import patch
+from typing import Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import platform
+import time
+
+import httpx
+
+from benchmarks.fakes import FakeReddit, StubElasticsearch, fake_redis
+from cache.cache_handler import CacheHandler
+from services.elasticsearch_service import ElasticsearchService
+from services.http_client import RedditHttpClient
+from services.indexing_service import PostIndexer
+from services.rate_limit_governor import RateLimitGovernor, set_governor
+from main import app
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+# Variação (fração) a partir da qual uma métrica é marcada como regressão na comparação
+REGRESSION_THRESHOLD = 0.2
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentil pelo método nearest-rank."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    path_for: Callable[[int], str],
+    requests: int,
+    concurrency: int,
+    headers: Optional[Dict[str, str]] = None
+) -> Dict:
+    """Dispara `requests` requisições com `concurrency` clientes simultâneos e resume vazão e latências."""
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def worker():
+        nonlocal next_index, errors
+        while next_index < requests:
+            index = next_index
+            next_index += 1
+            start = time.perf_counter()
+            response = await client.get(path_for(index), headers=headers)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2)
+    }
+
+async def run_suite(
+    requests: int = 500,
+    concurrency: int = 20,
+    reddit_latency: float = 0.05,
+    rate_limited: float = 0.02
+) -> Dict:
+    root_level = logging.getLogger().level
+    logging.getLogger().setLevel(logging.WARNING)
+    reddit = FakeReddit(latency=reddit_latency, rate_limited=rate_limited)
+    es = StubElasticsearch()
+    CacheHandler.set_client(fake_redis())
+    RedditHttpClient.set_client(reddit.client())
+    set_governor(RateLimitGovernor(["benchmark"], capacity=1_000_000, window=60, max_wait=1))
+    ElasticsearchService.set_async_client(es)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    with patch.object(ElasticsearchService, "bulk_index_posts", es.bulk_index_posts):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=30) as client:
+            await client.get("/posts/python?limit=25")
+            results["posts_hit"] = await run_scenario(
+                client, lambda i: "/posts/python?limit=25", requests, concurrency, {"Accept-Encoding": "gzip"}
+            )
+            results["posts_miss"] = await run_scenario(
+                client, lambda i: f"/posts/bench{i}?limit=25", requests, concurrency, {"Accept-Encoding": "gzip"}
+            )
+            # Grava no Elasticsearch em memória os posts buscados antes de medir a busca
+            await PostIndexer.shutdown()
+
+            terms = ["python", "redis", "fastapi", "bench1", "docker"]
+            results["search_cached"] = await run_scenario(
+                client, lambda i: f"/search/posts?field=title&query={terms[i % len(terms)]}&size=20", requests, concurrency
+            )
+            results["search_uncached"] = await run_scenario(
+                client, lambda i: f"/search/posts?field=title&query={terms[i % len(terms)]}&size=20&sort=score",
+                requests, concurrency, {"X-Cache-Bypass": "1"}
+            )
+
+    await PostIndexer.shutdown()
+    await RedditHttpClient.shutdown()
+    ElasticsearchService.set_async_client(None)
+    set_governor(None)
+    CacheHandler.set_client(None)
+    logging.getLogger().setLevel(root_level)
+    return {
+        "config": {
+            "requests": requests,
+            "concurrency": concurrency,
+            "reddit_latency_s": reddit_latency,
+            "rate_limited": rate_limited,
+            "python": platform.python_version()
+        },
+        "scenarios": results
+    }
+
+def compare(current: Dict, baseline: Dict) -> List[str]:
+    """Linhas de comparação com o baseline; variações piores que REGRESSION_THRESHOLD são marcadas."""
+    lines = []
+    for scenario, metrics in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        for metric in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+            if not previous.get(metric):
+                continue
+            change = (metrics[metric] - previous[metric]) / previous[metric]
+            worse = -change if metric == "throughput_rps" else change
+            flag = "  <-- regressão" if worse > REGRESSION_THRESHOLD else ""
+            lines.append(f"{scenario:<16} {metric:<15} {previous[metric]:>10} -> {metrics[metric]:>10} ({change:+.0%}){flag}")
+    return lines
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--reddit-latency", type=float, default=0.05, help="Latência do Reddit simulado (s).")
+    parser.add_argument("--rate-limited", type=float, default=0.02, help="Fração de respostas 429 do Reddit simulado.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Grava o resultado como novo baseline.")
+    args = parser.parse_args()
+
+    current = asyncio.run(run_suite(args.requests, args.concurrency, args.reddit_latency, args.rate_limited))
+
+    print(f"{'cenário':<16} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>7}")
+    for scenario, metrics in current["scenarios"].items():
+        print(
+            f"{scenario:<16} {metrics['throughput_rps']:>9} {metrics['p50_ms']:>9} "
+            f"{metrics['p95_ms']:>9} {metrics['p99_ms']:>9} {metrics['errors']:>7}"
+        )
+
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config", {}).get("requests") != args.requests or baseline.get("config", {}).get("concurrency") != args.concurrency:
+            print("\nAviso: baseline gravado com outra configuração de carga.")
+        print("\nComparação com o baseline:")
+        print("\n".join(compare(current, baseline)))
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+        print(f"\nBaseline gravado em {args.baseline}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+CPU e pico de memória para decodificar uma listagem de 100 posts do Reddit (`raw_json=1`): `response.json()`
+com a extração dos campos (caminho antigo) contra o decoder enxuto de `services.reddit_parser`.
+
+Roda offline sobre o fixture `benchmarks/fixtures/reddit_listing_100.json.gz`:
+`python -m benchmarks.parser_bench [repetições]` a partir de app/. Com `--record` o fixture é gerado de novo.
+"""
+from services.reddit_parser import parse_listing
+from benchmarks.fakes import raw_listing
+from typing import Callable, Dict, List, Tuple
+import argparse
+import tracemalloc
+import pathlib
+import gzip
+import json
+import time
+
+import httpx
+
+FIXTURE = pathlib.Path(__file__).parent / "fixtures" / "reddit_listing_100.json.gz"
+
+def load_fixture() -> bytes:
+    return gzip.decompress(FIXTURE.read_bytes())
+
+def record_fixture() -> None:
+    FIXTURE.parent.mkdir(exist_ok=True)
+    FIXTURE.write_bytes(gzip.compress(json.dumps(raw_listing()).encode(), mtime=0))
+
+def parse_full_tree(body: bytes) -> List[Dict]:
+    """O caminho anterior do RedditService.fetch_page: árvore JSON completa e depois os campos usados."""
+    data = httpx.Response(200, content=body).json()
+    formatted_posts = []
+    for child in data['data']['children']:
+        post_data = child['data']
+        formatted_posts.append({
+            "id": post_data.get('name') or f"t3_{post_data.get('id', '')}",
+            "subreddit": post_data.get('subreddit') or "python",
+            "title": post_data.get('title', ''),
+            "author": post_data.get('author', ''),
+            "url": post_data.get('url', ''),
+            "created_utc": int(post_data.get('created_utc', 0)),
+            "score": post_data.get('score', 0)
+        })
+    return formatted_posts
+
+def parse_records(body: bytes):
+    return parse_listing(body).posts
+
+def parse_lean(body: bytes) -> List[Dict]:
+    return [record.to_post("python") for record in parse_listing(body).posts]
+
+def measure(parse: Callable[[bytes], object], body: bytes, repetitions: int) -> Tuple[float, float]:
+    """Tempo de CPU (µs) por listagem e pico de memória alocada (KiB) durante uma decodificação."""
+    parse(body)
+    start = time.process_time()
+    for _ in range(repetitions):
+        parse(body)
+    cpu_us = (time.process_time() - start) / repetitions * 1_000_000
+    tracemalloc.start()
+    result = parse(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+    return cpu_us, peak / 1024
+
+def run(repetitions: int) -> Dict[str, Tuple[float, float]]:
+    body = load_fixture()
+    scenarios = [
+        ("antes: response.json() + extração", parse_full_tree),
+        ("depois: decoder enxuto (registros)", parse_records),
+        ("depois: registros -> dicts do Post", parse_lean),
+    ]
+    return {name: measure(parse, body, repetitions) for name, parse in scenarios}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("repetitions", nargs="?", type=int, default=200)
+    parser.add_argument("--record", action="store_true", help="Gera o fixture de novo antes de medir")
+    args = parser.parse_args()
+    if args.record:
+        record_fixture()
+
+    print(f"Fixture: {len(load_fixture()) / 1024:.0f} KiB, 100 posts")
+    results = run(args.repetitions)
+    baseline_cpu, baseline_peak = next(iter(results.values()))
+    print(f"{'cenário':<38} {'µs CPU':>10} {'pico KiB':>10} {'CPU':>7} {'memória':>8}")
+    for name, (cpu_us, peak) in results.items():
+        print(f"{name:<38} {cpu_us:>10.0f} {peak:>10.0f} {cpu_us / baseline_cpu:>6.0%} {peak / baseline_peak:>8.0%}")
+
+if __name__ == "__main__":
+    main()
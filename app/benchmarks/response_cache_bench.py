@@ -0,0 +1,71 @@
+"""
+CPU por hit em GET /posts/{subreddit}: listagem decodificada + validação do modelo + serialização
+(caminho antigo) contra o corpo pronto do ResponseCache, com e sem o L1 do processo.
+
+Roda offline (fakeredis, sem Reddit): `python -m benchmarks.response_cache_bench [requisições]` a partir de app/.
+"""
+from unittest.mock import patch
+import asyncio
+import logging
+import time
+import sys
+
+import fakeredis
+import httpx
+
+from cache import cache_handler, response_cache
+from cache.cache_handler import CacheHandler
+from services.listing_service import ListingService
+from main import app
+
+LISTING = [
+    {
+        "id": f"t3_{n}",
+        "subreddit": "python",
+        "title": f"Post número {n} sobre desempenho de APIs assíncronas em Python",
+        "author": f"autor_{n}",
+        "url": f"https://www.reddit.com/r/python/comments/{n}/post_{n}/",
+        "created_utc": 1700000000 + n,
+        "score": n * 7
+    }
+    for n in range(100)
+]
+
+async def measure(client: httpx.AsyncClient, requests: int, accept_encoding: str, path: str = "/posts/python?limit=100") -> float:
+    """Tempo de CPU do processo (µs) por requisição com cache hit."""
+    headers = {"Accept-Encoding": accept_encoding}
+    await client.get(path, headers=headers)  # aquece o corpo pronto / L1
+    start = time.process_time()
+    for _ in range(requests):
+        response = await client.get(path, headers=headers)
+        assert response.status_code == 200
+    return (time.process_time() - start) / requests * 1_000_000
+
+async def main(requests: int) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    CacheHandler.set_client(fakeredis.FakeAsyncRedis(decode_responses=True))
+    await CacheHandler.set_cache(
+        ListingService.cache_key("python", "day", "hot"),
+        {"posts": LISTING, "after": None, "fetched_at": time.time()}
+    )
+
+    scenarios = [
+        ("antes: listagem + modelo + JSON", False, True, "gzip"),
+        ("antes, sem L1 (json.loads do Redis)", False, False, "gzip"),
+        ("depois: corpo pronto, gzip", True, True, "gzip"),
+        ("depois: corpo pronto, sem L1", True, False, "gzip"),
+        ("depois: corpo pronto, cliente sem gzip", True, True, "identity"),
+    ]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Custo fixo do cliente HTTP e do ASGI, descontado na coluna "rota"
+        fixed = await measure(client, requests, "gzip", path="/")
+        print(f"{'cenário':<42} {'µs CPU/hit':>12} {'rota':>10}")
+        for name, enabled, l1, accept_encoding in scenarios:
+            with patch.object(response_cache, "RESPONSE_CACHE_ENABLED", enabled), \
+                 patch.object(cache_handler, "CACHE_L1_ENABLED", l1):
+                total = await measure(client, requests, accept_encoding)
+                print(f"{name:<42} {total:>12.1f} {total - fixed:>10.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
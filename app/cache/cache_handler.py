@@ -1,22 +1,390 @@
-from typing import Any, Optional
-from time import time
-import redis
+from cache.local_cache import LocalCache
+from metrics.instrumentation import Metrics
+from typing import Any, Dict, List, Optional, Tuple
+from time import monotonic
+from redis.exceptions import RedisError
+from redis.backoff import NoBackoff
+from redis.asyncio.retry import Retry
+import redis.asyncio as redis
+import asyncio
+import logging
+import socket
+import uuid
 import json
+import os
 
-REDIS_HOST = "redis"
-REDIS_PORT = 6379
-REDIS_DB = 0
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 0.5))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 0.5))
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES", 1))
+# Tempo (segundos) em modo fallback, sem cache, antes de tentar o Redis novamente
+REDIS_RETRY_INTERVAL = float(os.getenv("REDIS_RETRY_INTERVAL", 5))
 
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB, decode_responses=True)
+# Cache L1 em memória de cada worker, na frente do Redis
+CACHE_L1_ENABLED = os.getenv("CACHE_L1_ENABLED", "true").lower() == "true"
+CACHE_L1_MAX_BYTES = int(os.getenv("CACHE_L1_MAX_BYTES", 32 * 1024 * 1024))
+CACHE_L1_TTL = float(os.getenv("CACHE_L1_TTL", 30))
+CACHE_INVALIDATION_CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache_invalidation")
+
+# Remove o lock apenas se ele ainda pertence a quem o adquiriu
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Renova o TTL do lock apenas se ele ainda pertence a quem o adquiriu
+EXTEND_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[redis.Redis] = None
+_binary_client: Optional[redis.Redis] = None
+_unavailable_until = 0.0
+_local_cache = LocalCache(max_bytes=CACHE_L1_MAX_BYTES, ttl=CACHE_L1_TTL)
+_redis_stats = {"hits": 0, "misses": 0}
+_invalidation_listener: Optional[asyncio.Task] = None
+_worker_id = (None, None)
+
+def worker_id() -> str:
+    """Identificador do processo atual (recalculado após fork), usado para ignorar as próprias invalidações."""
+    global _worker_id
+    if _worker_id[0] != os.getpid():
+        _worker_id = (os.getpid(), f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}")
+    return _worker_id[1]
 
 class CacheHandler:
+    """
+    Cache assíncrono sobre o Redis (redis.asyncio) com pool de conexões explícito.
+
+    Quando o Redis está inacessível, o handler entra em modo fallback por REDIS_RETRY_INTERVAL
+    segundos: leituras retornam None e escritas são ignoradas, sem propagar erros à API.
+
+    Na frente do Redis há um cache L1 por worker (LRU com TTL curto e limite de memória) que guarda
+    os valores já decodificados. Cada escrita publica a chave no canal CACHE_INVALIDATION_CHANNEL
+    para que os demais workers descartem sua cópia local.
+    """
+    @staticmethod
+    def get_client() -> redis.Redis:
+        global _client
+        if _client is None:
+            pool = redis.ConnectionPool(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+                retry=Retry(NoBackoff(), REDIS_RETRIES),
+                decode_responses=True
+            )
+            _client = redis.Redis(connection_pool=pool)
+        return _client
+
+    @staticmethod
+    def get_binary_client() -> redis.Redis:
+        """Cliente com as mesmas configurações do principal, mas sem decodificar respostas (valores binários)."""
+        global _binary_client
+        if _binary_client is None:
+            pool = CacheHandler.get_client().connection_pool
+            _binary_client = redis.Redis(connection_pool=pool.__class__(
+                connection_class=pool.connection_class,
+                max_connections=pool.max_connections,
+                **{**pool.connection_kwargs, "decode_responses": False}
+            ))
+        return _binary_client
+
+    @staticmethod
+    def set_client(client: Optional[redis.Redis]) -> None:
+        """Substitui o cliente Redis (usado em testes, ex: fakeredis)."""
+        global _client, _binary_client, _unavailable_until
+        _client = client
+        _binary_client = None
+        _unavailable_until = 0.0
+        _local_cache.clear()
+
+    @staticmethod
+    async def close() -> None:
+        global _client, _binary_client
+        for client in (_client, _binary_client):
+            if client is not None:
+                await client.aclose()
+        _client = None
+        _binary_client = None
+
+    @staticmethod
+    def is_available() -> bool:
+        return monotonic() >= _unavailable_until
+
+    @staticmethod
+    def _mark_unavailable(error: Exception) -> None:
+        global _unavailable_until
+        _unavailable_until = monotonic() + REDIS_RETRY_INTERVAL
+        logger.warning(f"Redis indisponível, operando sem cache por {REDIS_RETRY_INTERVAL}s: {error}")
+
+    @staticmethod
+    async def ping() -> bool:
+        try:
+            return bool(await CacheHandler.get_client().ping())
+        except (RedisError, OSError):
+            return False
+
+    @staticmethod
+    def _publish_invalidation(pipe, keys: List[str]) -> None:
+        for key in keys:
+            pipe.publish(CACHE_INVALIDATION_CHANNEL, json.dumps({"key": key, "origin": worker_id()}))
+
+    @staticmethod
+    async def set_cache(key: str, value: Any, ttl: int = 3600) -> None:
+        await CacheHandler.set_many({key: value}, ttl=ttl)
+
+    @staticmethod
+    async def get_cache(key: str) -> Optional[Any]:
+        return (await CacheHandler.get_many([key]))[0]
+
+    @staticmethod
+    async def get_many(keys: List[str], local: bool = True) -> List[Optional[Any]]:
+        """
+        Busca várias chaves: primeiro no L1 e, para as ausentes, com um único MGET no Redis.
+
+        Chaves ausentes retornam None na mesma posição. Com `local=False` o L1 é ignorado
+        (leitura e preenchimento), para valores que não podem ficar defasados, como contadores.
+        """
+        local = local and CACHE_L1_ENABLED
+        results: List[Optional[Any]] = [None] * len(keys)
+        missing = []
+        for position, key in enumerate(keys):
+            value = _local_cache.get(key) if local else None
+            if value is None:
+                missing.append(position)
+            else:
+                results[position] = value
+        if not missing or not CacheHandler.is_available():
+            return results
+
+        try:
+            with Metrics.stage("cache_get"):
+                values = await CacheHandler.get_client().mget([keys[position] for position in missing])
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+            return results
+
+        for position, raw_value in zip(missing, values):
+            if not raw_value:
+                _redis_stats["misses"] += 1
+                continue
+            _redis_stats["hits"] += 1
+            value = json.loads(raw_value)
+            results[position] = value
+            if local:
+                _local_cache.set(keys[position], value, size=len(raw_value))
+        return results
+
+    @staticmethod
+    async def set_many(items: Dict[str, Any], ttl: int = 3600, local: bool = True) -> None:
+        """
+        Grava várias chaves com o mesmo TTL (e publica suas invalidações) em um único pipeline.
+
+        Com `local=False` as chaves vão apenas para o Redis, sem cópia no L1 nem invalidação publicada.
+        """
+        if not items:
+            return
+        local = local and CACHE_L1_ENABLED
+        serialized = {key: json.dumps(value) for key, value in items.items()}
+        if local:
+            for key, value in items.items():
+                _local_cache.set(key, value, size=len(serialized[key]), ttl=min(ttl, CACHE_L1_TTL))
+        if not CacheHandler.is_available():
+            return
+        try:
+            with Metrics.stage("cache_set"):
+                async with CacheHandler.get_client().pipeline(transaction=False) as pipe:
+                    for key, raw_value in serialized.items():
+                        pipe.set(key, raw_value, ex=ttl)
+                    if local:
+                        CacheHandler._publish_invalidation(pipe, list(serialized))
+                    await pipe.execute()
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+
+    @staticmethod
+    async def get_bytes(key: str) -> Optional[bytes]:
+        """Lê um valor binário (sem JSON), primeiro no L1 e depois no Redis."""
+        value = _local_cache.get(key) if CACHE_L1_ENABLED else None
+        if value is not None or not CacheHandler.is_available():
+            return value
+        try:
+            with Metrics.stage("cache_get"):
+                value = await CacheHandler.get_binary_client().get(key)
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+            return None
+        if value is None:
+            _redis_stats["misses"] += 1
+            return None
+        _redis_stats["hits"] += 1
+        if CACHE_L1_ENABLED:
+            _local_cache.set(key, value, size=len(value))
+        return value
+
+    @staticmethod
+    async def set_bytes(key: str, value: bytes, ttl: float) -> None:
+        """
+        Grava um valor binário no L1 e no Redis.
+
+        Sem invalidação publicada: usado para valores que só expiram pelo TTL.
+        """
+        if CACHE_L1_ENABLED:
+            _local_cache.set(key, value, size=len(value), ttl=min(ttl, CACHE_L1_TTL))
+        if not CacheHandler.is_available():
+            return
+        try:
+            with Metrics.stage("cache_set"):
+                await CacheHandler.get_binary_client().set(key, value, px=max(int(ttl * 1000), 1))
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+
+    @staticmethod
+    async def incr(key: str) -> Optional[int]:
+        """Incrementa um contador no Redis (sem L1) e retorna o novo valor, ou None em modo fallback."""
+        if not CacheHandler.is_available():
+            return None
+        try:
+            return await CacheHandler.get_client().incr(key)
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+            return None
+
+    @staticmethod
+    async def incr_scores(key: str, increments: Dict[str, float], max_members: int) -> None:
+        """
+        Soma os incrementos aos membros de um sorted set, mantendo apenas os `max_members` de maior score.
+        """
+        if not increments or not CacheHandler.is_available():
+            return
+        try:
+            async with CacheHandler.get_client().pipeline(transaction=False) as pipe:
+                for member, amount in increments.items():
+                    pipe.zincrby(key, amount, member)
+                pipe.zremrangebyrank(key, 0, -(max_members + 1))
+                await pipe.execute()
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+
+    @staticmethod
+    async def top_scores(key: str, count: int) -> List[Tuple[str, float]]:
+        """Retorna os `count` membros de maior score do sorted set (lista vazia em modo fallback)."""
+        if not CacheHandler.is_available():
+            return []
+        try:
+            return await CacheHandler.get_client().zrevrange(key, 0, count - 1, withscores=True)
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+            return []
+
+    @staticmethod
+    async def decay_scores(key: str, factor: float) -> None:
+        """Multiplica todos os scores do sorted set por `factor` (ZUNIONSTORE do set sobre ele mesmo)."""
+        if not CacheHandler.is_available():
+            return
+        try:
+            await CacheHandler.get_client().zunionstore(key, {key: factor})
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+
+    @staticmethod
+    def invalidate_local(key: str) -> None:
+        _local_cache.delete(key)
+
+    @staticmethod
+    async def _listen_invalidations() -> None:
+        backoff = 0.5
+        while True:
+            try:
+                pubsub = CacheHandler.get_client().pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(CACHE_INVALIDATION_CHANNEL)
+                backoff = 0.5
+                try:
+                    async for message in pubsub.listen():
+                        data = json.loads(message["data"])
+                        if data.get("origin") != worker_id():
+                            _local_cache.delete(data["key"])
+                finally:
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Sem o canal, outra escrita pode não chegar aqui: descarta o L1 inteiro por segurança
+                _local_cache.clear()
+                logger.warning(f"Canal de invalidação do cache indisponível, tentando novamente em {backoff}s: {e}")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    @staticmethod
+    async def start_invalidation_listener() -> None:
+        global _invalidation_listener
+        if CACHE_L1_ENABLED and (_invalidation_listener is None or _invalidation_listener.done()):
+            _invalidation_listener = asyncio.ensure_future(CacheHandler._listen_invalidations())
+
+    @staticmethod
+    async def stop_invalidation_listener() -> None:
+        global _invalidation_listener
+        if _invalidation_listener is not None:
+            _invalidation_listener.cancel()
+            try:
+                await _invalidation_listener
+            except (asyncio.CancelledError, Exception):
+                pass
+            _invalidation_listener = None
+
+    @staticmethod
+    def stats() -> Dict:
+        """Contadores de hit/miss por camada (L1 em memória e Redis)."""
+        return {"l1": _local_cache.stats(), "redis": dict(_redis_stats)}
+
+    @staticmethod
+    async def acquire_lock(key: str, ttl_ms: int) -> Optional[str]:
+        """
+        Tenta adquirir um lock curto (SET NX PX) compartilhado entre workers.
+
+        Retorna o token do lock, ou None se outro processo já o detém. Em modo fallback
+        (Redis indisponível) o lock é considerado adquirido, já que não há coordenação possível.
+        """
+        token = uuid.uuid4().hex
+        if not CacheHandler.is_available():
+            return token
+        try:
+            acquired = await CacheHandler.get_client().set(key, token, nx=True, px=ttl_ms)
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+            return token
+        return token if acquired else None
+
     @staticmethod
-    def set_cache(key: str, value: Any, ttl: int = 3600) -> None:
-        redis_client.setex(key, ttl, json.dumps(value))
+    async def extend_lock(key: str, token: str, ttl_ms: int) -> bool:
+        """Renova o lock por mais ttl_ms; retorna False se ele expirou ou foi adquirido por outro processo."""
+        if not CacheHandler.is_available():
+            return True
+        try:
+            return bool(await CacheHandler.get_client().eval(EXTEND_LOCK_SCRIPT, 1, key, token, ttl_ms))
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+            return True
 
     @staticmethod
-    def get_cache(key: str) -> Optional[Any]:
-        cached_value = redis_client.get(key)
-        if cached_value:
-            return json.loads(cached_value)
-        return None
\ No newline at end of file
+    async def release_lock(key: str, token: str) -> None:
+        if not CacheHandler.is_available():
+            return
+        try:
+            await CacheHandler.get_client().eval(RELEASE_LOCK_SCRIPT, 1, key, token)
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
@@ -0,0 +1,138 @@
+from cache.cache_handler import CacheHandler
+from fastapi.responses import Response
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import orjson
+import gzip
+import os
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+# Corpos menores que isso são guardados sem compressão (o gzip não compensa)
+RESPONSE_GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", 1024))
+RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 5))
+# Cache-Control das respostas com ETag: com max-age=0 os clientes revalidam a cada consulta (If-None-Match → 304)
+RESPONSE_MAX_AGE = int(os.getenv("RESPONSE_MAX_AGE", 0))
+
+# Primeiro byte do valor guardado: formato do corpo que vem em seguida
+_GZIP = b"g"
+_RAW = b"r"
+# Prefixo opcional: 1 byte com o tamanho do ETag, o ETag e depois o valor no formato acima
+_ETAG = b"e"
+
+class ResponseCache:
+    """
+    Corpos de resposta prontos (JSON serializado com orjson e, acima de RESPONSE_GZIP_MIN_BYTES, comprimido
+    com gzip), guardados no L1 e no Redis.
+
+    Em um hit os bytes vão direto para a resposta, sem decodificar o JSON, validar o modelo e serializar
+    de novo. Clientes que não aceitam gzip recebem o corpo descomprimido.
+
+    O ETag do conteúdo é guardado junto com o corpo: um cliente que envia o mesmo valor em If-None-Match
+    recebe 304 sem corpo.
+    """
+    @staticmethod
+    def key(cache_key: str, variant: Any) -> str:
+        return f"body:{cache_key}:{variant}"
+
+    @staticmethod
+    def digest_etag(digests: List[str]) -> str:
+        """
+        ETag fraco a partir dos digests já calculados de cada item (ex: `PostIndexer.content_hash` de cada post).
+
+        Fraco porque corpos equivalentes podem diferir em bytes (gzip, `origin` e `cache_status`).
+        """
+        return f'W/"{hashlib.sha1("".join(digests).encode()).hexdigest()[:20]}"'
+
+    @staticmethod
+    def encode(payload: Dict, etag: Optional[str] = None) -> bytes:
+        body = orjson.dumps(payload)
+        if len(body) < RESPONSE_GZIP_MIN_BYTES:
+            encoded = _RAW + body
+        else:
+            encoded = _GZIP + gzip.compress(body, compresslevel=RESPONSE_GZIP_LEVEL, mtime=0)
+        if etag is None:
+            return encoded
+        raw_etag = etag.encode()
+        return _ETAG + bytes([len(raw_etag)]) + raw_etag + encoded
+
+    @staticmethod
+    def split_etag(stored: bytes) -> Tuple[Optional[str], bytes]:
+        """Separa o ETag (None em valores gravados sem ele) do corpo guardado."""
+        if stored[:1] != _ETAG:
+            return None, stored
+        end = 2 + stored[1]
+        return stored[2:end].decode(), stored[end:]
+
+    @staticmethod
+    async def get(cache_key: str, variant: Any) -> Optional[bytes]:
+        if not RESPONSE_CACHE_ENABLED:
+            return None
+        return await CacheHandler.get_bytes(ResponseCache.key(cache_key, variant))
+
+    @staticmethod
+    async def put(cache_key: str, variant: Any, payload: Dict, ttl: float, etag: Optional[str] = None) -> None:
+        """Guarda o corpo da resposta por `ttl` segundos (nada é gravado se o TTL já se esgotou)."""
+        if not RESPONSE_CACHE_ENABLED or ttl <= 0:
+            return
+        await CacheHandler.set_bytes(ResponseCache.key(cache_key, variant), ResponseCache.encode(payload, etag), ttl)
+
+    @staticmethod
+    def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+        for coding in (accept_encoding or "").lower().split(","):
+            name, *params = [part.strip() for part in coding.split(";")]
+            if name not in ("gzip", "*"):
+                continue
+            quality = 1.0
+            for param in params:
+                key, _, value = param.partition("=")
+                if key.strip() == "q":
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            return quality > 0
+        return False
+
+    @staticmethod
+    def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+        """Comparação fraca do If-None-Match (lista de ETags ou "*") com o ETag atual."""
+        if not if_none_match or etag is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        weak = lambda tag: tag.strip().removeprefix("W/")
+        return any(weak(candidate) == weak(etag) for candidate in if_none_match.split(","))
+
+    @staticmethod
+    def validator_headers(etag: str) -> Dict[str, str]:
+        return {"ETag": etag, "Cache-Control": f"public, max-age={RESPONSE_MAX_AGE}, must-revalidate"}
+
+    @staticmethod
+    def not_modified(etag: str) -> Response:
+        return Response(status_code=304, headers={**ResponseCache.validator_headers(etag), "Vary": "Accept-Encoding"})
+
+    @staticmethod
+    def response(
+        stored: bytes,
+        accept_encoding: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+        if_none_match: Optional[str] = None
+    ) -> Response:
+        """
+        Monta a resposta a partir do valor guardado, negociando o gzip com o header Accept-Encoding.
+
+        Se o valor tiver ETag e ele casar com `if_none_match`, a resposta é um 304 sem corpo.
+        """
+        etag, stored = ResponseCache.split_etag(stored)
+        if etag is not None:
+            if ResponseCache.etag_matches(if_none_match, etag):
+                return ResponseCache.not_modified(etag)
+            headers = {**(headers or {}), **ResponseCache.validator_headers(etag)}
+        headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+        body = stored[1:]
+        if stored[:1] == _GZIP:
+            if ResponseCache.accepts_gzip(accept_encoding):
+                headers["Content-Encoding"] = "gzip"
+            else:
+                body = gzip.decompress(body)
+        return Response(content=body, media_type="application/json", headers=headers)
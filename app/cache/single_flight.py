@@ -0,0 +1,38 @@
+from typing import Any, Awaitable, Callable, Dict
+import asyncio
+
+class SingleFlight:
+    """
+    Coalesce chamadas concorrentes com a mesma chave em uma única execução.
+
+    A primeira chamada (líder) dispara a corrotina; as chamadas seguintes com a mesma chave,
+    enquanto ela não termina, aguardam o mesmo resultado (ou a mesma exceção).
+    """
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+        # shield: o cancelamento de um dos chamadores não cancela a busca compartilhada
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # marca a exceção como consumida mesmo sem chamadores aguardando
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def stats(self) -> Dict[str, int]:
+        return {"leaders": self.leaders, "coalesced": self.coalesced, "in_flight": self.in_flight()}
@@ -0,0 +1,49 @@
+"""
+Configuração do gunicorn para produção: `gunicorn -c gunicorn_conf.py main:app` (a partir de app/).
+
+Um worker uvicorn por CPU disponível (WEB_CONCURRENCY para fixar outro número), com a aplicação
+importada uma única vez no master (preload) e o estado de cada worker recriado após o fork.
+"""
+import multiprocessing
+import shutil
+import os
+
+def _available_cpus() -> int:
+    # Respeita o limite de CPUs do container/cgroup quando o sistema expõe a afinidade do processo
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return multiprocessing.cpu_count()
+
+bind = f"{os.getenv('BACKEND_HOST', '0.0.0.0')}:{os.getenv('BACKEND_PORT', 8000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", _available_cpus()))
+worker_class = "server.ProductionUvicornWorker"
+preload_app = True
+keepalive = int(os.getenv("SERVER_KEEPALIVE", 5))
+timeout = int(os.getenv("SERVER_WORKER_TIMEOUT", 60))
+# Drenagem das requisições + gravação dos posts pendentes + gravação dos snapshots + envio dos logs, antes do SIGKILL
+graceful_timeout = int(
+    float(os.getenv("SERVER_DRAIN_TIMEOUT", 20))
+    + float(os.getenv("INDEXER_SHUTDOWN_TIMEOUT", 10))
+    + float(os.getenv("SNAPSHOT_SHUTDOWN_TIMEOUT", 10))
+    + 2 * float(os.getenv("LOG_SHIP_TIMEOUT", 3))
+    + 5
+)
+# Reciclagem opcional dos workers (0 desliga); o jitter evita que todos reiniciem juntos
+max_requests = int(os.getenv("SERVER_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 0))
+accesslog = os.getenv("SERVER_ACCESS_LOG") or None
+errorlog = "-"
+
+# Com vários processos, o /metrics agrega os histogramas de todos os workers pelo diretório compartilhado.
+# Precisa estar definido antes de o preload importar o prometheus_client.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+def post_fork(server, worker):
+    from server import reset_worker_state
+    reset_worker_state(workers)
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -2,40 +2,211 @@
 import logging
 import socket
 import datetime
+import threading
+import queue
+import json
+import time
+import sys
 import requests
 import os
 
-ES_HOST = os.getenv("ELASTICSEARCH_HOST") 
+ES_HOST = os.getenv("ELASTICSEARCH_HOST")
 ES_PORT = os.getenv("ELASTICSEARCH_PORT")
 ES_INDEX = os.getenv("ELASTICSEARCH_INDEX_LOGS", "logs_sistema")
 SERVICE_NAME = os.getenv("SERVICE_NAME")
 
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", 500))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", 2))
+LOG_SHIP_TIMEOUT = float(os.getenv("LOG_SHIP_TIMEOUT", 3))
+# Política aplicada quando a fila enche: "drop" descarta os novos registros,
+# "sample" passa a aceitar apenas 1 a cada LOG_SAMPLE_RATE registros abaixo de WARNING
+# a partir do ponto LOG_SAMPLE_WATERMARK de ocupação da fila.
+LOG_FULL_POLICY = os.getenv("LOG_FULL_POLICY", "drop")
+LOG_SAMPLE_RATE = int(os.getenv("LOG_SAMPLE_RATE", 10))
+LOG_SAMPLE_WATERMARK = float(os.getenv("LOG_SAMPLE_WATERMARK", 0.8))
+
+_WAKE_UP = object()
+
 class ElasticsearchLogHandler(logging.Handler):
-    def __init__(self):
+    """
+    Handler que envia os logs ao Elasticsearch sem bloquear quem loga.
+
+    Os registros vão para uma fila em memória limitada e uma thread em background
+    os envia em lotes pela API `_bulk`, por tamanho do lote ou janela de tempo.
+    """
+    def __init__(
+        self,
+        queue_size: int = LOG_QUEUE_SIZE,
+        batch_size: int = LOG_BATCH_SIZE,
+        flush_interval: float = LOG_FLUSH_INTERVAL,
+        full_policy: str = LOG_FULL_POLICY,
+        sample_rate: int = LOG_SAMPLE_RATE,
+        session: requests.Session = None
+    ):
         super().__init__()
         self.hostname = socket.gethostname()
-        self.url = f"http://{ES_HOST}:{ES_PORT}/{ES_INDEX}/_doc"
+        self.url = f"http://{ES_HOST}:{ES_PORT}/{ES_INDEX}/_bulk"
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self.sample_rate = max(sample_rate, 1)
+        self.session = session or requests.Session()
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.shipped = 0
+        self.dropped = 0
+        self.failed = 0
+        self._sample_counter = 0
+        self._counters_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._worker = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        if self._pid != os.getpid():
+            # Processo novo (ex: fork de um worker): a fila e a thread herdadas não são válidas
+            self.queue = queue.Queue(maxsize=self.queue_size)
+            self._worker = None
+            self._pid = os.getpid()
+        if self._worker is None or not self._worker.is_alive():
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="es-log-shipper", daemon=True)
+            self._worker.start()
+
+    def _sampled_out(self, record) -> bool:
+        if self.full_policy != "sample" or record.levelno >= logging.WARNING:
+            return False
+        if self.queue.qsize() < self.queue_size * LOG_SAMPLE_WATERMARK:
+            return False
+        # Várias threads de logging amostram ao mesmo tempo; sem o lock o contador perde incrementos
+        with self._counters_lock:
+            self._sample_counter += 1
+            return self._sample_counter % self.sample_rate != 0
 
     def emit(self, record):
+        if threading.current_thread() is self._worker:
+            # Evita laço de logs gerados pelo próprio envio (ex: urllib3)
+            return
         try:
+            self._ensure_worker()
+            if self._sampled_out(record):
+                self._count(dropped=1)
+                return
             log_entry = {
                 "timestamp": datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
                 "log_level": record.levelname,
                 "message": self.format(record),
                 "service": SERVICE_NAME,
                 "hostname": self.hostname
-            }   
-            print("#"*40)
-            print("#"*40)
-            print(log_entry)
-            print("#"*40)
-            print("#"*40)
-            headers = {"Content-Type": "application/json"}
-            post_data = requests.post(self.url, json=log_entry, headers=headers, timeout=3)
-            print(post_data.status_code)
-            print(post_data.text)
+            }
+            self.queue.put_nowait(log_entry)
+        except queue.Full:
+            self._count(dropped=1)
+        except Exception:
+            self.handleError(record)
+
+    def _count(self, shipped: int = 0, dropped: int = 0, failed: int = 0):
+        with self._counters_lock:
+            self.shipped += shipped
+            self.dropped += dropped
+            self.failed += failed
+
+    def _next_batch(self) -> list:
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _WAKE_UP:
+                self.queue.task_done()
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self.queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._ship(batch)
+
+    def _ship(self, batch: list):
+        lines = []
+        for entry in batch:
+            lines.append('{"index":{}}')
+            lines.append(json.dumps(entry))
+        body = ("\n".join(lines) + "\n").encode("utf-8")
+        try:
+            response = self.session.post(
+                self.url,
+                data=body,
+                headers={"Content-Type": "application/x-ndjson"},
+                timeout=LOG_SHIP_TIMEOUT
+            )
+            response.raise_for_status()
+            items = response.json().get("items", [])
+            errors = sum(1 for item in items if item.get("index", {}).get("error"))
+            self._count(shipped=len(batch) - errors, failed=errors)
         except Exception as e:
-            print(f"[Logging error] Failed to send log to Elasticsearch: {e}")
+            self._count(failed=len(batch))
+            print(f"[Logging error] Falha ao enviar {len(batch)} logs ao Elasticsearch: {e}", file=sys.stderr)
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        """Contadores de registros enviados, descartados e com falha de envio."""
+        with self._counters_lock:
+            return {
+                "shipped": self.shipped,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "queued": self.queue.qsize()
+            }
+
+    def flush(self, timeout: float = LOG_SHIP_TIMEOUT * 2):
+        """Aguarda o envio dos registros pendentes na fila (até `timeout` segundos)."""
+        if self._worker is None or not self._worker.is_alive():
+            return
+        try:
+            self.queue.put_nowait(_WAKE_UP)
+        except queue.Full:
+            pass
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.queue.all_tasks_done.wait(remaining)
+
+    def close(self):
+        self.flush()
+        self._stop.set()
+        if self._worker is not None and self._worker.is_alive():
+            try:
+                self.queue.put_nowait(_WAKE_UP)
+            except queue.Full:
+                pass
+            self._worker.join(timeout=LOG_SHIP_TIMEOUT)
+        super().close()
+
+def get_es_log_handler():
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, ElasticsearchLogHandler):
+            return handler
+    return None
+
+def flush_logs():
+    handler = get_es_log_handler()
+    if handler is not None:
+        handler.flush()
 
 def setup_logger():
     logger = logging.getLogger()
@@ -1,24 +1,59 @@
-from services.reddit_service import RedditService, RedditAPIError, RedditAuthenticationError, RedditRateLimitError, SubredditNotFound
-from services.elasticsearch_service import ElasticsearchService
-from fastapi import FastAPI, Query, HTTPException, status
+from services.reddit_service import RedditAPIError, RedditAuthenticationError, RedditRateLimitError, RedditUnavailableError, SubredditNotFound
+from services.elasticsearch_service import ElasticsearchService, SEARCH_FIELDS, SEARCH_SORTS, SEARCH_MAX_SIZE
+from services.http_client import RedditHttpClient
+from services.indexing_service import PostIndexer
+from services.listing_service import ListingService, STREAM_MAX_POSTS
+from services.prewarm_scheduler import PrewarmScheduler
+from services.search_service import SearchService
+from services.readiness import Readiness
+from services.snapshot_store import SnapshotStore, SnapshotStoreUnavailable
+from services.trending_service import TrendingService, TrendingUnavailable, TRENDING_MAX_LIMIT
+from fastapi import FastAPI, Path, Query, Header, HTTPException, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from models.post_model import PostListResponse
+from models.post_model import PostListResponse, BatchPostsRequest, BatchPostsResponse, PostHistoryResponse, TrendingResponse, SUBREDDIT_PATTERN
 from cache.cache_handler import CacheHandler
-from fastapi.responses import JSONResponse
+from cache.response_cache import ResponseCache
+from metrics.instrumentation import Metrics, MetricsMiddleware
+from metrics import stats_collector
+from prometheus_client import CONTENT_TYPE_LATEST
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Dict
 from typing import Optional
+from contextlib import asynccontextmanager
 import os
-import logging
-from loggers.log_handler import setup_logger  
+from loggers.log_handler import setup_logger, flush_logs
 
 logger = setup_logger()
 
-REDDIT_ACCESS_TOKEN = os.getenv("REDDIT_ACCESS_TOKEN")
+SEARCH_FIELDS_PATTERN = f"^({'|'.join(SEARCH_FIELDS)})(,({'|'.join(SEARCH_FIELDS)}))*$"
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nada aqui espera as dependências: a verificação do Redis e do Elasticsearch segue em background
+    await Readiness.startup()
+    await RedditHttpClient.startup()
+    await PostIndexer.startup()
+    await SnapshotStore.startup()
+    await CacheHandler.start_invalidation_listener()
+    await PrewarmScheduler.startup()
+    yield
+    await Readiness.shutdown()
+    await PrewarmScheduler.shutdown()
+    await CacheHandler.stop_invalidation_listener()
+    await PostIndexer.shutdown()
+    await SnapshotStore.shutdown()
+    await TrendingService.shutdown()
+    await RedditHttpClient.shutdown()
+    await CacheHandler.close()
+    await ElasticsearchService.close_async_client()
+    flush_logs()
 
 app = FastAPI(
     title="API de Trending Topics",
     description="API para consulta de tópicos populares, com cache e filtros",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -34,90 +69,230 @@ app.add_middleware(
     allow_methods=["*"], 
     allow_headers=["*"],  
 )
+app.add_middleware(MetricsMiddleware)
+
+def reddit_http_exception(subreddit: str, e: RedditAPIError) -> HTTPException:
+    """Converte erros da API do Reddit no HTTPException equivalente, registrando o log adequado."""
+    if isinstance(e, SubredditNotFound):
+        logger.warning(f"Subreddit '{subreddit}' não encontrado: {e}")
+        return HTTPException(status_code=404, detail=str(e))
+    if isinstance(e, RedditAuthenticationError):
+        logger.error(f"Erro de autenticação com o Reddit: {e}")
+        return HTTPException(status_code=401, detail=str(e))
+    if isinstance(e, RedditRateLimitError):
+        logger.warning(f"Limite de requisições atingido no Reddit: {e}")
+        return HTTPException(status_code=429, detail=str(e))
+    if isinstance(e, RedditUnavailableError):
+        logger.warning(f"Circuito do Reddit aberto, requisição recusada: {e}")
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(max(int(e.retry_after), 1))})
+    logger.error(f"Erro genérico da API do Reddit: {e}")
+    return HTTPException(status_code=e.status_code or 500, detail=str(e))
 
 @app.get("/", summary="Rota principal de teste")
 async def root():
     logger.info("Rota '/' acessada com sucesso.")
     return JSONResponse(content={"message": "Teste prático nouslatam backend"}, status_code=status.HTTP_200_OK)
 
+@app.get("/healthz", summary="Liveness: o processo está de pé", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+@app.get("/readyz", summary="Readiness: as dependências obrigatórias estão disponíveis", include_in_schema=False)
+async def readyz():
+    readiness = await Readiness.status()
+    readiness["startup"] = "complete" if Readiness.startup_complete() else "pending"
+    return JSONResponse(
+        content=readiness,
+        status_code=status.HTTP_200_OK if readiness["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE
+    )
+
+@app.get("/metrics", summary="Métricas no formato do Prometheus", include_in_schema=False)
+async def metrics():
+    return Response(content=stats_collector.render(), media_type=CONTENT_TYPE_LATEST)
+
+@app.post("/posts/batch", response_model=BatchPostsResponse, summary="Consulta várias listagens de subreddits em uma única chamada")
+async def get_posts_batch(request: BatchPostsRequest):
+    items = [
+        {
+            "subreddit": item.subreddit,
+            "period": item.period or request.period,
+            "limit": item.limit or request.limit,
+            "sort_type": item.sort_type or request.sort_type
+        }
+        for item in request.items
+    ]
+    logger.info(f"Rota '/posts/batch' acessada com {len(items)} subreddits.")
+
+    results = []
+    for item, result in zip(items, await ListingService.get_posts_batch(items)):
+        if isinstance(result, RedditAPIError):
+            error = reddit_http_exception(item["subreddit"], result)
+            results.append({**item, "error": {"status_code": error.status_code, "detail": error.detail}})
+        elif isinstance(result, Exception):
+            results.append({**item, "error": {"status_code": 500, "detail": f"Erro interno do servidor: {str(result)}"}})
+        else:
+            posts, origin, cache_status = result
+            results.append({**item, "posts": posts, "origin": origin, "cache_status": cache_status})
+
+    return {"results": results}
+
 @app.get("/posts/{subreddit}", response_model=PostListResponse)
 async def get_posts(
-    subreddit: str,
+    request: Request,
+    response: Response,
+    subreddit: str = Path(..., pattern=SUBREDDIT_PATTERN),
     period: Optional[str] = Query("day", enum=["hour", "day", "week", "month", "year", "all"]),
     limit: Optional[int] = Query(10, ge=1, le=100), 
     sort_type: Optional[str] = Query("hot", enum=["hot", "new", "top", "rising"]) 
 ):
     logger.info(f"Rota '/posts/{subreddit}' acessada com params: period={period}, limit={limit}, sort_type={sort_type}")
-    
-    cache_key = f"reddit_posts_{subreddit}_{period}_{limit}_{sort_type}"
-    logger.debug(f"Tentando recuperar cache com chave: {cache_key}")
-
-    cached_posts = CacheHandler.get_cache(cache_key)
-    
-    if cached_posts:
-        logger.info("Cache HIT - Dados encontrados no cache.")
-        return {
-            "posts": cached_posts,
-            "origin": "cache",
-            "cache_status": "hit"
-        }
-
-    logger.info("Cache MISS - Buscando dados no Reddit.")
 
     try:
-        posts = await RedditService.fetch_posts(
-            subreddit=subreddit, 
-            token=REDDIT_ACCESS_TOKEN, 
-            period=period, 
+        # Caminho rápido: corpo já serializado (e comprimido), devolvido sem passar pelo modelo
+        stored = await ListingService.get_cached_body(subreddit, period=period, limit=limit, sort_type=sort_type)
+        if stored is not None:
+            logger.info("Cache HIT - Resposta pronta servida do cache.")
+            Metrics.set_cache_status("hit")
+            return ResponseCache.response(stored, request.headers.get("accept-encoding"), if_none_match=request.headers.get("if-none-match"))
+
+        posts, origin, cache_status, etag = await ListingService.get_listing(
+            subreddit=subreddit,
+            period=period,
             limit=limit,
             sort_type=sort_type
         )
-        logger.info(f"{len(posts)} posts obtidos da API do Reddit.")
+        Metrics.set_cache_status(cache_status)
+
+        if cache_status == "hit":
+            logger.info("Cache HIT - Dados encontrados no cache.")
+        elif cache_status == "stale":
+            logger.info("Cache STALE - Dados antigos servidos do cache enquanto são atualizados.")
+        else:
+            logger.info(f"Cache MISS - {len(posts)} posts obtidos da API do Reddit.")
 
-        CacheHandler.set_cache(cache_key, posts)
-        logger.debug("Dados armazenados no cache com sucesso.")
+        # Mesmo ETag do corpo pronto: o cliente revalida com If-None-Match e recebe 304 se nada mudou
+        if ResponseCache.etag_matches(request.headers.get("if-none-match"), etag):
+            return ResponseCache.not_modified(etag)
+        response.headers.update(ResponseCache.validator_headers(etag))
 
         return {
             "posts": posts,
-            "origin": "api",
-            "cache_status": "miss"
+            "origin": origin,
+            "cache_status": cache_status
         }
 
-    except SubredditNotFound as e:
-        logger.warning(f"Subreddit '{subreddit}' não encontrado: {e}")
-        raise HTTPException(status_code=404, detail=str(e))
-    except RedditAuthenticationError as e:
-        logger.error(f"Erro de autenticação com o Reddit: {e}")
-        raise HTTPException(status_code=401, detail=str(e))
-    except RedditRateLimitError as e:
-        logger.warning(f"Limite de requisições atingido no Reddit: {e}")
-        raise HTTPException(status_code=429, detail=str(e))
     except RedditAPIError as e:
-        logger.error(f"Erro genérico da API do Reddit: {e}")
-        raise HTTPException(status_code=e.status_code or 500, detail=str(e))
+        raise reddit_http_exception(subreddit, e)
     except Exception as e:
         logger.exception("Erro interno inesperado no endpoint '/posts/{subreddit}'.")
         raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
 
+@app.get("/posts/{subreddit}/stream", summary="Stream NDJSON de posts, paginado pelo cursor do Reddit")
+async def stream_posts(
+    subreddit: str = Path(..., pattern=SUBREDDIT_PATTERN),
+    period: Optional[str] = Query("day", enum=["hour", "day", "week", "month", "year", "all"]),
+    sort_type: Optional[str] = Query("hot", enum=["hot", "new", "top", "rising"]),
+    max_posts: int = Query(1000, ge=1, le=STREAM_MAX_POSTS)
+):
+    logger.info(f"Rota '/posts/{subreddit}/stream' acessada com params: period={period}, sort_type={sort_type}, max_posts={max_posts}")
+
+    # A primeira página é buscada antes do stream para que 404/401/429 ainda virem status HTTP
+    try:
+        first_page = await ListingService.get_page(subreddit, period=period, sort_type=sort_type)
+    except RedditAPIError as e:
+        raise reddit_http_exception(subreddit, e)
+    except Exception as e:
+        logger.exception("Erro interno inesperado no endpoint '/posts/{subreddit}/stream'.")
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+    return StreamingResponse(
+        ListingService.stream_posts(subreddit, period=period, sort_type=sort_type, max_posts=max_posts, first_page=first_page),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/history/{post_id}", response_model=PostHistoryResponse, summary="Histórico de score de um post")
+async def get_post_history(
+    post_id: str,
+    since: Optional[int] = Query(None, description="Início do período (segundos desde a época); padrão: últimos 30 dias"),
+    until: Optional[int] = Query(None, description="Fim do período (segundos desde a época); padrão: agora"),
+    bucket: Optional[int] = Query(None, ge=60, description="Agrega os pontos pelo maior score a cada N segundos"),
+    limit: int = Query(500, ge=1, le=5000, description="Número máximo de pontos (os mais recentes)")
+):
+    logger.info(f"Rota '/history/{post_id}' acessada com params: since={since}, until={until}, bucket={bucket}, limit={limit}")
+
+    try:
+        history = await SnapshotStore.history(post_id, since=since, until=until, bucket=bucket, limit=limit)
+    except SnapshotStoreUnavailable as e:
+        logger.warning(f"Histórico indisponível: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Erro inesperado no endpoint '/history/{post_id}'.")
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
+    if history is None:
+        raise HTTPException(status_code=404, detail="Nenhum snapshot encontrado para o post no período.")
+    return history
+
+@app.get("/trending", response_model=TrendingResponse, summary="Posts e autores em alta pela velocidade do score")
+async def get_trending(limit: int = Query(10, ge=1, le=TRENDING_MAX_LIMIT)):
+    logger.info(f"Rota '/trending' acessada com params: limit={limit}")
+
+    try:
+        return await TrendingService.top(limit)
+    except TrendingUnavailable as e:
+        logger.warning(f"Ranking de trending indisponível: {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.exception("Erro inesperado no endpoint '/trending'.")
+        raise HTTPException(status_code=500, detail=f"Erro interno do servidor: {str(e)}")
+
 @app.get("/search/posts", response_model=List[Dict])
 async def search_posts(
-    field: str = Query(..., description="Campo onde a pesquisa será realizada (ex: title, author, etc.)", regex="^(title|author|url|score|created_utc)$"),
-    query: str = Query(..., description="Termo de pesquisa para buscar nos posts")
+    response: Response,
+    field: str = Query(..., description="Campos onde a pesquisa será realizada, separados por vírgula (ex: title,author)", pattern=SEARCH_FIELDS_PATTERN),
+    query: str = Query(..., description="Termo de pesquisa para buscar nos posts"),
+    size: int = Query(10, ge=1, le=SEARCH_MAX_SIZE, description="Número de posts por página"),
+    sort: str = Query("relevance", enum=SEARCH_SORTS),
+    order: str = Query("desc", enum=["asc", "desc"]),
+    score_min: Optional[int] = Query(None, description="Score mínimo"),
+    score_max: Optional[int] = Query(None, description="Score máximo"),
+    created_from: Optional[int] = Query(None, description="Criados a partir deste instante (segundos desde a época)"),
+    created_to: Optional[int] = Query(None, description="Criados até este instante (segundos desde a época)"),
+    cursor: Optional[str] = Query(None, description="Cursor da próxima página, retornado no header X-Next-Cursor"),
+    x_cache_bypass: Optional[str] = Header(None, description="Envie '1' para ignorar o cache de resultados da busca")
 ):
-    logger.info(f"Rota '/search/posts' chamada com field='{field}' e query='{query}'")
+    logger.info(f"Rota '/search/posts' chamada com field='{field}', query='{query}', size={size}, sort={sort}, order={order}")
 
     try:
-        results = ElasticsearchService.search_posts(field, query)
-        logger.info(f"Número de resultados encontrados: {len(results)}")
+        results, next_cursor, cache_status = await SearchService.search(
+            bypass=x_cache_bypass in ("1", "true"),
+            fields=field.split(","),
+            query=query,
+            size=size,
+            cursor=cursor,
+            sort=sort,
+            order=order,
+            score_min=score_min,
+            score_max=score_max,
+            created_from=created_from,
+            created_to=created_to
+        )
+        logger.info(f"Número de resultados encontrados: {len(results)} (cache {cache_status.upper()})")
+        response.headers["X-Cache-Status"] = cache_status
+        Metrics.set_cache_status(cache_status)
         
         if not results:
             logger.warning("Nenhum post encontrado com os critérios de busca.")
             raise HTTPException(status_code=404, detail="Nenhum post encontrado.")
-        
+
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return results
     
+    except HTTPException:
+        raise
     except ValueError as e:
-        logger.warning(f"Erro de validação no parâmetro 'field': {e}")
+        logger.warning(f"Erro de validação nos parâmetros da busca: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception("Erro inesperado no endpoint '/search/posts'.")
@@ -0,0 +1,145 @@
+"""
+Instrumentação do caminho quente: histogramas de latência por etapa e por requisição (Prometheus).
+
+As etapas (`cache_get`, `cache_set`, `upstream`, `parse`, `es_index`, `es_search`) são medidas com
+`Metrics.stage` onde acontecem. Dentro de uma requisição as medições ficam guardadas no contexto e só
+viram observações quando a resposta termina, já rotuladas com a rota, o status do cache e o status do
+Reddit; fora dela (indexador, revalidação em background) vão direto para os histogramas com a rota
+`background`. Com SERVER_TIMING_ENABLED as mesmas medições saem no header `Server-Timing`.
+"""
+from prometheus_client import Histogram
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional
+import time
+import os
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+# Rota das etapas executadas fora de uma requisição
+BACKGROUND_ROUTE = "background"
+# Requisições que não casaram com nenhuma rota (evita um rótulo por URL)
+UNMATCHED_ROUTE = "unmatched"
+
+# Do hit no Redis (sub-milissegundo) à busca no Reddit (centenas de ms)
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_LATENCY = Histogram(
+    "api_stage_duration_seconds",
+    "Duração de cada etapa do caminho quente.",
+    ["stage", "route", "cache_status", "upstream_status"],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_LATENCY = Histogram(
+    "api_request_duration_seconds",
+    "Duração total das requisições HTTP.",
+    ["route", "method", "status_code", "cache_status"],
+    buckets=LATENCY_BUCKETS
+)
+
+class Stage:
+    """Uma medição de etapa; `upstream_status` é preenchido por quem chama o Reddit."""
+    __slots__ = ("name", "duration", "upstream_status")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.duration = 0.0
+        self.upstream_status = ""
+
+class RequestTimings:
+    """Etapas medidas durante uma requisição, publicadas nos histogramas quando ela termina."""
+    __slots__ = ("stages", "cache_status", "finished")
+
+    def __init__(self):
+        self.stages: List[Stage] = []
+        self.cache_status = ""
+        self.finished = False
+
+    def server_timing(self, total: float) -> str:
+        """Valor do header Server-Timing: duração somada (ms) e número de ocorrências de cada etapa."""
+        durations: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        for stage in self.stages:
+            durations[stage.name] = durations.get(stage.name, 0.0) + stage.duration
+            counts[stage.name] = counts.get(stage.name, 0) + 1
+        entries = [
+            f'{name};dur={duration * 1000:.2f}' + (f';desc="x{counts[name]}"' if counts[name] > 1 else "")
+            for name, duration in durations.items()
+        ]
+        entries.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(entries)
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+class Metrics:
+    @staticmethod
+    @contextmanager
+    def stage(name: str) -> Iterator[Stage]:
+        """Mede o bloco como a etapa `name` (também quando ele termina com exceção)."""
+        stage = Stage(name)
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.duration = time.perf_counter() - start
+            Metrics._record(stage)
+
+    @staticmethod
+    def _record(stage: Stage) -> None:
+        if not METRICS_ENABLED:
+            return
+        timings = _current.get()
+        if timings is not None and not timings.finished:
+            timings.stages.append(stage)
+        else:
+            STAGE_LATENCY.labels(stage.name, BACKGROUND_ROUTE, "", stage.upstream_status).observe(stage.duration)
+
+    @staticmethod
+    def set_cache_status(cache_status: str) -> None:
+        """Registra o status do cache da requisição atual, usado como rótulo das suas medições."""
+        timings = _current.get()
+        if timings is not None:
+            timings.cache_status = cache_status
+
+def _route(scope: Dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or UNMATCHED_ROUTE
+
+class MetricsMiddleware:
+    """
+    Middleware ASGI que abre o contexto de medição de cada requisição HTTP.
+
+    É ASGI puro (e não um BaseHTTPMiddleware) para não custar uma task e uma cópia da resposta por requisição.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if SERVER_TIMING_ENABLED:
+                    header = timings.server_timing(time.perf_counter() - start).encode("latin-1")
+                    message = {**message, "headers": [*message.get("headers", []), (b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            duration = time.perf_counter() - start
+            _current.reset(token)
+            timings.finished = True
+            route = _route(scope)
+            for stage in timings.stages:
+                STAGE_LATENCY.labels(stage.name, route, timings.cache_status, stage.upstream_status).observe(stage.duration)
+            REQUEST_LATENCY.labels(route, scope["method"], str(status_code), timings.cache_status).observe(duration)
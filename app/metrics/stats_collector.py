@@ -0,0 +1,94 @@
+"""
+Exporta no /metrics os contadores que os serviços já mantêm em `stats()`.
+
+Os valores são lidos no momento da coleta (nenhum custo no caminho quente) e expostos como gauges
+`api_<componente>_<caminho>`; as credenciais do RateLimitGovernor viram o rótulo `credential`.
+"""
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+from cache.cache_handler import CacheHandler
+from loggers.log_handler import get_es_log_handler
+from services.indexing_service import PostIndexer
+from services.listing_service import ListingService
+from services.prewarm_scheduler import PrewarmScheduler
+from services.rate_limit_governor import get_governor
+from services.circuit_breaker import get_breaker
+from services.search_service import SearchService
+from services.snapshot_store import SnapshotStore
+from services.trending_service import TrendingService
+from typing import Callable, Dict, Iterator, Optional, Tuple
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+def _listing_stats() -> Dict:
+    # O governor é exportado separadamente, como `rate_limit`
+    return {key: value for key, value in ListingService.stats().items() if key != "rate_limit"}
+
+def _log_handler_stats() -> Dict:
+    # Enviados, descartados (fila cheia/amostragem) e com falha de envio; vazio se o handler não estiver instalado
+    handler = get_es_log_handler()
+    return handler.stats() if handler is not None else {}
+
+COMPONENTS: Dict[str, Callable[[], Dict]] = {
+    "cache": CacheHandler.stats,
+    "listing": _listing_stats,
+    "rate_limit": lambda: get_governor().stats(),
+    # Estado: 0 fechado, 1 half-open, 2 aberto
+    "circuit_breaker": lambda: get_breaker().stats(),
+    "indexer": PostIndexer.stats,
+    "search_cache": SearchService.stats,
+    "prewarm": PrewarmScheduler.stats,
+    "snapshots": SnapshotStore.stats,
+    "trending": TrendingService.stats,
+    "logs": _log_handler_stats
+}
+
+def _flatten(prefix: str, stats: Dict, labels: Tuple[Tuple[str, str], ...] = ()) -> Iterator[Tuple[str, Tuple, float]]:
+    for key, value in stats.items():
+        if key == "credentials" and isinstance(value, dict):
+            for credential, credential_stats in value.items():
+                yield from _flatten(f"{prefix}_credential", credential_stats, labels + (("credential", credential),))
+        elif isinstance(value, dict):
+            yield from _flatten(f"{prefix}_{key}", value, labels)
+        elif isinstance(value, (bool, int, float)):
+            yield f"{prefix}_{key}", labels, float(value)
+
+class StatsCollector:
+    """Collector do prometheus_client sobre o `stats()` de cada componente."""
+    def __init__(self, components: Dict[str, Callable[[], Dict]] = COMPONENTS):
+        self.components = components
+
+    def describe(self):
+        # Sem descrição prévia: o registro não chama stats() na importação
+        return []
+
+    def collect(self):
+        families: Dict[str, GaugeMetricFamily] = {}
+        for component, stats in self.components.items():
+            try:
+                samples = list(_flatten(f"api_{component}", stats()))
+            except Exception as e:
+                logger.warning(f"Falha ao coletar as estatísticas de '{component}': {e}")
+                continue
+            for name, labels, value in samples:
+                if name not in families:
+                    families[name] = GaugeMetricFamily(name, f"{component}.stats()", labels=[label for label, _ in labels])
+                families[name].add_metric([label_value for _, label_value in labels], value)
+        yield from families.values()
+
+REGISTRY.register(StatsCollector())
+
+def render(registry: Optional[CollectorRegistry] = None) -> bytes:
+    """
+    Texto no formato de exposição do Prometheus com os histogramas e as estatísticas dos serviços.
+
+    Com PROMETHEUS_MULTIPROC_DIR (vários workers no gunicorn) os histogramas são somados entre os
+    processos; as estatísticas de `stats()` continuam sendo as do worker que atendeu a coleta.
+    """
+    if registry is None and os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(StatsCollector())
+    return generate_latest(registry or REGISTRY)
@@ -1,7 +1,17 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+import os
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", 50))
+# Nomes de subreddit aceitos pelo Reddit: letras, números e "_", de 2 a 21 caracteres
+SUBREDDIT_PATTERN = r"^[A-Za-z0-9_]{2,21}$"
+
+Period = Literal["hour", "day", "week", "month", "year", "all"]
+SortType = Literal["hot", "new", "top", "rising"]
 
 class Post(BaseModel):
+    id: Optional[str] = None  # Fullname do post no Reddit (ex: t3_abc123)
+    subreddit: Optional[str] = None
     title: str
     author: str
     url: str
@@ -11,4 +21,55 @@ class Post(BaseModel):
 class PostListResponse(BaseModel):
     posts: List[Post]
     origin: str  # colocado aqui somete pra nivel de obsrvabilidade
-    cache_status: str
+    cache_status: str  # "hit", "stale" (servido enquanto é atualizado em background) ou "miss"
+
+class ScoreSnapshot(BaseModel):
+    snapshot_utc: int  # Instante (ou início do intervalo, se agregado) do snapshot
+    score: int
+
+class PostHistoryResponse(BaseModel):
+    post_id: str
+    subreddit: Optional[str] = None
+    title: Optional[str] = None
+    history: List[ScoreSnapshot]
+
+class TrendingPost(Post):
+    velocity: float  # Variação do score em pontos por hora, entre as duas últimas observações
+
+class TrendingAuthor(BaseModel):
+    author: str
+    velocity: float  # Soma das velocidades dos posts do autor em alta
+
+class TrendingResponse(BaseModel):
+    posts: List[TrendingPost]
+    authors: List[TrendingAuthor]
+
+class BatchPostsItem(BaseModel):
+    subreddit: str = Field(..., pattern=SUBREDDIT_PATTERN)
+    # Quando omitidos, valem os parâmetros compartilhados do lote
+    period: Optional[Period] = None
+    limit: Optional[int] = Field(None, ge=1, le=100)
+    sort_type: Optional[SortType] = None
+
+class BatchPostsRequest(BaseModel):
+    items: List[BatchPostsItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    period: Period = "day"
+    limit: int = Field(10, ge=1, le=100)
+    sort_type: SortType = "hot"
+
+class BatchPostsError(BaseModel):
+    status_code: int
+    detail: str
+
+class BatchPostsResult(BaseModel):
+    subreddit: str
+    period: Period
+    limit: int
+    sort_type: SortType
+    posts: Optional[List[Post]] = None
+    origin: Optional[str] = None
+    cache_status: Optional[str] = None
+    error: Optional[BatchPostsError] = None
+
+class BatchPostsResponse(BaseModel):
+    results: List[BatchPostsResult]
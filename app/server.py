@@ -0,0 +1,41 @@
+"""
+Modo de produção da API: gunicorn gerenciando workers uvicorn com uvloop e httptools.
+
+Uso (a partir de app/): `gunicorn -c gunicorn_conf.py main:app`. As configurações do gunicorn ficam em
+`gunicorn_conf.py`; aqui estão o worker e o reset do estado de cada processo após o fork.
+"""
+from uvicorn_worker import UvicornWorker
+from cache.cache_handler import CacheHandler
+from services.elasticsearch_service import ElasticsearchService
+from services.http_client import RedditHttpClient
+from services.rate_limit_governor import RateLimitGovernor, REDDIT_ACCESS_TOKENS, REDDIT_RATELIMIT_REQUESTS, set_governor
+from services.circuit_breaker import set_breaker
+import os
+
+# Tempo (segundos) para as requisições em andamento terminarem depois do sinal de parada
+SERVER_DRAIN_TIMEOUT = float(os.getenv("SERVER_DRAIN_TIMEOUT", 20))
+
+class ProductionUvicornWorker(UvicornWorker):
+    """
+    Worker uvicorn com o event loop uvloop e o parser HTTP httptools (em vez de "auto").
+
+    No SIGTERM o worker para de aceitar conexões e espera até SERVER_DRAIN_TIMEOUT segundos pelas
+    requisições em andamento; só então o lifespan grava os posts pendentes no Elasticsearch e
+    envia os logs da fila.
+    """
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "timeout_graceful_shutdown": SERVER_DRAIN_TIMEOUT}
+
+def reset_worker_state(workers: int) -> None:
+    """
+    Descarta, no processo recém-criado, o estado herdado do master (que importa a aplicação com preload).
+
+    Clientes e pools de conexão não podem ser compartilhados entre processos, e o L1 é limpo junto
+    com o cliente Redis. O orçamento de cada credencial do Reddit é dividido entre os workers, já que
+    todos consomem a mesma cota.
+    """
+    CacheHandler.set_client(None)
+    RedditHttpClient.set_client(None)
+    ElasticsearchService.set_client(None)
+    ElasticsearchService.set_async_client(None)
+    set_governor(RateLimitGovernor(REDDIT_ACCESS_TOKENS, capacity=REDDIT_RATELIMIT_REQUESTS / max(workers, 1)))
+    set_breaker(None)
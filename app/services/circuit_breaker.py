@@ -0,0 +1,134 @@
+from typing import Dict, Optional
+import logging
+import time
+import os
+
+REDDIT_CIRCUIT_ENABLED = os.getenv("REDDIT_CIRCUIT_ENABLED", "true").lower() == "true"
+# Falhas consecutivas (timeouts, erros de conexão e 5xx) que abrem o circuito
+REDDIT_CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("REDDIT_CIRCUIT_FAILURE_THRESHOLD", 5))
+# Tempo (segundos) com o circuito aberto antes de deixar passar as chamadas de teste (half-open)
+REDDIT_CIRCUIT_OPEN_SECONDS = float(os.getenv("REDDIT_CIRCUIT_OPEN_SECONDS", 30))
+# Chamadas de teste simultâneas no estado half-open
+REDDIT_CIRCUIT_HALF_OPEN_PROBES = int(os.getenv("REDDIT_CIRCUIT_HALF_OPEN_PROBES", 1))
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+# Valor do estado no /metrics (gauge api_circuit_breaker_state)
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+logger = logging.getLogger(__name__)
+
+class CircuitOpen(Exception):
+    """Lançada quando o circuito está aberto e a chamada é recusada sem ir ao Reddit."""
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Circuito do Reddit aberto; nova tentativa em {retry_after:.1f}s.")
+
+class CircuitBreaker:
+    """
+    Circuit breaker das chamadas ao Reddit, por processo.
+
+    Depois de `failure_threshold` falhas consecutivas o circuito abre e as chamadas são recusadas na
+    hora (CircuitOpen) por `open_seconds`. Em seguida, no estado half-open, até `half_open_probes`
+    chamadas passam como teste: um sucesso fecha o circuito e uma falha o abre de novo.
+
+    Qualquer resposta abaixo de 500 (inclusive 404 e 429) conta como sucesso: o Reddit respondeu.
+    """
+    def __init__(
+        self,
+        failure_threshold: int = REDDIT_CIRCUIT_FAILURE_THRESHOLD,
+        open_seconds: float = REDDIT_CIRCUIT_OPEN_SECONDS,
+        half_open_probes: int = REDDIT_CIRCUIT_HALF_OPEN_PROBES,
+        enabled: bool = REDDIT_CIRCUIT_ENABLED
+    ):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.enabled = enabled
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes = 0
+        self.opened = 0
+        self.rejected = 0
+        self.failures = 0
+        self.successes = 0
+
+    def retry_after(self, now: Optional[float] = None) -> float:
+        now = time.monotonic() if now is None else now
+        return max(self.opened_at + self.open_seconds - now, 0.0)
+
+    def before_call(self) -> None:
+        """
+        Reserva a passagem de uma chamada; toda reserva termina em `record_success`, `record_failure` ou `release`.
+
+        Raises:
+            CircuitOpen: Se o circuito estiver aberto ou as chamadas de teste do half-open já estiverem em andamento.
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpen(self.retry_after(now))
+            self.state = HALF_OPEN
+            self.probes = 0
+            logger.info("Circuito do Reddit em half-open: testando com novas chamadas.")
+        if self.state == HALF_OPEN:
+            if self.probes >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpen(self.retry_after(now))
+            self.probes += 1
+
+    def release(self) -> None:
+        """Libera a reserva de uma chamada que não chegou a ter resultado (ex: sem orçamento, cancelada)."""
+        if self.state == HALF_OPEN and self.probes > 0:
+            self.probes -= 1
+
+    def record_success(self) -> None:
+        self.successes += 1
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info("Circuito do Reddit fechado: chamada de teste bem-sucedida.")
+            self.state = CLOSED
+            self.probes = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        if not self.enabled:
+            return
+        if self.state == HALF_OPEN or (self.state == CLOSED and self.consecutive_failures >= self.failure_threshold):
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+            self.probes = 0
+            self.opened += 1
+            logger.warning(
+                f"Circuito do Reddit aberto após {self.consecutive_failures} falha(s) consecutiva(s); "
+                f"chamadas recusadas por {self.open_seconds:.0f}s."
+            )
+
+    def stats(self) -> Dict:
+        return {
+            "state": STATE_CODES[self.state],
+            "consecutive_failures": self.consecutive_failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "successes": self.successes
+        }
+
+_breaker: Optional[CircuitBreaker] = None
+
+def get_breaker() -> CircuitBreaker:
+    global _breaker
+    if _breaker is None:
+        _breaker = CircuitBreaker()
+    return _breaker
+
+def set_breaker(breaker: Optional[CircuitBreaker]) -> None:
+    """Substitui o circuit breaker global (usado em testes e após o fork dos workers)."""
+    global _breaker
+    _breaker = breaker
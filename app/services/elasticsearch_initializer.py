@@ -1,6 +1,7 @@
 import os
 import requests
 from elasticsearch import Elasticsearch
+from services.index_templates import put_templates, ensure_posts_index, ensure_logs_index
 
 ES_HOST = os.getenv("ELASTICSEARCH_HOST", "localhost")
 ES_PORT = os.getenv("ELASTICSEARCH_PORT", 9200)
@@ -34,54 +35,21 @@ def create_index_pattern(index_name: str):
         print(f"Erro ao criar o Index Pattern: {response.status_code} - {response.text}")
 
 def create_index_if_not_exists():
+    """
+    Aplica os templates versionados e cria os índices de posts e logs (atrás de seus aliases) se ainda não existirem.
+
+    Índices já existentes não são alterados; para mudar o mapping use `python -m services.index_templates migrate`.
+    """
     es = Elasticsearch([f"http://{ES_HOST}:{ES_PORT}"])
+    put_templates(es, ELASTICSEARCH_INDEX_POSTS, ELASTICSEARCH_INDEX_LOGS)
 
-    if not es.indices.exists(index=ELASTICSEARCH_INDEX_POSTS):
-        es.indices.create(
-            index=ELASTICSEARCH_INDEX_POSTS,
-            body={
-                "settings": {
-                    "number_of_shards": 1,
-                    "number_of_replicas": 1
-                },
-                "mappings": {
-                    "properties": {
-                        "title": {"type": "text"},
-                        "author": {"type": "text"},
-                        "url": {"type": "text"},
-                        "created_utc": {"type": "date"},
-                        "score": {"type": "integer"}
-                    }
-                }
-            }
-        )
+    if ensure_posts_index(es, ELASTICSEARCH_INDEX_POSTS):
         print(f"Índice {ELASTICSEARCH_INDEX_POSTS} criado no Elasticsearch!")
         create_index_pattern(str(ELASTICSEARCH_INDEX_POSTS))
 
-    if not es.indices.exists(index=ELASTICSEARCH_INDEX_LOGS):
-        es.indices.create(
-            index=ELASTICSEARCH_INDEX_LOGS,
-            body={
-                "settings": {
-                    "number_of_shards": 1,
-                    "number_of_replicas": 1
-                },
-                "mappings": {
-                    "properties": {
-                        "timestamp": {
-                            "type": "date",
-                            "format": "strict_date_time"  
-                        },
-                        "log_level": {"type": "keyword"},
-                        "message": {"type": "text"},
-                        "service": {"type": "keyword"},
-                        "hostname": {"type": "keyword"}
-                    }
-                }
-            }
-        )
+    if ensure_logs_index(es, ELASTICSEARCH_INDEX_LOGS):
         print(f"Índice {ELASTICSEARCH_INDEX_LOGS} criado no Elasticsearch!")
         create_index_pattern(str(ELASTICSEARCH_INDEX_LOGS))
 
-
-create_index_if_not_exists()
+if __name__ == "__main__":
+    create_index_if_not_exists()
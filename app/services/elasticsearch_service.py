@@ -1,66 +1,199 @@
-from elasticsearch import Elasticsearch
-from typing import List, Dict
+from elasticsearch import Elasticsearch, AsyncElasticsearch
+from services.index_templates import put_templates, ensure_posts_index
+from metrics.instrumentation import Metrics
+from typing import Any, List, Dict, Optional, Tuple
+import asyncio
+import base64
+import json
 import os
 
 ES_HOST = os.getenv("ELASTICSEARCH_HOST", "localhost")
 ES_PORT = os.getenv("ELASTICSEARCH_PORT", 9200)
+ELASTICSEARCH_INDEX_LOGS = os.getenv("ELASTICSEARCH_INDEX_LOGS", "logs_sistema")
+ES_SEARCH_TIMEOUT = float(os.getenv("ES_SEARCH_TIMEOUT", 5))
 
-es = Elasticsearch([f"http://{ES_HOST}:{ES_PORT}"])
+# Campos devolvidos pela busca (_source filtering): apenas os do modelo Post trafegam pela rede
+POST_FIELDS = ["id", "subreddit", "title", "author", "url", "created_utc", "score"]
+SEARCH_FIELDS = ["title", "author", "url", "score", "created_utc"]
+SEARCH_SORTS = ["relevance", "score", "created_utc"]
+SEARCH_MAX_SIZE = int(os.getenv("SEARCH_MAX_SIZE", 100))
+
+_es: Optional[Elasticsearch] = None
+_async_es: Optional[AsyncElasticsearch] = None
+_async_loop: Optional[asyncio.AbstractEventLoop] = None
 
 class ElasticsearchService:
+    @staticmethod
+    def get_client() -> Elasticsearch:
+        """Cliente síncrono compartilhado (indexação em lote e templates), criado no primeiro uso."""
+        global _es
+        if _es is None:
+            _es = Elasticsearch([f"http://{ES_HOST}:{ES_PORT}"])
+        return _es
+
+    @staticmethod
+    def set_client(client: Optional[Elasticsearch]) -> None:
+        """Substitui o cliente síncrono (usado em testes)."""
+        global _es
+        _es = client
+
     @staticmethod
     def is_connected() -> bool:
-        return es.ping()
+        return ElasticsearchService.get_client().ping()
+
+    @staticmethod
+    async def ping() -> bool:
+        """Verifica o cluster pelo cliente assíncrono, sem bloquear o event loop."""
+        try:
+            return bool(await ElasticsearchService.get_async_client().ping())
+        except Exception:
+            return False
 
     @staticmethod
     def create_index_if_not_exists():
-        if not es.indices.exists(index="posts"):
-            es.indices.create(
-                index="posts",
-                body={
-                    "settings": {
-                        "number_of_shards": 1,
-                        "number_of_replicas": 1
-                    },
-                    "mappings": {
-                        "properties": {
-                            "title": {"type": "text"},
-                            "author": {"type": "text"},
-                            "url": {"type": "text"},
-                            "created_utc": {"type": "date"},
-                            "score": {"type": "integer"}
-                        }
-                    }
-                }
-            )
+        """Cria o índice de posts pelo template versionado (ver `services.index_templates`), atrás do alias `posts`."""
+        es = ElasticsearchService.get_client()
+        put_templates(es, "posts", ELASTICSEARCH_INDEX_LOGS)
+        if ensure_posts_index(es, "posts"):
             print("Índice 'posts' criado no Elasticsearch!")
 
     @staticmethod
     def index_post(post_id: int, post_data: Dict) -> Dict:
-        response = es.index(index="posts", id=post_id, document=post_data)
+        response = ElasticsearchService.get_client().index(index="posts", id=post_id, document=post_data)
         return response
 
     @staticmethod
-    def search_posts(field: str, query: str) -> List[Dict]:
+    def bulk_index_posts(posts: List[Dict]) -> Dict:
+        """
+        Indexa vários posts com uma única requisição `_bulk`.
+
+        :param posts: Posts formatados; o campo `id` (fullname do Reddit, ex: 't3_abc123') é usado como id do documento.
+        :return: Resposta da API `_bulk`.
+        """
+        operations = []
+        for post in posts:
+            operations.append({"index": {"_index": "posts", "_id": post["id"]}})
+            operations.append(post)
+        return ElasticsearchService.get_client().bulk(operations=operations)
+
+    @staticmethod
+    def get_async_client() -> AsyncElasticsearch:
+        """Cliente assíncrono compartilhado, recriado se o event loop mudar (a sessão aiohttp é presa ao loop)."""
+        global _async_es, _async_loop
+        loop = asyncio.get_running_loop()
+        if _async_es is None or _async_loop is not loop:
+            _async_es = AsyncElasticsearch([f"http://{ES_HOST}:{ES_PORT}"], request_timeout=ES_SEARCH_TIMEOUT)
+            _async_loop = loop
+        return _async_es
+
+    @staticmethod
+    def set_async_client(client: Optional[AsyncElasticsearch]) -> None:
+        """Substitui o cliente assíncrono (usado em testes)."""
+        global _async_es, _async_loop
+        _async_es = client
+        _async_loop = asyncio.get_running_loop() if client is not None else None
+
+    @staticmethod
+    async def close_async_client() -> None:
+        global _async_es, _async_loop
+        if _async_es is not None and _async_loop is asyncio.get_running_loop():
+            await _async_es.close()
+        _async_es = None
+        _async_loop = None
+
+    @staticmethod
+    def encode_cursor(sort_values: List[Any]) -> str:
+        return base64.urlsafe_b64encode(json.dumps(sort_values).encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str) -> List[Any]:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except (ValueError, TypeError):
+            raise ValueError("Cursor de paginação inválido.")
+        if not isinstance(values, list):
+            raise ValueError("Cursor de paginação inválido.")
+        return values
+
+    @staticmethod
+    def build_search(
+        query: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        score_min: Optional[int] = None,
+        score_max: Optional[int] = None,
+        created_from: Optional[int] = None,
+        created_to: Optional[int] = None,
+        sort: str = "relevance",
+        order: str = "desc",
+        size: int = 10,
+        cursor: Optional[str] = None
+    ) -> Dict:
+        """
+        Monta os parâmetros da busca: consulta em vários campos, filtros de intervalo, ordenação e cursor.
+
+        :param fields: Campos pesquisados com `query` (padrão: title); em campos numéricos a comparação é exata.
+        :param created_from: Limite inferior de `created_utc`, em segundos desde a época (idem `created_to`).
+        :param sort: 'relevance', 'score' ou 'created_utc'; o `id` desempata para a paginação ser estável.
+        :param cursor: Valor de `X-Next-Cursor` da página anterior (search_after).
+        :return: Argumentos para `AsyncElasticsearch.search`.
         """
-        Realiza uma pesquisa em um campo específico no Elasticsearch.
-        
-        :param field: O campo onde a pesquisa será realizada (ex: 'title', 'author', etc.)
-        :param query: O termo de pesquisa.
-        :return: Lista de posts que correspondem à pesquisa.
+        fields = fields or ["title"]
+        invalid = [field for field in fields if field not in SEARCH_FIELDS]
+        if invalid:
+            raise ValueError(f"Campo '{invalid[0]}' não é válido. Escolha um dos seguintes campos: {', '.join(SEARCH_FIELDS)}")
+        if sort not in SEARCH_SORTS:
+            raise ValueError(f"Ordenação '{sort}' não é válida. Escolha uma das seguintes: {', '.join(SEARCH_SORTS)}")
+        if not 1 <= size <= SEARCH_MAX_SIZE:
+            raise ValueError(f"O tamanho da página deve estar entre 1 e {SEARCH_MAX_SIZE}.")
+
+        must = []
+        if query:
+            # lenient: termos não numéricos são ignorados nos campos score/created_utc em vez de gerar erro
+            must.append({"multi_match": {"query": query, "fields": fields, "lenient": True}})
+        filters = []
+        if score_min is not None or score_max is not None:
+            filters.append({"range": {"score": {key: value for key, value in (("gte", score_min), ("lte", score_max)) if value is not None}}})
+        if created_from is not None or created_to is not None:
+            bounds = {key: value for key, value in (("gte", created_from), ("lte", created_to)) if value is not None}
+            filters.append({"range": {"created_utc": {**bounds, "format": "epoch_second"}}})
+
+        if sort == "relevance":
+            sort_clause = [{"_score": order}, {"id": "asc"}]
+        else:
+            sort_clause = [{sort: order}, {"id": "asc"}]
+
+        search = {
+            "index": "posts",
+            "query": {"bool": {"must": must or [{"match_all": {}}], "filter": filters}},
+            "sort": sort_clause,
+            "size": size,
+            "source": POST_FIELDS,
+            "filter_path": ["hits.hits._source", "hits.hits.sort"]
+        }
+        if cursor:
+            search["search_after"] = ElasticsearchService.decode_cursor(cursor)
+        return search
+
+    @staticmethod
+    async def search_posts(
+        fields: Optional[List[str]] = None,
+        query: Optional[str] = None,
+        size: int = 10,
+        cursor: Optional[str] = None,
+        **options
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Pesquisa posts no Elasticsearch sem bloquear o event loop, uma página por vez.
+
+        Aceita os mesmos filtros de `build_search` (score_min, score_max, created_from, created_to, sort, order).
+
+        :return: Os posts da página e o cursor da próxima página (None na última).
+        :raises ValueError: Para campos, ordenação, tamanho ou cursor inválidos.
         """
-        valid_fields = ["title", "author", "url", "score", "created_utc"]
-        if field not in valid_fields:
-            raise ValueError(f"Campo '{field}' não é válido. Escolha um dos seguintes campos: {', '.join(valid_fields)}")
-        
-        response = es.search(
-            index="posts",  
-            body={
-                "query": {
-                    "match": { 
-                        field: query  
-                    }
-                }
-            }
-        )
-        return [hit["_source"] for hit in response["hits"]["hits"]]
+        search = ElasticsearchService.build_search(query=query, fields=fields, size=size, cursor=cursor, **options)
+        with Metrics.stage("es_search"):
+            response = await ElasticsearchService.get_async_client().search(**search)
+        # Com filter_path, uma busca sem resultados volta como `{}`
+        hits = response.body.get("hits", {}).get("hits", [])
+        next_cursor = ElasticsearchService.encode_cursor(hits[-1]["sort"]) if len(hits) == size else None
+        return [hit["_source"] for hit in hits], next_cursor
@@ -0,0 +1,74 @@
+from typing import Optional
+import os
+import httpx
+
+REDDIT_HTTP_MAX_CONNECTIONS = int(os.getenv("REDDIT_HTTP_MAX_CONNECTIONS", 100))
+REDDIT_HTTP_MAX_KEEPALIVE = int(os.getenv("REDDIT_HTTP_MAX_KEEPALIVE", 20))
+REDDIT_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("REDDIT_HTTP_KEEPALIVE_EXPIRY", 30))
+REDDIT_HTTP2 = os.getenv("REDDIT_HTTP2", "true").lower() == "true"
+REDDIT_HTTP_RETRIES = int(os.getenv("REDDIT_HTTP_RETRIES", 1))
+
+# Timeouts por fase da requisição (em segundos)
+REDDIT_CONNECT_TIMEOUT = float(os.getenv("REDDIT_CONNECT_TIMEOUT", 3))
+REDDIT_READ_TIMEOUT = float(os.getenv("REDDIT_READ_TIMEOUT", 10))
+REDDIT_WRITE_TIMEOUT = float(os.getenv("REDDIT_WRITE_TIMEOUT", 5))
+REDDIT_POOL_TIMEOUT = float(os.getenv("REDDIT_POOL_TIMEOUT", 2))
+
+_client: Optional[httpx.AsyncClient] = None
+
+class RedditHttpClient:
+    """
+    Cliente HTTP compartilhado (pool de conexões, keep-alive e HTTP/2) usado nas chamadas ao Reddit.
+
+    O cliente é criado no startup da aplicação e fechado no shutdown, de forma que as conexões
+    TCP/TLS com oauth.reddit.com sejam reaproveitadas entre requisições.
+    """
+    @staticmethod
+    def build_transport() -> httpx.AsyncHTTPTransport:
+        limits = httpx.Limits(
+            max_connections=REDDIT_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=REDDIT_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=REDDIT_HTTP_KEEPALIVE_EXPIRY
+        )
+        return httpx.AsyncHTTPTransport(http2=REDDIT_HTTP2, limits=limits, retries=REDDIT_HTTP_RETRIES)
+
+    @staticmethod
+    def build(transport: Optional[httpx.AsyncBaseTransport] = None) -> httpx.AsyncClient:
+        """
+        Cria um novo AsyncClient configurado.
+
+        Args:
+            transport (httpx.AsyncBaseTransport, opcional): Transporte alternativo (ex: mock em testes).
+        """
+        timeout = httpx.Timeout(
+            connect=REDDIT_CONNECT_TIMEOUT,
+            read=REDDIT_READ_TIMEOUT,
+            write=REDDIT_WRITE_TIMEOUT,
+            pool=REDDIT_POOL_TIMEOUT
+        )
+        return httpx.AsyncClient(transport=transport or RedditHttpClient.build_transport(), timeout=timeout)
+
+    @staticmethod
+    def get_client() -> httpx.AsyncClient:
+        """Retorna o cliente compartilhado, criando-o caso o startup ainda não tenha ocorrido."""
+        global _client
+        if _client is None or _client.is_closed:
+            _client = RedditHttpClient.build()
+        return _client
+
+    @staticmethod
+    def set_client(client: Optional[httpx.AsyncClient]) -> None:
+        """Substitui o cliente compartilhado (usado em testes e benchmarks)."""
+        global _client
+        _client = client
+
+    @staticmethod
+    async def startup() -> None:
+        RedditHttpClient.get_client()
+
+    @staticmethod
+    async def shutdown() -> None:
+        global _client
+        if _client is not None:
+            await _client.aclose()
+            _client = None
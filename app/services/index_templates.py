@@ -0,0 +1,283 @@
+"""
+Definição única dos índices do Elasticsearch: templates versionados, aliases, ILM dos logs e migração.
+
+Os posts vivem em índices versionados (`posts_v2`, `posts_v3`, ...) atrás do alias `posts`, usado para
+leitura e escrita; mudar o mapping é criar uma nova versão e trocar o alias com `migrate_posts`.
+Os logs são escritos no alias `logs_sistema`, que aponta para o índice corrente da série
+`logs_sistema-000001`, `logs_sistema-000002`, ...; o ILM faz o rollover e apaga os índices antigos.
+
+Uso: `python -m services.index_templates apply` ou `python -m services.index_templates migrate posts|logs`.
+"""
+from elasticsearch import Elasticsearch, BadRequestError
+from typing import Dict, List, Optional
+import argparse
+import logging
+import os
+
+ES_HOST = os.getenv("ELASTICSEARCH_HOST", "localhost")
+ES_PORT = os.getenv("ELASTICSEARCH_PORT", 9200)
+
+# Incrementar ao mudar POSTS_MAPPINGS/POSTS_SETTINGS e rodar `migrate posts`
+POSTS_TEMPLATE_VERSION = 2
+ES_POSTS_REPLICAS = int(os.getenv("ES_POSTS_REPLICAS", 1))
+# Os posts são gravados em lote e não precisam aparecer na busca no mesmo segundo
+ES_POSTS_REFRESH_INTERVAL = os.getenv("ES_POSTS_REFRESH_INTERVAL", "10s")
+
+LOGS_TEMPLATE_VERSION = 1
+ES_LOGS_REFRESH_INTERVAL = os.getenv("ES_LOGS_REFRESH_INTERVAL", "30s")
+ES_LOGS_ROLLOVER_MAX_SIZE = os.getenv("ES_LOGS_ROLLOVER_MAX_SIZE", "5gb")
+ES_LOGS_ROLLOVER_MAX_AGE = os.getenv("ES_LOGS_ROLLOVER_MAX_AGE", "1d")
+ES_LOGS_RETENTION = os.getenv("ES_LOGS_RETENTION", "30d")
+
+logger = logging.getLogger(__name__)
+
+POSTS_SETTINGS = {
+    "number_of_shards": 1,
+    "number_of_replicas": ES_POSTS_REPLICAS,
+    "refresh_interval": ES_POSTS_REFRESH_INTERVAL
+}
+
+POSTS_MAPPINGS = {
+    "dynamic": False,
+    "properties": {
+        "id": {"type": "keyword"},
+        "subreddit": {"type": "keyword"},
+        "title": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+        "author": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}},
+        "url": {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 2048}}},
+        "created_utc": {"type": "date", "format": "epoch_second"},
+        "score": {"type": "integer"}
+    }
+}
+
+LOGS_SETTINGS = {
+    "number_of_shards": 1,
+    "number_of_replicas": 1,
+    "refresh_interval": ES_LOGS_REFRESH_INTERVAL
+}
+
+LOGS_MAPPINGS = {
+    "properties": {
+        "timestamp": {"type": "date", "format": "strict_date_time"},
+        "log_level": {"type": "keyword"},
+        "message": {"type": "text"},
+        "service": {"type": "keyword"},
+        "hostname": {"type": "keyword"}
+    }
+}
+
+def get_client() -> Elasticsearch:
+    return Elasticsearch([f"http://{ES_HOST}:{ES_PORT}"])
+
+def posts_index_name(alias: str, version: int = POSTS_TEMPLATE_VERSION) -> str:
+    return f"{alias}_v{version}"
+
+def logs_policy_name(alias: str) -> str:
+    return f"{alias}_policy"
+
+def put_templates(es: Elasticsearch, posts_alias: str, logs_alias: str) -> None:
+    """Grava (ou atualiza) a política de ILM dos logs e os templates de posts e logs."""
+    es.ilm.put_lifecycle(
+        name=logs_policy_name(logs_alias),
+        policy={
+            "phases": {
+                "hot": {
+                    "actions": {
+                        "rollover": {"max_size": ES_LOGS_ROLLOVER_MAX_SIZE, "max_age": ES_LOGS_ROLLOVER_MAX_AGE}
+                    }
+                },
+                "delete": {"min_age": ES_LOGS_RETENTION, "actions": {"delete": {}}}
+            }
+        }
+    )
+    es.indices.put_index_template(
+        name=f"{posts_alias}_template",
+        index_patterns=[f"{posts_alias}_v*"],
+        version=POSTS_TEMPLATE_VERSION,
+        template={"settings": POSTS_SETTINGS, "mappings": POSTS_MAPPINGS}
+    )
+    es.indices.put_index_template(
+        name=f"{logs_alias}_template",
+        index_patterns=[f"{logs_alias}-*"],
+        version=LOGS_TEMPLATE_VERSION,
+        template={
+            "settings": {
+                **LOGS_SETTINGS,
+                "index.lifecycle.name": logs_policy_name(logs_alias),
+                "index.lifecycle.rollover_alias": logs_alias
+            },
+            "mappings": LOGS_MAPPINGS
+        }
+    )
+
+def _create_index(es: Elasticsearch, index: str, **kwargs) -> bool:
+    """Cria o índice; se outro processo o criou antes (corrida entre workers), não é erro. :return: True se criou."""
+    try:
+        es.indices.create(index=index, **kwargs)
+    except BadRequestError as e:
+        error = e.body.get("error") if isinstance(e.body, dict) else None
+        if isinstance(error, dict) and error.get("type") == "resource_already_exists_exception":
+            return False
+        raise
+    return True
+
+def ensure_posts_index(es: Elasticsearch, alias: str) -> bool:
+    """
+    Cria o índice versionado de posts com o alias de escrita, se nem o alias nem um índice com esse nome existirem.
+
+    Um índice antigo criado diretamente com o nome do alias é mantido como está: a migração (reindex com
+    bloqueio de escrita) é pesada demais para o bootstrap dos workers e fica para `migrate posts`.
+
+    :return: True se o índice foi criado.
+    """
+    if es.indices.exists_alias(name=alias):
+        return False
+    if es.indices.exists(index=alias):
+        logger.warning(
+            f"Índice legado '{alias}' (mapping dinâmico, sem `id` keyword para o desempate da busca) encontrado; "
+            f"execute `python -m services.index_templates migrate posts` para movê-lo para trás do alias."
+        )
+        return False
+    return _create_index(es, posts_index_name(alias), aliases={alias: {"is_write_index": True}})
+
+def ensure_logs_index(es: Elasticsearch, alias: str) -> bool:
+    """Cria o primeiro índice da série de logs (`<alias>-000001`) com o alias de rollover, se necessário."""
+    if es.indices.exists(index=alias):
+        return False
+    return _create_index(es, f"{alias}-000001", aliases={alias: {"is_write_index": True}})
+
+def _alias_targets(es: Elasticsearch, alias: str) -> List[str]:
+    """Índices atrás do alias; para um índice concreto com o nome do alias (legado), o próprio índice."""
+    if not es.indices.exists(index=alias):
+        return []
+    if es.indices.exists_alias(name=alias):
+        return list(es.indices.get_alias(name=alias).body)
+    return [alias]
+
+def _swap(es: Elasticsearch, alias: str, sources: List[str], target: str) -> None:
+    """Aponta o alias para `target` em uma única operação atômica (leitores nunca ficam sem índice)."""
+    actions = []
+    for source in sources:
+        if source == alias:
+            # Índice legado com o nome do alias: precisa ser removido na mesma operação que cria o alias
+            actions.append({"remove_index": {"index": source}})
+        else:
+            actions.append({"remove": {"index": source, "alias": alias}})
+    actions.append({"add": {"index": target, "alias": alias, "is_write_index": True}})
+    es.indices.update_aliases(actions=actions)
+
+def _set_write_block(es: Elasticsearch, indices: List[str], blocked: bool) -> None:
+    es.indices.put_settings(index=indices, settings={"index.blocks.write": blocked})
+
+def _catch_up_and_swap(es: Elasticsearch, alias: str, sources: List[str], target: str, only_missing: bool = False) -> None:
+    """
+    Bloqueia a escrita nas origens, copia o que foi gravado nelas desde a primeira cópia e troca o alias.
+
+    Com as origens bloqueadas, a segunda passada vê o estado final delas e nada gravado antes da troca se
+    perde; as escritas feitas durante a janela falham em vez de sumirem (posts com falha voltam a ser
+    indexados na próxima busca da listagem). Os índices antigos que continuam existindo são desbloqueados.
+    """
+    _set_write_block(es, sources, True)
+    swapped = False
+    try:
+        _reindex(es, sources, target, only_missing=only_missing)
+        _swap(es, alias, sources, target)
+        swapped = True
+    finally:
+        # Após a troca, o índice legado com o nome do alias já foi removido
+        remaining = [source for source in sources if not (swapped and source == alias)]
+        if remaining:
+            _set_write_block(es, remaining, False)
+
+def _reindex(es: Elasticsearch, sources: List[str], target: str, only_missing: bool = False) -> Dict:
+    dest = {"index": target}
+    if only_missing:
+        dest["op_type"] = "create"
+    return es.reindex(
+        source={"index": sources},
+        dest=dest,
+        conflicts="proceed",
+        wait_for_completion=True,
+        refresh=True
+    ).body
+
+def migrate_posts(
+    es: Elasticsearch,
+    alias: str,
+    version: int = POSTS_TEMPLATE_VERSION,
+    delete_old: bool = False
+) -> Optional[str]:
+    """
+    Migra os posts para o índice `<alias>_v<version>` sem indisponibilidade.
+
+    O novo índice é criado pelo template e recebe uma cópia (reindex) dos índices atuais. Em seguida a
+    escrita nos índices antigos é bloqueada, uma segunda passada copia os posts criados ou atualizados
+    durante a primeira e só então o alias é trocado atomicamente.
+
+    :return: O nome do novo índice, ou None se o alias já aponta para ele.
+    """
+    target = posts_index_name(alias, version)
+    sources = _alias_targets(es, alias)
+    if sources == [target]:
+        return None
+    if not es.indices.exists(index=target):
+        _create_index(es, target)
+    if sources:
+        _reindex(es, sources, target)
+        _catch_up_and_swap(es, alias, sources, target)
+        old = [source for source in sources if source != alias]
+        if old and delete_old:
+            es.indices.delete(index=old)
+    else:
+        _swap(es, alias, [], target)
+    return target
+
+def migrate_logs(es: Elasticsearch, alias: str) -> Optional[str]:
+    """
+    Converte um índice de logs legado (criado com o nome do alias) para a série com rollover/ILM.
+
+    Como em `migrate_posts`, a escrita no índice legado é bloqueada antes da segunda passada, que copia
+    os logs gravados durante a primeira cópia; o índice legado só é removido na troca do alias.
+
+    :return: O índice de escrita criado, ou None se os logs já estão atrás do alias.
+    """
+    if es.indices.exists_alias(name=alias):
+        return None
+    target = f"{alias}-000001"
+    if not es.indices.exists(index=target):
+        _create_index(es, target)
+    if es.indices.exists(index=alias):
+        _reindex(es, [alias], target)
+        _catch_up_and_swap(es, alias, [alias], target, only_missing=True)
+    else:
+        _swap(es, alias, [], target)
+    return target
+
+def main(argv: Optional[List[str]] = None) -> None:
+    posts_alias = os.getenv("ELASTICSEARCH_INDEX_POSTS", "posts")
+    logs_alias = os.getenv("ELASTICSEARCH_INDEX_LOGS", "logs_sistema")
+
+    parser = argparse.ArgumentParser(description="Templates, aliases e migração dos índices do Elasticsearch.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("apply", help="Grava templates e políticas e cria os índices ausentes.")
+    migrate = commands.add_parser("migrate", help="Reindexa e troca o alias sem indisponibilidade.")
+    migrate.add_argument("target", choices=["posts", "logs"])
+    migrate.add_argument("--version", type=int, default=POSTS_TEMPLATE_VERSION, help="Versão do índice de posts.")
+    migrate.add_argument("--delete-old", action="store_true", help="Apaga os índices de posts antigos após a troca.")
+    args = parser.parse_args(argv)
+
+    es = get_client()
+    put_templates(es, posts_alias, logs_alias)
+    if args.command == "apply":
+        ensure_posts_index(es, posts_alias)
+        ensure_logs_index(es, logs_alias)
+        print("Templates e índices aplicados.")
+    elif args.target == "posts":
+        target = migrate_posts(es, posts_alias, args.version, args.delete_old)
+        print(f"Alias '{posts_alias}' -> '{target}'." if target else f"Alias '{posts_alias}' já está na versão {args.version}.")
+    else:
+        target = migrate_logs(es, logs_alias)
+        print(f"Alias '{logs_alias}' -> '{target}'." if target else f"Alias '{logs_alias}' já usa rollover.")
+
+if __name__ == "__main__":
+    main()
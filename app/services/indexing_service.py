@@ -0,0 +1,213 @@
+from services.elasticsearch_service import ElasticsearchService
+from services.search_service import SearchService
+from metrics.instrumentation import Metrics
+from cache.cache_handler import CacheHandler
+from typing import List, Dict, Optional, Tuple
+import asyncio
+import hashlib
+import logging
+import orjson
+import time
+import os
+
+INDEXER_QUEUE_SIZE = int(os.getenv("INDEXER_QUEUE_SIZE", 10000))
+INDEXER_BATCH_SIZE = int(os.getenv("INDEXER_BATCH_SIZE", 500))
+INDEXER_FLUSH_INTERVAL = float(os.getenv("INDEXER_FLUSH_INTERVAL", 1))
+INDEXER_SHUTDOWN_TIMEOUT = float(os.getenv("INDEXER_SHUTDOWN_TIMEOUT", 10))
+# Os posts só aparecem na busca após o refresh do índice (ES_POSTS_REFRESH_INTERVAL): a geração da busca
+# é incrementada logo após a gravação e de novo depois desse intervalo
+INDEXER_REFRESH_DELAY = float(os.getenv("INDEXER_REFRESH_DELAY", 11))
+# Digest do conteúdo de cada post gravado, guardado no Redis (`indexed:<id>`) e compartilhado entre os
+# workers, para não regravar no Elasticsearch os posts que não mudaram. Depois de INDEXER_DEDUP_TTL
+# segundos o post é regravado mesmo sem mudança.
+INDEXER_DEDUP_ENABLED = os.getenv("INDEXER_DEDUP_ENABLED", "true").lower() == "true"
+INDEXER_DEDUP_TTL = int(os.getenv("INDEXER_DEDUP_TTL", 3600))
+
+logger = logging.getLogger(__name__)
+
+_FLUSH = object()
+
+_queue: Optional[asyncio.Queue] = None
+_worker: Optional[asyncio.Task] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_generation_bump: Optional[asyncio.Task] = None
+_generation_bump_due = 0.0
+_stats = {
+    "indexed": 0,
+    "unchanged": 0,
+    "failed": 0,
+    "dropped": 0,
+    "batches": 0,
+    "last_latency_ms": 0.0,
+    "total_latency_ms": 0.0
+}
+
+class PostIndexer:
+    """
+    Pipeline de indexação de posts fora do caminho da requisição.
+
+    Os posts formatados são colocados em uma fila e um worker em background os grava
+    no Elasticsearch com uma única requisição `_bulk` por lote (tamanho ou janela de tempo).
+    Posts com o mesmo conteúdo da última gravação bem-sucedida (em qualquer worker) não são regravados.
+    """
+    @staticmethod
+    def content_hash(post: Dict) -> str:
+        """
+        Digest estável do conteúdo do post (igual em todos os processos, ao contrário do `hash` nativo).
+
+        É calculado uma vez por busca no Reddit e reaproveitado pela deduplicação e pelo ETag da listagem.
+        """
+        return hashlib.blake2b(orjson.dumps(post, option=orjson.OPT_SORT_KEYS), digest_size=8).hexdigest()
+
+    @staticmethod
+    def dedup_key(post_id: str) -> str:
+        return f"indexed:{post_id}"
+
+    @staticmethod
+    def _ensure_worker() -> None:
+        global _queue, _worker, _loop
+        loop = asyncio.get_running_loop()
+        if _worker is None or _worker.done() or _loop is not loop:
+            _queue = asyncio.Queue(maxsize=INDEXER_QUEUE_SIZE)
+            _loop = loop
+            _worker = loop.create_task(PostIndexer._run())
+
+    @staticmethod
+    def enqueue(posts: List[Dict], digests: Optional[List[str]] = None) -> None:
+        """
+        Agenda a indexação dos posts sem bloquear o chamador.
+
+        Args:
+            posts (List[Dict]): Posts formatados, com o fullname do Reddit (`t3_...`) no campo `id`.
+            digests (Optional[List[str]]): `content_hash` de cada post, se o chamador já o calculou.
+        """
+        PostIndexer._ensure_worker()
+        if digests is None:
+            digests = [PostIndexer.content_hash(post) for post in posts]
+        for post, digest in zip(posts, digests):
+            try:
+                _queue.put_nowait((post, digest))
+            except asyncio.QueueFull:
+                _stats["dropped"] += 1
+
+    @staticmethod
+    async def _next_batch() -> List[Tuple[Dict, str]]:
+        batch = []
+        deadline = time.monotonic() + INDEXER_FLUSH_INTERVAL
+        while len(batch) < INDEXER_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if batch and remaining <= 0:
+                break
+            try:
+                if batch:
+                    item = await asyncio.wait_for(_queue.get(), timeout=remaining)
+                else:
+                    item = await _queue.get()
+            except asyncio.TimeoutError:
+                break
+            if item is _FLUSH:
+                _queue.task_done()
+                break
+            batch.append(item)
+        return batch
+
+    @staticmethod
+    async def _run() -> None:
+        queue = _queue
+        while True:
+            batch = await PostIndexer._next_batch()
+            if not batch:
+                continue
+            try:
+                await PostIndexer._index_batch(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    @staticmethod
+    async def _changed(batch: List[Tuple[Dict, str]]) -> List[Tuple[Dict, str]]:
+        """Descarta os posts cujo digest é o da última gravação bem-sucedida (um MGET por lote)."""
+        if not INDEXER_DEDUP_ENABLED:
+            return batch
+        known = await CacheHandler.get_many([PostIndexer.dedup_key(post["id"]) for post, _ in batch], local=False)
+        changed = [(post, digest) for (post, digest), last in zip(batch, known) if last != digest]
+        _stats["unchanged"] += len(batch) - len(changed)
+        return changed
+
+    @staticmethod
+    async def _index_batch(batch: List[Tuple[Dict, str]]) -> None:
+        batch = await PostIndexer._changed(batch)
+        if not batch:
+            return
+        start = time.perf_counter()
+        try:
+            posts = [post for post, _ in batch]
+            with Metrics.stage("es_index"):
+                response = await asyncio.to_thread(ElasticsearchService.bulk_index_posts, posts)
+            failures = [item for item in response.get("items", []) if item.get("index", {}).get("error")]
+            if INDEXER_DEDUP_ENABLED:
+                # Só as gravações bem-sucedidas são lembradas: um post com falha é regravado na próxima busca
+                indexed = {
+                    PostIndexer.dedup_key(post["id"]): digest
+                    for (post, digest), item in zip(batch, response.get("items", []))
+                    if not item.get("index", {}).get("error")
+                }
+                await CacheHandler.set_many(indexed, ttl=INDEXER_DEDUP_TTL, local=False)
+            _stats["indexed"] += len(batch) - len(failures)
+            _stats["failed"] += len(failures)
+            if failures:
+                logger.error(f"Falha ao indexar {len(failures)} de {len(batch)} posts: {failures[0]['index']['error']}")
+            if len(failures) < len(batch):
+                await SearchService.bump_generation()
+                PostIndexer._schedule_generation_bump()
+        except Exception as e:
+            _stats["failed"] += len(batch)
+            logger.error(f"Erro ao enviar lote de {len(batch)} posts ao Elasticsearch: {e}")
+        finally:
+            latency_ms = (time.perf_counter() - start) * 1000
+            _stats["batches"] += 1
+            _stats["last_latency_ms"] = latency_ms
+            _stats["total_latency_ms"] += latency_ms
+            logger.info(f"Lote de {len(batch)} posts processado no Elasticsearch em {latency_ms:.1f} ms.")
+
+    @staticmethod
+    def _schedule_generation_bump() -> None:
+        global _generation_bump, _generation_bump_due
+        _generation_bump_due = time.monotonic() + INDEXER_REFRESH_DELAY
+        if _generation_bump is None or _generation_bump.done() or _generation_bump.get_loop() is not asyncio.get_running_loop():
+            _generation_bump = asyncio.ensure_future(PostIndexer._bump_after_refresh())
+
+    @staticmethod
+    async def _bump_after_refresh() -> None:
+        # Lotes gravados durante a espera adiam o incremento: um único incremento cobre todos eles
+        while (wait := _generation_bump_due - time.monotonic()) > 0:
+            await asyncio.sleep(wait)
+        await SearchService.bump_generation()
+
+    @staticmethod
+    def stats() -> Dict:
+        return {**_stats, "queued": _queue.qsize() if _queue is not None else 0}
+
+    @staticmethod
+    async def startup() -> None:
+        PostIndexer._ensure_worker()
+
+    @staticmethod
+    async def shutdown(timeout: float = INDEXER_SHUTDOWN_TIMEOUT) -> None:
+        """Aguarda a gravação dos posts pendentes (até `timeout` segundos) e encerra o worker."""
+        global _worker
+        if _worker is None:
+            return
+        if _loop is asyncio.get_running_loop():
+            try:
+                _queue.put_nowait(_FLUSH)
+            except asyncio.QueueFull:
+                pass
+            try:
+                await asyncio.wait_for(_queue.join(), timeout=timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"{_queue.qsize()} posts não foram indexados antes do shutdown.")
+            _worker.cancel()
+        if _generation_bump is not None:
+            _generation_bump.cancel()
+        _worker = None
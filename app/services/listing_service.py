@@ -0,0 +1,458 @@
+from services.reddit_service import RedditService, RedditAPIError, RedditRateLimitError, SubredditNotFound
+from services.rate_limit_governor import get_governor
+from services.indexing_service import PostIndexer
+from cache.cache_handler import CacheHandler
+from cache.single_flight import SingleFlight
+from cache.response_cache import ResponseCache
+from collections import Counter
+from typing import AsyncIterator, Awaitable, Callable, List, Dict, Optional, Set, Tuple, Union
+import asyncio
+import logging
+import json
+import time
+import os
+
+# Até CACHE_SOFT_TTL a listagem é servida como "hit"; entre o soft e o CACHE_HARD_TTL ela é servida
+# como "stale" enquanto uma atualização roda em background; depois do hard TTL a busca é síncrona.
+CACHE_SOFT_TTL = int(os.getenv("CACHE_SOFT_TTL", 300))
+CACHE_HARD_TTL = int(os.getenv("CACHE_HARD_TTL", 3600))
+# Tempo extra que a listagem fica no Redis para ser servida caso o Reddit falhe (429/5xx)
+CACHE_STALE_IF_ERROR_TTL = int(os.getenv("CACHE_STALE_IF_ERROR_TTL", 21600))
+# Tempo (segundos) que um subreddit inexistente fica marcado no cache, sem novas chamadas ao Reddit
+CACHE_NOT_FOUND_TTL = int(os.getenv("CACHE_NOT_FOUND_TTL", 120))
+# Lock distribuído no Redis para evitar que vários workers busquem a mesma chave ao mesmo tempo
+CACHE_DISTRIBUTED_LOCK = os.getenv("CACHE_DISTRIBUTED_LOCK", "false").lower() == "true"
+CACHE_LOCK_TTL_MS = int(os.getenv("CACHE_LOCK_TTL_MS", 10000))
+CACHE_LOCK_WAIT = float(os.getenv("CACHE_LOCK_WAIT", 5))
+CACHE_LOCK_POLL_INTERVAL = float(os.getenv("CACHE_LOCK_POLL_INTERVAL", 0.1))
+
+# Maior `limit` aceito pelo Reddit: cada listagem é buscada e cacheada uma vez nesse tamanho
+REDDIT_MAX_LIMIT = 100
+# Ordenações em que o Reddit ignora o parâmetro de período (`t`)
+PERIODLESS_SORT_TYPES = {"hot", "new", "rising"}
+
+# Busca paginada (stream NDJSON): número máximo de posts por stream. O ritmo das páginas é
+# controlado pelo RateLimitGovernor, que segura cada busca até haver orçamento no Reddit.
+STREAM_MAX_POSTS = int(os.getenv("STREAM_MAX_POSTS", 5000))
+
+# Consulta em lote: número máximo de buscas simultâneas no Reddit para os misses de um lote
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", 8))
+
+logger = logging.getLogger(__name__)
+
+_single_flight = SingleFlight()
+_background_refreshes: Set[asyncio.Task] = set()
+_lock_stats = {"acquired": 0, "waited": 0, "served_after_wait": 0}
+# Acessos por listagem ("subreddit:sort_type:period") desde o último envio ao PrewarmScheduler
+_popularity: Counter = Counter()
+_swr_stats = {"stale_served": 0, "stale_on_error": 0, "background_refreshes": 0, "background_failures": 0}
+_not_found_stats = {"hits": 0, "stored": 0}
+
+class ListingService:
+    """
+    Orquestra cache e busca no Reddit para as listagens de posts.
+
+    Cada (subreddit, sort_type, period) tem uma única listagem canônica no cache, buscada com o
+    limite máximo do Reddit e recortada para o `limit` pedido. As listagens são guardadas com o
+    instante da busca (`fetched_at`) e servidas no modelo stale-while-revalidate. Misses concorrentes para a mesma chave são coalescidos em uma única
+    busca no Reddit (single-flight por processo e, opcionalmente, lock no Redis entre workers).
+    """
+    @staticmethod
+    def normalize_period(sort_type: str, period: str) -> str:
+        return "none" if sort_type in PERIODLESS_SORT_TYPES else period
+
+    @staticmethod
+    def cache_key(subreddit: str, period: str, sort_type: str) -> str:
+        period = ListingService.normalize_period(sort_type, period)
+        return f"reddit_posts_{subreddit.lower()}_{sort_type}_{period}"
+
+    @staticmethod
+    def not_found_key(subreddit: str) -> str:
+        return f"reddit_not_found_{subreddit.lower()}"
+
+    @staticmethod
+    def popularity_member(subreddit: str, period: str, sort_type: str) -> str:
+        period = ListingService.normalize_period(sort_type, period)
+        return f"{subreddit.lower()}:{sort_type}:{period}"
+
+    @staticmethod
+    def drain_popularity() -> Dict[str, int]:
+        """Retorna e zera os acessos contados por listagem neste processo."""
+        counts = dict(_popularity)
+        _popularity.clear()
+        return counts
+
+    @staticmethod
+    async def get_posts(
+        subreddit: str,
+        token: Optional[str] = None,
+        period: str = "day",
+        limit: int = 10,
+        sort_type: str = "hot"
+    ) -> Tuple[List[Dict], str, str]:
+        """
+        Retorna os posts da listagem, do cache quando possível.
+
+        Returns:
+            Tuple[List[Dict], str, str]: Os posts, a origem ('cache' ou 'api') e o status do cache ('hit', 'stale' ou 'miss').
+
+        Raises:
+            RedditAPIError: Propagada da busca no Reddit quando não há listagem em cache para servir.
+        """
+        posts, origin, cache_status, _ = await ListingService.get_listing(subreddit, token, period, limit, sort_type)
+        return posts, origin, cache_status
+
+    @staticmethod
+    async def get_listing(
+        subreddit: str,
+        token: Optional[str] = None,
+        period: str = "day",
+        limit: int = 10,
+        sort_type: str = "hot"
+    ) -> Tuple[List[Dict], str, str, str]:
+        """Como `get_posts`, devolvendo também o ETag dos posts (o mesmo guardado com o corpo pronto)."""
+        cache_key = ListingService.cache_key(subreddit, period, sort_type)
+        fetch = lambda: ListingService._fetch_and_cache(cache_key, subreddit, token, period, sort_type)
+        _popularity[ListingService.popularity_member(subreddit, period, sort_type)] += 1
+
+        cached = ListingService._valid_entry(await CacheHandler.get_cache(cache_key))
+        entry, origin, cache_status = await ListingService._resolve(cache_key, cached, fetch)
+        posts = entry["posts"][:limit]
+        etag = ListingService.etag(entry, limit)
+
+        # Enquanto a listagem estiver fresca, as próximas chamadas podem ser servidas pelo corpo pronto
+        if cache_status == "miss":
+            fresh_for = CACHE_SOFT_TTL
+        elif cache_status == "hit":
+            fresh_for = CACHE_SOFT_TTL - (time.time() - entry["fetched_at"])
+        else:
+            fresh_for = 0
+        if fresh_for > 0:
+            payload = {"posts": posts, "origin": "cache", "cache_status": "hit"}
+            await ResponseCache.put(cache_key, limit, payload, ttl=fresh_for, etag=etag)
+        return posts, origin, cache_status, etag
+
+    @staticmethod
+    def etag(entry: Dict, limit: int) -> str:
+        """
+        ETag dos `limit` primeiros posts da listagem, a partir dos digests guardados na entrada canônica.
+
+        Os digests (`PostIndexer.content_hash`) são calculados uma vez por busca no Reddit; entradas
+        gravadas antes deles têm os digests calculados aqui.
+        """
+        digests = entry.get("digests")
+        if not isinstance(digests, list) or len(digests) != len(entry["posts"]):
+            digests = [PostIndexer.content_hash(post) for post in entry["posts"]]
+        return ResponseCache.digest_etag(digests[:limit])
+
+    @staticmethod
+    async def get_cached_body(subreddit: str, period: str = "day", limit: int = 10, sort_type: str = "hot") -> Optional[bytes]:
+        """
+        Retorna o corpo pronto da resposta de `get_posts` para uma listagem fresca (ver ResponseCache), ou None.
+
+        Só existe enquanto a listagem seria um "hit"; caso contrário use `get_posts`.
+        """
+        stored = await ResponseCache.get(ListingService.cache_key(subreddit, period, sort_type), limit)
+        if stored is not None:
+            _popularity[ListingService.popularity_member(subreddit, period, sort_type)] += 1
+        return stored
+
+    @staticmethod
+    async def get_posts_batch(
+        items: List[Dict],
+        token: Optional[str] = None,
+        concurrency: int = BATCH_CONCURRENCY
+    ) -> List[Union[Tuple[List[Dict], str, str], Exception]]:
+        """
+        Resolve várias listagens de uma vez.
+
+        Os hits são lidos com um único multi-get no cache e os misses são buscados no Reddit em paralelo,
+        com no máximo `concurrency` buscas simultâneas.
+
+        Args:
+            items (List[Dict]): Itens com `subreddit`, `period`, `limit` e `sort_type`.
+
+        Returns:
+            List: Para cada item, na mesma ordem, a tupla (posts, origem, status do cache) de `get_posts`
+            ou a exceção que impediu resolvê-lo (ex: SubredditNotFound, RedditRateLimitError).
+        """
+        keys = [ListingService.cache_key(item["subreddit"], item["period"], item["sort_type"]) for item in items]
+        unique_items = {}
+        for key, item in zip(keys, items):
+            unique_items.setdefault(key, item)
+            _popularity[ListingService.popularity_member(item["subreddit"], item["period"], item["sort_type"])] += 1
+        unique_keys = list(unique_items)
+        entries = await CacheHandler.get_many(unique_keys)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def resolve(key: str, entry: Optional[Dict]):
+            item = unique_items[key]
+
+            async def fetch():
+                async with semaphore:
+                    return await ListingService._fetch_and_cache(key, item["subreddit"], token, item["period"], item["sort_type"])
+
+            try:
+                entry, origin, cache_status = await ListingService._resolve(key, ListingService._valid_entry(entry), fetch)
+                return entry["posts"], origin, cache_status
+            except RedditAPIError as e:
+                return e
+            except Exception as e:
+                logger.exception(f"Erro inesperado ao resolver '{key}' no lote.")
+                return e
+
+        resolved = await asyncio.gather(*[resolve(key, entry) for key, entry in zip(unique_keys, entries)])
+        by_key = dict(zip(unique_keys, resolved))
+
+        results = []
+        for key, item in zip(keys, items):
+            result = by_key[key]
+            if isinstance(result, Exception):
+                results.append(result)
+            else:
+                posts, origin, cache_status = result
+                results.append((posts[:item["limit"]], origin, cache_status))
+        return results
+
+    @staticmethod
+    async def _resolve(
+        cache_key: str,
+        entry: Optional[Dict],
+        fetch: Callable[[], Awaitable[Tuple[Dict, str]]]
+    ) -> Tuple[Dict, str, str]:
+        """Decide entre hit, stale (com atualização em background) e busca síncrona; retorna a entrada inteira."""
+        if entry is not None:
+            age = time.time() - entry["fetched_at"]
+            if age < CACHE_SOFT_TTL:
+                return entry, "cache", "hit"
+            if age < CACHE_HARD_TTL:
+                _swr_stats["stale_served"] += 1
+                ListingService._refresh_in_background(cache_key, fetch)
+                return entry, "cache", "stale"
+
+        try:
+            fetched, origin = await _single_flight.do(cache_key, fetch)
+        except RedditAPIError as e:
+            if entry is not None and ListingService._can_serve_stale(e):
+                _swr_stats["stale_on_error"] += 1
+                logger.warning(f"Reddit indisponível ({e.status_code}); servindo listagem antiga de '{cache_key}'.")
+                return entry, "cache", "stale"
+            raise
+        return fetched, origin, "hit" if origin == "cache" else "miss"
+
+    @staticmethod
+    async def refresh(subreddit: str, period: str = "day", sort_type: str = "hot", token: Optional[str] = None) -> Dict:
+        """
+        Busca a listagem no Reddit e regrava o cache (e o Elasticsearch), mesmo que a entrada ainda esteja fresca.
+
+        Usada pelo pré-aquecimento; chamadas concorrentes para a mesma chave compartilham a busca.
+        """
+        cache_key = ListingService.cache_key(subreddit, period, sort_type)
+        entry, _ = await _single_flight.do(
+            cache_key,
+            lambda: ListingService._fetch_and_cache(cache_key, subreddit, token, period, sort_type)
+        )
+        return entry
+
+    @staticmethod
+    def _valid_entry(entry) -> Optional[Dict]:
+        # Entradas gravadas antes do formato com `fetched_at` são tratadas como miss
+        if isinstance(entry, dict) and "fetched_at" in entry:
+            return entry
+        return None
+
+    @staticmethod
+    def _can_serve_stale(error: RedditAPIError) -> bool:
+        if isinstance(error, RedditRateLimitError):
+            return True
+        return error.status_code is None or error.status_code >= 500
+
+    @staticmethod
+    def _refresh_in_background(cache_key: str, fetch) -> None:
+        async def refresh():
+            try:
+                await _single_flight.do(cache_key, fetch)
+            except Exception as e:
+                _swr_stats["background_failures"] += 1
+                logger.warning(f"Falha ao atualizar '{cache_key}' em background: {e}")
+
+        _swr_stats["background_refreshes"] += 1
+        task = asyncio.ensure_future(refresh())
+        _background_refreshes.add(task)
+        task.add_done_callback(_background_refreshes.discard)
+
+    @staticmethod
+    async def _fetch_and_cache(
+        cache_key: str,
+        subreddit: str,
+        token: Optional[str],
+        period: str,
+        sort_type: str
+    ) -> Tuple[Dict, str]:
+        lock_key = f"lock:{cache_key}"
+        lock_token = None
+        if CACHE_DISTRIBUTED_LOCK:
+            lock_token = await CacheHandler.acquire_lock(lock_key, CACHE_LOCK_TTL_MS)
+            if lock_token is None:
+                entry = await ListingService._wait_for_other_worker(cache_key, lock_key)
+                if entry is not None:
+                    return entry, "cache"
+            else:
+                _lock_stats["acquired"] += 1
+
+        try:
+            page = await ListingService._fetch_from_reddit(subreddit, token, period, sort_type)
+            # A listagem canônica é também a primeira página do stream paginado; os digests dos posts
+            # (calculados na busca) dão o ETag sem serializar os posts de novo
+            entry = {"posts": page["posts"], "after": page["after"], "fetched_at": time.time()}
+            if "digests" in page:
+                entry["digests"] = page["digests"]
+            await CacheHandler.set_cache(cache_key, entry, ttl=CACHE_HARD_TTL + CACHE_STALE_IF_ERROR_TTL)
+            return entry, "api"
+        finally:
+            if lock_token is not None:
+                await CacheHandler.release_lock(lock_key, lock_token)
+
+    @staticmethod
+    async def _fetch_from_reddit(
+        subreddit: str,
+        token: Optional[str],
+        period: str,
+        sort_type: str,
+        after: Optional[str] = None
+    ) -> Dict:
+        """
+        Busca uma página canônica no Reddit, lembrando por CACHE_NOT_FOUND_TTL segundos os subreddits inexistentes.
+
+        Sem a marcação, cada consulta a um subreddit inexistente custaria duas chamadas ao Reddit
+        (a listagem vazia e a verificação em `/about`).
+        """
+        not_found_key = ListingService.not_found_key(subreddit)
+        if await CacheHandler.get_cache(not_found_key) is not None:
+            _not_found_stats["hits"] += 1
+            raise SubredditNotFound(subreddit)
+        try:
+            return await RedditService.fetch_page(
+                subreddit=subreddit,
+                token=token,
+                period=period,
+                limit=REDDIT_MAX_LIMIT,
+                sort_type=sort_type,
+                after=after
+            )
+        except SubredditNotFound:
+            _not_found_stats["stored"] += 1
+            await CacheHandler.set_cache(not_found_key, {"fetched_at": time.time()}, ttl=CACHE_NOT_FOUND_TTL)
+            raise
+
+    @staticmethod
+    async def _wait_for_other_worker(cache_key: str, lock_key: str) -> Optional[Dict]:
+        """Aguarda o worker que detém o lock gravar uma listagem atualizada (até CACHE_LOCK_WAIT segundos)."""
+        _lock_stats["waited"] += 1
+        # Só aceita listagens que estavam frescas quando a espera começou
+        fresh_since = time.time() - CACHE_SOFT_TTL
+        deadline = time.monotonic() + CACHE_LOCK_WAIT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(CACHE_LOCK_POLL_INTERVAL)
+            entry = ListingService._valid_entry(await CacheHandler.get_cache(cache_key))
+            if entry is not None and entry["fetched_at"] > fresh_since:
+                _lock_stats["served_after_wait"] += 1
+                return entry
+        logger.warning(f"Lock '{lock_key}' não liberado em {CACHE_LOCK_WAIT}s; buscando no Reddit.")
+        return None
+
+    @staticmethod
+    def page_key(subreddit: str, period: str, sort_type: str, after: Optional[str]) -> str:
+        cache_key = ListingService.cache_key(subreddit, period, sort_type)
+        return f"{cache_key}_after_{after}" if after else cache_key
+
+    @staticmethod
+    async def get_page(
+        subreddit: str,
+        token: Optional[str] = None,
+        period: str = "day",
+        sort_type: str = "hot",
+        after: Optional[str] = None
+    ) -> Dict:
+        """
+        Retorna uma página canônica (REDDIT_MAX_LIMIT posts) da listagem a partir do cursor `after`.
+
+        Cada página fica no cache pelo seu cursor, de forma que outros consumidores do stream a reaproveitem.
+
+        Returns:
+            Dict: `posts`, `after` (cursor da próxima página ou None) e `fetched_at`.
+        """
+        page_key = ListingService.page_key(subreddit, period, sort_type, after)
+        page = ListingService._valid_entry(await CacheHandler.get_cache(page_key))
+        if page is not None and "after" in page and time.time() - page["fetched_at"] < CACHE_SOFT_TTL:
+            return page
+        if after is None:
+            # A primeira página é a listagem canônica: mesma chave e mesma busca compartilhada do get_posts
+            return await ListingService.refresh(subreddit, period, sort_type, token)
+        return await _single_flight.do(
+            page_key,
+            lambda: ListingService._fetch_page(page_key, subreddit, token, period, sort_type, after)
+        )
+
+    @staticmethod
+    async def _fetch_page(
+        page_key: str,
+        subreddit: str,
+        token: Optional[str],
+        period: str,
+        sort_type: str,
+        after: Optional[str]
+    ) -> Dict:
+        result = await ListingService._fetch_from_reddit(subreddit, token, period, sort_type, after)
+        page = {"posts": result["posts"], "after": result["after"], "fetched_at": time.time()}
+        await CacheHandler.set_cache(page_key, page, ttl=CACHE_HARD_TTL)
+        return page
+
+    @staticmethod
+    async def stream_posts(
+        subreddit: str,
+        token: Optional[str] = None,
+        period: str = "day",
+        sort_type: str = "hot",
+        max_posts: int = 1000,
+        first_page: Optional[Dict] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Percorre a listagem pelo cursor `after` e gera os posts em NDJSON (um JSON por linha) à medida que chegam.
+
+        Erros depois do início do stream não podem mais virar status HTTP: eles são enviados como uma
+        última linha `{"error": ..., "status_code": ...}`.
+
+        Args:
+            first_page (Dict, opcional): Primeira página já buscada (ex: para validar o subreddit antes do stream).
+        """
+        seen = set()
+        page = first_page
+        try:
+            if page is None:
+                page = await ListingService.get_page(subreddit, token, period, sort_type)
+            while True:
+                for post in page["posts"]:
+                    # Posts que mudam de posição entre páginas (ex: hot) podem reaparecer
+                    if post["id"] in seen:
+                        continue
+                    seen.add(post["id"])
+                    yield (json.dumps(post) + "\n").encode("utf-8")
+                    if len(seen) >= max_posts:
+                        return
+                if not page["after"] or not page["posts"]:
+                    return
+                page = await ListingService.get_page(subreddit, token, period, sort_type, after=page["after"])
+        except RedditAPIError as e:
+            logger.warning(f"Stream de '{subreddit}' interrompido após {len(seen)} posts: {e}")
+            yield (json.dumps({"error": str(e), "status_code": e.status_code}) + "\n").encode("utf-8")
+
+    @staticmethod
+    def stats() -> Dict:
+        return {
+            "single_flight": _single_flight.stats(),
+            "distributed_lock": dict(_lock_stats),
+            "stale_while_revalidate": dict(_swr_stats),
+            "not_found": dict(_not_found_stats),
+            "rate_limit": get_governor().stats()
+        }
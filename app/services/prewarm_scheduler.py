@@ -0,0 +1,249 @@
+from services.listing_service import ListingService, CACHE_SOFT_TTL
+from services.rate_limit_governor import get_governor
+from services.reddit_service import RedditAPIError
+from services.http_client import RedditHttpClient
+from services.indexing_service import PostIndexer
+from services.trending_service import TrendingService
+from cache.cache_handler import CacheHandler
+from loggers.log_handler import setup_logger, flush_logs
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import asyncio
+import logging
+import random
+import time
+import os
+
+PREWARM_ENABLED = os.getenv("PREWARM_ENABLED", "false").lower() == "true"
+# Listagens sempre aquecidas, no formato "subreddit[:sort_type[:period]][=peso]" separadas por vírgula
+PREWARM_KEYS = os.getenv("PREWARM_KEYS", "")
+PREWARM_INTERVAL = float(os.getenv("PREWARM_INTERVAL", 60))
+# Variação aleatória (fração) aplicada ao intervalo entre ciclos e ao momento de atualizar cada listagem
+PREWARM_JITTER = float(os.getenv("PREWARM_JITTER", 0.2))
+PREWARM_CONCURRENCY = int(os.getenv("PREWARM_CONCURRENCY", 4))
+# Fração do orçamento de requisições ao Reddit que o pré-aquecimento pode consumir
+PREWARM_BUDGET_SHARE = float(os.getenv("PREWARM_BUDGET_SHARE", 0.3))
+# Uma listagem é atualizada quando sua idade passa dessa fração do CACHE_SOFT_TTL
+PREWARM_REFRESH_AHEAD = float(os.getenv("PREWARM_REFRESH_AHEAD", 0.8))
+# Quantas das listagens mais acessadas entram em cada ciclo, além das configuradas
+PREWARM_TOP_N = int(os.getenv("PREWARM_TOP_N", 50))
+
+# Popularidade: acessos de todos os workers acumulados em um sorted set no Redis, com decaimento por ciclo
+PREWARM_POPULARITY_KEY = os.getenv("PREWARM_POPULARITY_KEY", "prewarm:popularity")
+PREWARM_POPULARITY_MAX_KEYS = int(os.getenv("PREWARM_POPULARITY_MAX_KEYS", 1000))
+PREWARM_POPULARITY_DECAY = float(os.getenv("PREWARM_POPULARITY_DECAY", 0.9))
+PREWARM_POPULARITY_FLUSH_INTERVAL = float(os.getenv("PREWARM_POPULARITY_FLUSH_INTERVAL", 10))
+
+PREWARM_LOCK_KEY = "lock:prewarm"
+
+logger = logging.getLogger(__name__)
+
+class PrewarmKey(NamedTuple):
+    subreddit: str
+    sort_type: str
+    period: str
+
+    @staticmethod
+    def parse(member: str) -> "PrewarmKey":
+        parts = member.strip().split(":")
+        if not parts[0] or len(parts) > 3:
+            raise ValueError(member)
+        sort_type = parts[1] if len(parts) > 1 else "hot"
+        period = parts[2] if len(parts) > 2 else "day"
+        return PrewarmKey(parts[0].lower(), sort_type, ListingService.normalize_period(sort_type, period))
+
+    def member(self) -> str:
+        return ListingService.popularity_member(self.subreddit, self.period, self.sort_type)
+
+_scheduler: Optional[asyncio.Task] = None
+_flusher: Optional[asyncio.Task] = None
+_stats = {"cycles": 0, "refreshed": 0, "failed": 0, "skipped_budget": 0, "skipped_locked": 0, "lock_lost": 0, "last_cycle_ms": 0.0}
+
+class PrewarmScheduler:
+    """
+    Mantém aquecidas as listagens mais acessadas, atualizando-as antes que o soft TTL expire.
+
+    A cada ciclo, as listagens configuradas em PREWARM_KEYS e as mais populares (acessos contados
+    pelos workers da API, com decaimento) são ordenadas por peso; as que estão perto de expirar são
+    buscadas novamente no Reddit, com no máximo PREWARM_CONCURRENCY buscas simultâneas e apenas
+    enquanto o orçamento do RateLimitGovernor estiver acima da parcela reservada aos usuários.
+    Um lock no Redis, renovado enquanto o ciclo roda, garante que apenas um processo execute cada ciclo.
+
+    Pode rodar dentro da API (PREWARM_ENABLED=true) ou como worker separado:
+    `python -m services.prewarm_scheduler`.
+    """
+    @staticmethod
+    def configured_keys(raw: Optional[str] = None) -> Dict[PrewarmKey, float]:
+        keys = {}
+        raw = PREWARM_KEYS if raw is None else raw
+        for item in filter(None, (part.strip() for part in raw.split(","))):
+            member, _, weight = item.partition("=")
+            try:
+                keys[PrewarmKey.parse(member)] = float(weight) if weight else 1.0
+            except ValueError:
+                logger.warning(f"Chave de pré-aquecimento inválida ignorada: '{item}'")
+        return keys
+
+    @staticmethod
+    async def candidates() -> List[Tuple[PrewarmKey, float]]:
+        """Listagens do ciclo com seus pesos (configurado + popularidade), da mais para a menos importante."""
+        weights = PrewarmScheduler.configured_keys()
+        for member, score in await CacheHandler.top_scores(PREWARM_POPULARITY_KEY, PREWARM_TOP_N):
+            # Um membro inválido não pode derrubar o ciclo: ele só é ignorado (e some com o decaimento)
+            try:
+                key = PrewarmKey.parse(member)
+            except ValueError:
+                logger.warning(f"Listagem popular inválida ignorada no pré-aquecimento: '{member}'")
+                continue
+            weights[key] = weights.get(key, 0.0) + score
+        return sorted(weights.items(), key=lambda item: item[1], reverse=True)
+
+    @staticmethod
+    async def due(candidates: List[Tuple[PrewarmKey, float]]) -> List[PrewarmKey]:
+        """Filtra as listagens ausentes do cache ou cuja idade já passou do ponto de atualização."""
+        cache_keys = [ListingService.cache_key(key.subreddit, key.period, key.sort_type) for key, _ in candidates]
+        entries = await CacheHandler.get_many(cache_keys)
+        now = time.time()
+        due = []
+        for (key, _), entry in zip(candidates, entries):
+            # O jitter espalha as atualizações de listagens buscadas juntas pelos ciclos seguintes
+            refresh_at = CACHE_SOFT_TTL * PREWARM_REFRESH_AHEAD * random.uniform(1 - PREWARM_JITTER, 1)
+            if not isinstance(entry, dict) or now - entry.get("fetched_at", 0) >= refresh_at:
+                due.append(key)
+        return due
+
+    @staticmethod
+    def _has_budget() -> bool:
+        return get_governor().budget_fraction() > 1 - PREWARM_BUDGET_SHARE
+
+    @staticmethod
+    async def run_once() -> int:
+        """Executa um ciclo de pré-aquecimento e retorna quantas listagens foram atualizadas."""
+        start = time.perf_counter()
+        due = await PrewarmScheduler.due(await PrewarmScheduler.candidates())
+        semaphore = asyncio.Semaphore(PREWARM_CONCURRENCY)
+        refreshed = 0
+
+        async def refresh(key: PrewarmKey) -> None:
+            nonlocal refreshed
+            async with semaphore:
+                if not PrewarmScheduler._has_budget():
+                    _stats["skipped_budget"] += 1
+                    return
+                try:
+                    await ListingService.refresh(key.subreddit, key.period, key.sort_type)
+                    refreshed += 1
+                except RedditAPIError as e:
+                    _stats["failed"] += 1
+                    logger.warning(f"Falha ao pré-aquecer '{key.member()}': {e}")
+
+        await asyncio.gather(*[refresh(key) for key in due])
+        _stats["cycles"] += 1
+        _stats["refreshed"] += refreshed
+        _stats["last_cycle_ms"] = (time.perf_counter() - start) * 1000
+        logger.info(f"Pré-aquecimento: {refreshed} de {len(due)} listagens atualizadas em {_stats['last_cycle_ms']:.1f} ms.")
+        return refreshed
+
+    @staticmethod
+    async def flush_popularity() -> None:
+        """Envia ao Redis os acessos contados neste processo desde o último envio."""
+        await CacheHandler.incr_scores(
+            PREWARM_POPULARITY_KEY,
+            ListingService.drain_popularity(),
+            PREWARM_POPULARITY_MAX_KEYS
+        )
+
+    @staticmethod
+    def _jittered(interval: float) -> float:
+        return interval * random.uniform(1 - PREWARM_JITTER, 1 + PREWARM_JITTER)
+
+    @staticmethod
+    async def _keep_lock(token: str, lock_ttl_ms: int) -> None:
+        """Renova o lock do ciclo enquanto ele roda, para que um Reddit lento não abra espaço para outro processo."""
+        while True:
+            await asyncio.sleep(lock_ttl_ms / 3000)
+            if not await CacheHandler.extend_lock(PREWARM_LOCK_KEY, token, lock_ttl_ms):
+                _stats["lock_lost"] += 1
+                logger.warning("Lock do pré-aquecimento perdido durante o ciclo; outro processo pode estar aquecendo as listagens.")
+                return
+
+    @staticmethod
+    async def _run_locked(token: str, lock_ttl_ms: int) -> None:
+        renewal = asyncio.ensure_future(PrewarmScheduler._keep_lock(token, lock_ttl_ms))
+        try:
+            await PrewarmScheduler.run_once()
+            await CacheHandler.decay_scores(PREWARM_POPULARITY_KEY, PREWARM_POPULARITY_DECAY)
+        finally:
+            renewal.cancel()
+            try:
+                await renewal
+            except asyncio.CancelledError:
+                pass
+
+    @staticmethod
+    async def _run() -> None:
+        while True:
+            try:
+                await PrewarmScheduler.flush_popularity()
+                # O lock não é liberado e expira antes do menor intervalo possível: um ciclo por intervalo entre todos os processos
+                lock_ttl_ms = int(PREWARM_INTERVAL * (1 - PREWARM_JITTER) * 1000)
+                token = await CacheHandler.acquire_lock(PREWARM_LOCK_KEY, lock_ttl_ms)
+                if token is None:
+                    _stats["skipped_locked"] += 1
+                else:
+                    await PrewarmScheduler._run_locked(token, lock_ttl_ms)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Erro inesperado no ciclo de pré-aquecimento.")
+            await asyncio.sleep(PrewarmScheduler._jittered(PREWARM_INTERVAL))
+
+    @staticmethod
+    async def _flush_loop() -> None:
+        while True:
+            await asyncio.sleep(PrewarmScheduler._jittered(PREWARM_POPULARITY_FLUSH_INTERVAL))
+            try:
+                await PrewarmScheduler.flush_popularity()
+            except Exception:
+                logger.exception("Erro ao enviar a popularidade das listagens ao Redis.")
+
+    @staticmethod
+    def stats() -> Dict:
+        return {**_stats, "enabled": _scheduler is not None and not _scheduler.done()}
+
+    @staticmethod
+    async def startup(run_scheduler: bool = PREWARM_ENABLED) -> None:
+        """Inicia o envio periódico da popularidade e, se habilitado, o agendador de pré-aquecimento."""
+        global _scheduler, _flusher
+        if run_scheduler:
+            _scheduler = asyncio.ensure_future(PrewarmScheduler._run())
+        else:
+            _flusher = asyncio.ensure_future(PrewarmScheduler._flush_loop())
+
+    @staticmethod
+    async def shutdown() -> None:
+        global _scheduler, _flusher
+        for task in (_scheduler, _flusher):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        _scheduler = _flusher = None
+        await PrewarmScheduler.flush_popularity()
+
+async def main() -> None:
+    await RedditHttpClient.startup()
+    await PostIndexer.startup()
+    try:
+        await PrewarmScheduler._run()
+    finally:
+        await PostIndexer.shutdown()
+        await TrendingService.shutdown()
+        await RedditHttpClient.shutdown()
+        await CacheHandler.close()
+        flush_logs()
+
+if __name__ == "__main__":
+    setup_logger()
+    asyncio.run(main())
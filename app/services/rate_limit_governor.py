@@ -0,0 +1,205 @@
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import time
+import os
+
+# Credenciais OAuth do Reddit separadas por vírgula; na ausência, usa o REDDIT_ACCESS_TOKEN único
+REDDIT_ACCESS_TOKENS = [
+    token.strip()
+    for token in os.getenv("REDDIT_ACCESS_TOKENS", os.getenv("REDDIT_ACCESS_TOKEN", "")).split(",")
+    if token.strip()
+]
+# Orçamento local de cada credencial: REDDIT_RATELIMIT_REQUESTS requisições por REDDIT_RATELIMIT_WINDOW segundos
+REDDIT_RATELIMIT_REQUESTS = float(os.getenv("REDDIT_RATELIMIT_REQUESTS", 100))
+REDDIT_RATELIMIT_WINDOW = float(os.getenv("REDDIT_RATELIMIT_WINDOW", 60))
+# Requisições mantidas em reserva do saldo informado pelo Reddit (X-Ratelimit-Remaining)
+REDDIT_RATELIMIT_RESERVE = float(os.getenv("REDDIT_RATELIMIT_RESERVE", 2))
+# Tempo máximo que uma chamada espera na fila por orçamento antes de ser descartada (429)
+REDDIT_RATELIMIT_MAX_WAIT = float(os.getenv("REDDIT_RATELIMIT_MAX_WAIT", 5))
+
+logger = logging.getLogger(__name__)
+
+class RateLimitExceeded(Exception):
+    """Lançada quando nenhuma credencial terá orçamento dentro do tempo máximo de espera."""
+    def __init__(self, wait: float):
+        self.wait = wait
+        super().__init__(f"Sem orçamento de requisições ao Reddit pelos próximos {wait:.1f}s.")
+
+class CredentialBudget:
+    """Orçamento de uma credencial: token bucket local combinado ao saldo informado pelo Reddit."""
+    def __init__(self, name: str, token: str, capacity: float, window: float):
+        self.name = name
+        self.token = token
+        self.capacity = capacity
+        self.refill_rate = capacity / window
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.remaining: Optional[float] = None
+        self.reset_at: Optional[float] = None
+        self.requests = 0
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+        if self.reset_at is not None and now >= self.reset_at:
+            # Nova janela no Reddit: o saldo antigo deixa de valer
+            self.remaining = None
+            self.reset_at = None
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        if self.remaining is None:
+            return self.tokens
+        return min(self.tokens, self.remaining - REDDIT_RATELIMIT_RESERVE)
+
+    def wait_time(self, now: float) -> float:
+        """Segundos até a credencial ter orçamento para uma requisição."""
+        if self.available(now) >= 1:
+            return 0.0
+        waits = [max(0.0, (1 - self.tokens) / self.refill_rate)]
+        if self.remaining is not None and self.remaining - REDDIT_RATELIMIT_RESERVE < 1:
+            waits.append(self.reset_at - now)
+        return max(waits)
+
+    def consume(self) -> None:
+        self.tokens -= 1
+        if self.remaining is not None:
+            self.remaining -= 1
+        self.requests += 1
+
+    def update(self, remaining: Optional[float], reset: Optional[float], now: float) -> None:
+        if remaining is None or reset is None:
+            return
+        self.remaining = remaining
+        self.reset_at = now + reset
+
+    def stats(self, now: float) -> Dict:
+        return {
+            "available": round(max(self.available(now), 0.0), 2),
+            "remaining": self.remaining,
+            "reset_in": round(self.reset_at - now, 2) if self.reset_at is not None else None,
+            "requests": self.requests,
+            "throttled": self.throttled
+        }
+
+class RateLimitGovernor:
+    """
+    Distribui as chamadas ao Reddit entre as credenciais configuradas antes de atingir o limite.
+
+    Cada chamada adquire a credencial com mais orçamento disponível. Sem orçamento, a chamada
+    espera na fila até `max_wait` segundos; se nem assim houver orçamento, ela é descartada com
+    RateLimitExceeded em vez de gerar um 429 no Reddit.
+    """
+    def __init__(
+        self,
+        tokens: List[str],
+        capacity: float = REDDIT_RATELIMIT_REQUESTS,
+        window: float = REDDIT_RATELIMIT_WINDOW,
+        max_wait: float = REDDIT_RATELIMIT_MAX_WAIT
+    ):
+        self.capacity = capacity
+        self.window = window
+        self.max_wait = max_wait
+        self.credentials: List[CredentialBudget] = []
+        self.queued = 0
+        self.shed = 0
+        for token in tokens:
+            self._register(token)
+
+    def _register(self, token: str) -> CredentialBudget:
+        credential = CredentialBudget(f"credential_{len(self.credentials)}", token, self.capacity, self.window)
+        self.credentials.append(credential)
+        return credential
+
+    def _candidates(self, token: Optional[str]) -> List[CredentialBudget]:
+        if token is None:
+            return self.credentials
+        for credential in self.credentials:
+            if credential.token == token:
+                return [credential]
+        return [self._register(token)]
+
+    async def acquire(self, token: Optional[str] = None, max_wait: Optional[float] = None) -> CredentialBudget:
+        """
+        Reserva orçamento para uma requisição e retorna a credencial a ser usada.
+
+        Args:
+            token (str, opcional): Força o uso de uma credencial específica.
+            max_wait (float, opcional): Espera máxima na fila; padrão `self.max_wait`.
+
+        Raises:
+            RateLimitExceeded: Se nenhuma credencial terá orçamento dentro da espera máxima.
+        """
+        candidates = self._candidates(token)
+        if not candidates:
+            raise RateLimitExceeded(0.0)
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        waiting = False
+        try:
+            while True:
+                now = time.monotonic()
+                best = max(candidates, key=lambda credential: credential.available(now))
+                if best.available(now) >= 1:
+                    best.consume()
+                    return best
+                wait = min(credential.wait_time(now) for credential in candidates)
+                if now + wait > deadline:
+                    self.shed += 1
+                    raise RateLimitExceeded(wait)
+                if not waiting:
+                    waiting = True
+                    self.queued += 1
+                await asyncio.sleep(wait)
+        finally:
+            if waiting:
+                self.queued -= 1
+
+    def record_response(self, credential: CredentialBudget, status_code: int, headers) -> None:
+        """Atualiza o orçamento da credencial com os headers X-Ratelimit-* da resposta."""
+        now = time.monotonic()
+        remaining = _header_float(headers, "X-Ratelimit-Remaining")
+        reset = _header_float(headers, "X-Ratelimit-Reset")
+        if status_code == 429:
+            credential.throttled += 1
+            remaining = 0.0
+            reset = reset if reset is not None else self.window
+            logger.warning(f"Reddit retornou 429 para {credential.name}; pausando por {reset:.0f}s.")
+        credential.update(remaining, reset, now)
+
+    def budget_fraction(self) -> float:
+        """Fração (0 a 1) do orçamento total ainda disponível entre todas as credenciais."""
+        if not self.credentials:
+            return 0.0
+        now = time.monotonic()
+        available = sum(max(credential.available(now), 0.0) for credential in self.credentials)
+        return min(available / (self.capacity * len(self.credentials)), 1.0)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "queued": self.queued,
+            "shed": self.shed,
+            "credentials": {credential.name: credential.stats(now) for credential in self.credentials}
+        }
+
+def _header_float(headers, name: str) -> Optional[float]:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+_governor: Optional[RateLimitGovernor] = None
+
+def get_governor() -> RateLimitGovernor:
+    global _governor
+    if _governor is None:
+        _governor = RateLimitGovernor(REDDIT_ACCESS_TOKENS)
+    return _governor
+
+def set_governor(governor: Optional[RateLimitGovernor]) -> None:
+    """Substitui o governor global (usado em testes e benchmarks)."""
+    global _governor
+    _governor = governor
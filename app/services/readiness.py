@@ -0,0 +1,168 @@
+"""
+Verificação de dependências (Redis, Elasticsearch, Kibana) na inicialização e nas sondas /readyz.
+
+As verificações rodam em paralelo e, enquanto uma dependência não responde, são repetidas com backoff
+exponencial. Na API isso acontece em background no lifespan: o worker já atende (inclusive o tráfego
+servido do cache) enquanto o Elasticsearch ainda está subindo, e o /readyz informa o estado de cada uma.
+"""
+from services.elasticsearch_service import ElasticsearchService
+from cache.cache_handler import CacheHandler
+from services.snapshot_store import SnapshotStore
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncio
+import logging
+import random
+import time
+import httpx
+import os
+
+KIBANA_HOST = os.getenv("KIBANA_HOST", "localhost")
+KIBANA_PORT = os.getenv("KIBANA_PORT", 5601)
+KIBANA_URL = f"http://{KIBANA_HOST}:{KIBANA_PORT}"
+
+# Dependências verificadas pela API e, entre elas, as que precisam responder para o /readyz dar 200.
+# O Elasticsearch fica de fora das obrigatórias: sem ele só a busca e a indexação ficam indisponíveis.
+READINESS_CHECKS = [name.strip() for name in os.getenv("READINESS_CHECKS", "redis,elasticsearch").split(",") if name.strip()]
+READINESS_REQUIRED = [name.strip() for name in os.getenv("READINESS_REQUIRED", "redis").split(",") if name.strip()]
+READINESS_TIMEOUT = float(os.getenv("READINESS_TIMEOUT", 1))
+READINESS_INITIAL_DELAY = float(os.getenv("READINESS_INITIAL_DELAY", 0.1))
+READINESS_MAX_DELAY = float(os.getenv("READINESS_MAX_DELAY", 5))
+# Tempo máximo de espera na inicialização (segundos); depois disso a espera desiste e só o /readyz segue verificando
+READINESS_STARTUP_TIMEOUT = float(os.getenv("READINESS_STARTUP_TIMEOUT", 120))
+# Aplica os templates e cria o índice de posts quando o Elasticsearch fica disponível
+ES_BOOTSTRAP_INDICES = os.getenv("ES_BOOTSTRAP_INDICES", "true").lower() == "true"
+ES_BOOTSTRAP_LOCK_KEY = "lock:es_bootstrap"
+# O lock não é liberado após o sucesso: os workers que sobem dentro deste tempo (ms) não repetem o bootstrap
+ES_BOOTSTRAP_LOCK_TTL_MS = int(os.getenv("ES_BOOTSTRAP_LOCK_TTL_MS", 300_000))
+
+logger = logging.getLogger(__name__)
+
+async def check_redis() -> bool:
+    return await CacheHandler.ping()
+
+async def check_elasticsearch() -> bool:
+    return await ElasticsearchService.ping()
+
+async def check_kibana() -> bool:
+    try:
+        async with httpx.AsyncClient(timeout=READINESS_TIMEOUT) as client:
+            response = await client.get(f"{KIBANA_URL}/api/status")
+        return response.status_code == 200
+    except httpx.HTTPError:
+        return False
+
+CHECKS: Dict[str, Callable[[], Awaitable[bool]]] = {
+    "redis": check_redis,
+    "elasticsearch": check_elasticsearch,
+    "kibana": check_kibana,
+    # Conexão do histórico de posts, aberta em background pelo SnapshotStore
+    "postgres": SnapshotStore.ping
+}
+
+_startup: Optional[asyncio.Task] = None
+
+class Readiness:
+    @staticmethod
+    async def check(name: str, timeout: float = READINESS_TIMEOUT) -> bool:
+        """Executa uma verificação com tempo limite; exceções e timeouts contam como indisponível."""
+        try:
+            return await asyncio.wait_for(CHECKS[name](), timeout=timeout)
+        except Exception:
+            return False
+
+    @staticmethod
+    async def status(names: Optional[List[str]] = None, required: Optional[List[str]] = None) -> Dict:
+        """Verifica as dependências em paralelo e indica se as obrigatórias estão disponíveis."""
+        names = READINESS_CHECKS if names is None else names
+        required = READINESS_REQUIRED if required is None else required
+        results = await asyncio.gather(*[Readiness.check(name) for name in names])
+        checks = dict(zip(names, results))
+        return {
+            "ready": all(checks.get(name, False) for name in required),
+            "checks": {name: "ok" if ok else "unavailable" for name, ok in checks.items()}
+        }
+
+    @staticmethod
+    async def wait_for(
+        name: str,
+        timeout: float = READINESS_STARTUP_TIMEOUT,
+        initial_delay: float = READINESS_INITIAL_DELAY,
+        max_delay: float = READINESS_MAX_DELAY
+    ) -> bool:
+        """
+        Repete a verificação com backoff exponencial (com jitter) até a dependência responder.
+
+        :return: True quando ela responde, False se `timeout` segundos se passarem antes disso.
+        """
+        deadline = time.monotonic() + timeout
+        delay = initial_delay
+        attempts = 0
+        while True:
+            attempts += 1
+            if await Readiness.check(name):
+                logger.info(f"Dependência '{name}' disponível após {attempts} tentativa(s).")
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error(f"Dependência '{name}' indisponível após {attempts} tentativas em {timeout:.0f}s.")
+                return False
+            await asyncio.sleep(min(delay * random.uniform(0.5, 1.0), remaining))
+            delay = min(delay * 2, max_delay)
+
+    @staticmethod
+    async def wait_for_all(names: Optional[List[str]] = None, timeout: float = READINESS_STARTUP_TIMEOUT) -> Dict[str, bool]:
+        """Espera todas as dependências em paralelo: o tempo total é o da mais lenta, não a soma."""
+        names = READINESS_CHECKS if names is None else names
+        results = await asyncio.gather(*[Readiness.wait_for(name, timeout) for name in names])
+        return dict(zip(names, results))
+
+    @staticmethod
+    async def bootstrap_indices() -> bool:
+        """
+        Aplica os templates e cria (ou migra) os índices uma única vez entre todos os workers.
+
+        Um lock no Redis escolhe o worker que faz o bootstrap; os demais não disputam a criação dos mesmos
+        recursos. Sem Redis o lock é considerado adquirido e cada worker aplica tudo, o que é idempotente.
+
+        :return: True se este processo fez o bootstrap.
+        """
+        token = await CacheHandler.acquire_lock(ES_BOOTSTRAP_LOCK_KEY, ES_BOOTSTRAP_LOCK_TTL_MS)
+        if token is None:
+            logger.info("Bootstrap dos índices do Elasticsearch feito por outro worker.")
+            return False
+        try:
+            await asyncio.to_thread(ElasticsearchService.create_index_if_not_exists)
+        except Exception as e:
+            # Libera o lock para que o próximo worker a subir tente de novo
+            await CacheHandler.release_lock(ES_BOOTSTRAP_LOCK_KEY, token)
+            logger.error(f"Falha ao aplicar os templates do Elasticsearch: {e}")
+            return False
+        return True
+
+    @staticmethod
+    async def _bootstrap() -> None:
+        ready = await Readiness.wait_for_all()
+        if ES_BOOTSTRAP_INDICES and ready.get("elasticsearch"):
+            await Readiness.bootstrap_indices()
+
+    @staticmethod
+    async def startup() -> None:
+        """Inicia a espera pelas dependências em background, sem atrasar o início do atendimento."""
+        global _startup
+        if _startup is None or _startup.done():
+            _startup = asyncio.ensure_future(Readiness._bootstrap())
+
+    @staticmethod
+    async def shutdown() -> None:
+        global _startup
+        if _startup is not None:
+            _startup.cancel()
+            try:
+                await _startup
+            except (asyncio.CancelledError, Exception):
+                pass
+            _startup = None
+
+    @staticmethod
+    def startup_complete() -> bool:
+        return _startup is not None and _startup.done()
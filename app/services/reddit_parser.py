@@ -0,0 +1,79 @@
+"""
+Decodificação enxuta das listagens do Reddit.
+
+Com `raw_json=1` e limit 100 uma listagem tem centenas de KB (selftext, preview, media, flair...), mas a
+API usa só seis campos de cada post. Em vez de montar a árvore inteira com `response.json()`, o corpo é
+decodificado em uma única passada por um decoder tipado (msgspec): os campos que não estão nos structs
+abaixo são pulados sem criar objetos Python, e cada post vira um registro compacto (struct com slots).
+
+Os registros são convertidos em dicionários (`to_post`) no fim de `RedditService.fetch_page`, e não
+repassados adiante: cache, indexação, histórico, trending e a resposta já trabalham com o dicionário do
+modelo Post (JSON no Redis, `_bulk`, linhas do COPY, hash de conteúdo). A conversão custa pouco perto da
+decodificação (ver `benchmarks.parser_bench`: registros -> dicts) e evita espalhar o struct por essas camadas.
+
+O corpo da resposta é lido inteiro antes de decodificar: o msgspec decodifica um buffer completo, e um
+parser incremental (ijson) sobre o stream foi medido e gastou mais CPU que a passada única sobre o buffer;
+com limit 100 o corpo fica em centenas de KB, então guardá-lo não pesa na memória.
+"""
+from typing import Dict, List, Optional, Union
+import msgspec
+
+class RedditPostRecord(msgspec.Struct, gc=False):
+    """Os campos de um post (`children[].data`) usados pela API; todos opcionais, como no Reddit."""
+    name: Optional[str] = None
+    id: Optional[str] = None
+    subreddit: Optional[str] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    url: Optional[str] = None
+    created_utc: Optional[float] = None
+    score: Optional[Union[int, float]] = None
+
+    def to_post(self, subreddit: str) -> Dict:
+        """Converte o registro no dicionário formatado para o modelo Post (usado pelo cache, índice e resposta)."""
+        return {
+            "id": self.name or f"t3_{self.id}",
+            "subreddit": self.subreddit or subreddit,
+            "title": self.title or "",
+            "author": self.author or "",
+            "url": self.url or "",
+            "created_utc": int(self.created_utc or 0),
+            "score": int(self.score or 0)
+        }
+
+class _Child(msgspec.Struct, gc=False):
+    data: RedditPostRecord
+
+class _ListingData(msgspec.Struct, gc=False):
+    children: List[_Child] = []
+    after: Optional[str] = None
+
+class RedditListing(msgspec.Struct, gc=False):
+    data: _ListingData = msgspec.field(default_factory=_ListingData)
+
+    @property
+    def posts(self) -> List[RedditPostRecord]:
+        # Sem `name` nem `id` não há fullname estável: o post colidiria com os demais no índice, nos snapshots e no trending
+        return [child.data for child in self.data.children if child.data.name or child.data.id]
+
+    @property
+    def after(self) -> Optional[str]:
+        return self.data.after
+
+# strict=False aceita, por exemplo, score inteiro enviado como 12.0
+_decoder = msgspec.json.Decoder(RedditListing, strict=False)
+
+class InvalidListing(ValueError):
+    """Lançada quando o corpo não é uma listagem do Reddit válida."""
+
+def parse_listing(body: bytes) -> RedditListing:
+    """
+    Decodifica o corpo de uma listagem (`/r/{subreddit}/{sort}`) mantendo apenas os campos usados.
+
+    Raises:
+        InvalidListing: Se o corpo não for JSON ou não tiver o formato de uma listagem.
+    """
+    try:
+        return _decoder.decode(body)
+    except msgspec.DecodeError as e:
+        raise InvalidListing(f"Listagem do Reddit inválida: {e}")
@@ -1,7 +1,17 @@
-from services.elasticsearch_service import ElasticsearchService
+from services.indexing_service import PostIndexer
+from services.snapshot_store import SnapshotStore
+from services.trending_service import TrendingService
+from services.http_client import RedditHttpClient
+from services.rate_limit_governor import get_governor, RateLimitExceeded
+from services.circuit_breaker import get_breaker, CircuitOpen
+from services.reddit_parser import parse_listing, InvalidListing
+from metrics.instrumentation import Metrics
 from typing import List, Dict, Optional
-import asyncio
 import httpx
+import os
+
+REDDIT_API_URL = os.getenv("REDDIT_API_URL", "https://oauth.reddit.com")
+REDDIT_USER_AGENT = "Teste2:1zpdmvBmF0a8gaWmixdTsA:v1.0.0 (by /u/Fun-Weight-2423)"
 
 class RedditAPIError(Exception):
     """Exceção base para erros relacionados à API do Reddit."""
@@ -27,6 +37,13 @@ class RedditRateLimitError(RedditAPIError):
         message = "Limite de requisições da API do Reddit atingido. Tente novamente mais tarde."
         super().__init__(message, status_code=429)
 
+class RedditUnavailableError(RedditAPIError):
+    """Lançada sem chamar o Reddit enquanto o circuit breaker está aberto após falhas consecutivas."""
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        message = "A API do Reddit está indisponível no momento. Tente novamente mais tarde."
+        super().__init__(message, status_code=503)
+
 class RedditService:
     """
     Service para interagir com a API do Reddit e buscar posts populares.
@@ -34,7 +51,7 @@ class RedditService:
     @staticmethod
     async def fetch_posts(
         subreddit: str,
-        token: str,
+        token: Optional[str] = None,
         period: str = "day",
         limit: int = 10,
         sort_type: str = "hot"
@@ -42,27 +59,49 @@ class RedditService:
         """
         Busca os posts de um determinado subreddit com filtros de período, limite e ordenação.
 
+        Atalho para a primeira página de `fetch_page`; os argumentos e exceções são os mesmos.
+
+        Returns:
+            List[Dict]: Uma lista de dicionários formatados com os campos necessários para o modelo Post.
+        """
+        page = await RedditService.fetch_page(subreddit, token, period, limit, sort_type)
+        return page["posts"]
+
+    @staticmethod
+    async def fetch_page(
+        subreddit: str,
+        token: Optional[str] = None,
+        period: str = "day",
+        limit: int = 10,
+        sort_type: str = "hot",
+        after: Optional[str] = None
+    ) -> Dict:
+        """
+        Busca uma página da listagem de um subreddit, a partir do cursor `after` do Reddit.
+
         Args:
             subreddit (str): O nome do subreddit (ex: 'python', 'django').
-            token (str): O token de acesso OAuth2 para autenticação.
+            token (str, opcional): Token OAuth2 a ser usado; None para o RateLimitGovernor escolher
+                a credencial do pool com mais orçamento.
             period (str): O período de tempo para os posts ('hour', 'day', 'week', 'month', 'year', 'all').
             limit (int): O número máximo de posts a serem retornados.
             sort_type (str): O tipo de ordenação ('hot', 'new', 'top', 'rising').
+            after (str, opcional): Fullname do último post da página anterior; None para a primeira página.
 
         Returns:
-            List[Dict]: Uma lista de dicionários formatados com os campos necessários para o modelo Post.
+            Dict: `posts` (lista formatada para o modelo Post) e `after` (cursor da próxima página ou None).
 
         Raises:
             SubredditNotFound: Se o subreddit não for encontrado.
             RedditAuthenticationError: Se o token for inválido ou expirado.
-            RedditRateLimitError: Se o limite de requisições for atingido.
+            RedditRateLimitError: Se o limite de requisições for atingido ou não houver orçamento no governor.
             RedditAPIError: Para outros erros da API (erros de servidor, etc.).
         """
         # URL correta baseada na documentação da API do Reddit
         if sort_type in ["top", "controversial"]:
-            url = f"https://oauth.reddit.com/r/{subreddit}/{sort_type}"
+            url = f"{REDDIT_API_URL}/r/{subreddit}/{sort_type}"
         else:
-            url = f"https://oauth.reddit.com/r/{subreddit}/{sort_type}"
+            url = f"{REDDIT_API_URL}/r/{subreddit}/{sort_type}"
         
         params = {
             "limit": limit,
@@ -72,15 +111,11 @@ class RedditService:
         if sort_type in ["top", "controversial"]:
             params["t"] = period
 
-        headers = {
-            
-            "User-Agent": "Teste2:1zpdmvBmF0a8gaWmixdTsA:v1.0.0 (by /u/Fun-Weight-2423)",
-            "Authorization": f"Bearer {token}"
-        }
+        if after:
+            params["after"] = after
 
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, params=params, headers=headers)
+            response = await RedditService._get(url, token, params=params)
 
            
             if response.status_code == 401:
@@ -92,27 +127,35 @@ class RedditService:
             
             response.raise_for_status()
             
-            data = response.json()
-            if not data.get('data', {}).get('children'):
+            # Só os campos usados são decodificados; o resto do corpo é pulado sem virar objetos Python
+            with Metrics.stage("parse"):
+                try:
+                    listing = parse_listing(response.content)
+                except InvalidListing as e:
+                    raise RedditAPIError(str(e), status_code=502)
+            if not listing.data.children and not after:
                  is_real_subreddit = await RedditService.check_subreddit_exists(subreddit, token)
                  if not is_real_subreddit:
                     raise SubredditNotFound(subreddit)
 
-            # Extrai e formata os dados dos posts para o formato esperado pelo modelo Post
-            formatted_posts = []
-            for child in data['data']['children']:
-                post_data = child['data']
-                formatted_post = {
-                    "title": post_data.get('title', ''),
-                    "author": post_data.get('author', ''),
-                    "url": post_data.get('url', ''),
-                    "created_utc": int(post_data.get('created_utc', 0)),
-                    "score": post_data.get('score', 0)
-                }
-                formatted_posts.append(formatted_post)
-                ElasticsearchService.index_post(post_id=post_data['score'], post_data=formatted_post)
-
-            return formatted_posts
+            # Fronteira dos registros: daqui em diante cache, índice, histórico e trending usam o dicionário do Post
+            with Metrics.stage("parse"):
+                formatted_posts = [record.to_post(subreddit) for record in listing.posts]
+                # Digest estável de cada post: deduplicação da indexação e ETag da listagem em cache
+                digests = [PostIndexer.content_hash(post) for post in formatted_posts]
+
+            # Indexação em lote no Elasticsearch, fora do caminho da resposta
+            PostIndexer.enqueue(formatted_posts, digests)
+            # Histórico de score no banco, também gravado em lote em background
+            SnapshotStore.record(formatted_posts)
+            # Observações para o ranking de velocidade do score, enviadas em lote ao Redis
+            TrendingService.record(formatted_posts)
+
+            return {
+                "posts": formatted_posts,
+                "after": listing.after,
+                "digests": digests
+            }
 
         except httpx.HTTPStatusError as e:
             raise RedditAPIError(
@@ -123,18 +166,77 @@ class RedditService:
             raise RedditAPIError(f"Erro de conexão com o Reddit: {str(e)}")
 
     @staticmethod
-    async def check_subreddit_exists(subreddit: str, token: str) -> bool:
+    async def _get(url: str, token: Optional[str] = None, params: Optional[Dict] = None) -> httpx.Response:
         """
-        Verifica se um subreddit existe usando um endpoint diferente.
+        Faz um GET autenticado no Reddit com orçamento reservado no RateLimitGovernor.
+
+        Raises:
+            RedditAuthenticationError: Se nenhuma credencial estiver configurada.
+            RedditRateLimitError: Se nenhuma credencial tiver orçamento dentro da espera máxima.
+            RedditUnavailableError: Se o circuit breaker estiver aberto.
         """
-        url = f"https://oauth.reddit.com/r/{subreddit}/about"
+        governor = get_governor()
+        if token is None and not governor.credentials:
+            raise RedditAuthenticationError()
+        breaker = get_breaker()
+        try:
+            breaker.before_call()
+        except CircuitOpen as e:
+            raise RedditUnavailableError(e.retry_after)
+        try:
+            credential = await governor.acquire(token)
+        except BaseException as e:
+            breaker.release()
+            if isinstance(e, RateLimitExceeded):
+                raise RedditRateLimitError()
+            raise
+
         headers = {
-            "User-Agent": "Teste2:1zpdmvBmF0a8gaWmixdTsA:v1.0.0 (by /u/Fun-Weight-2423)",
-            "Authorization": f"Bearer {token}"
+            "User-Agent": REDDIT_USER_AGENT,
+            "Authorization": f"Bearer {credential.token}"
         }
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(url, headers=headers)
-            return response.status_code == 200
-        except httpx.RequestError:
+        client = RedditHttpClient.get_client()
+        with Metrics.stage("upstream") as stage:
+            try:
+                response = await client.get(url, params=params, headers=headers)
+            except httpx.RequestError:
+                stage.upstream_status = "error"
+                breaker.record_failure()
+                raise
+            except BaseException:
+                breaker.release()
+                raise
+            stage.upstream_status = str(response.status_code)
+        if response.status_code >= 500:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        governor.record_response(credential, response.status_code, response.headers)
+        return response
+
+    @staticmethod
+    async def check_subreddit_exists(subreddit: str, token: Optional[str] = None) -> bool:
+        """
+        Verifica se um subreddit existe usando um endpoint diferente.
+
+        Só 404 e 403 (inexistente, banido ou privado) são respostas definitivas de "não existe"; o resultado
+        vai para o cache negativo, então uma falha do Reddit não pode ser confundida com um subreddit inexistente.
+
+        Raises:
+            RedditRateLimitError: Se o Reddit responder 429.
+            RedditAPIError: Para qualquer outra resposta (ex: 5xx) ou erro de conexão.
+        """
+        url = f"{REDDIT_API_URL}/r/{subreddit}/about"
+        response = await RedditService._get(url, token)
+        if response.status_code == 200:
+            return True
+        if response.status_code in (403, 404):
             return False
+        if response.status_code == 401:
+            raise RedditAuthenticationError()
+        if response.status_code == 429:
+            raise RedditRateLimitError()
+        raise RedditAPIError(
+            f"Erro na API do Reddit ao verificar o subreddit: {response.status_code} - {response.text}",
+            status_code=response.status_code
+        )
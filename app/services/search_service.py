@@ -0,0 +1,94 @@
+from services.elasticsearch_service import ElasticsearchService
+from cache.cache_handler import CacheHandler
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 300))
+# Contador incrementado pelo PostIndexer a cada gravação: resultados de gerações anteriores são descartados
+SEARCH_GENERATION_KEY = os.getenv("SEARCH_GENERATION_KEY", "search:generation")
+
+_stats = {"hits": 0, "misses": 0, "invalidated": 0, "bypassed": 0}
+
+class SearchService:
+    """
+    Cache de resultados da busca de posts no Redis, na frente do Elasticsearch.
+
+    Cada página é guardada sob uma chave derivada dos parâmetros normalizados da busca, junto com a
+    geração do índice em que foi calculada. Como o PostIndexer incrementa a geração depois de cada
+    gravação, uma entrada de geração anterior é tratada como miss e recalculada.
+    """
+    @staticmethod
+    def normalize(
+        fields: Optional[List[str]] = None,
+        query: Optional[str] = None,
+        size: int = 10,
+        cursor: Optional[str] = None,
+        **options
+    ) -> Dict:
+        """Forma canônica da busca: buscas equivalentes (ordem dos campos, espaços, caixa) geram a mesma chave."""
+        normalized = {
+            "fields": sorted(set(fields or ["title"])),
+            "query": " ".join((query or "").split()).lower(),
+            "size": size,
+            "cursor": cursor
+        }
+        normalized.update({key: value for key, value in options.items() if value is not None})
+        return normalized
+
+    @staticmethod
+    def cache_key(normalized: Dict) -> str:
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True).encode()).hexdigest()
+        return f"search:{digest}"
+
+    @staticmethod
+    async def bump_generation() -> None:
+        await CacheHandler.incr(SEARCH_GENERATION_KEY)
+
+    @staticmethod
+    async def search(bypass: bool = False, **params) -> Tuple[List[Dict], Optional[str], str]:
+        """
+        Pesquisa posts pelo cache, recorrendo ao Elasticsearch em caso de miss.
+
+        Aceita os mesmos parâmetros de `ElasticsearchService.search_posts`.
+
+        Args:
+            bypass (bool): Ignora a entrada em cache (o resultado novo é gravado mesmo assim).
+
+        Returns:
+            Tuple[List[Dict], Optional[str], str]: Os posts, o cursor da próxima página e o status do cache
+            ('hit', 'miss' ou 'bypass').
+        """
+        if not SEARCH_CACHE_ENABLED:
+            results, next_cursor = await ElasticsearchService.search_posts(**params)
+            return results, next_cursor, "bypass"
+
+        key = SearchService.cache_key(SearchService.normalize(**params))
+        # Geração e resultado em um único MGET, sem o L1: a geração precisa refletir a última gravação
+        generation, entry = await CacheHandler.get_many([SEARCH_GENERATION_KEY, key], local=False)
+        generation = generation or 0
+
+        if bypass:
+            _stats["bypassed"] += 1
+        elif isinstance(entry, dict) and entry.get("generation") == generation:
+            _stats["hits"] += 1
+            return entry["results"], entry["next_cursor"], "hit"
+        else:
+            _stats["misses"] += 1
+            if entry is not None:
+                _stats["invalidated"] += 1
+
+        results, next_cursor = await ElasticsearchService.search_posts(**params)
+        await CacheHandler.set_many(
+            {key: {"generation": generation, "results": results, "next_cursor": next_cursor}},
+            ttl=SEARCH_CACHE_TTL,
+            local=False
+        )
+        return results, next_cursor, "bypass" if bypass else "miss"
+
+    @staticmethod
+    def stats() -> Dict:
+        lookups = _stats["hits"] + _stats["misses"]
+        return {**_stats, "hit_ratio": round(_stats["hits"] / lookups, 4) if lookups else 0.0}
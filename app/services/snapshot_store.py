@@ -0,0 +1,466 @@
+"""
+Histórico durável dos posts: um snapshot (post, instante, score) para cada listagem buscada no Reddit.
+
+Os snapshots saem do caminho da requisição como na indexação: `SnapshotStore.record` só coloca as linhas
+em uma fila e um worker em background as grava em lote. No Postgres (asyncpg) cada lote vai por COPY
+para uma tabela temporária e de lá, com um INSERT ... SELECT, para `post_snapshots`, particionada por dia
+(partições criadas sob demanda e descartadas após SNAPSHOT_RETENTION_DAYS); `posts` guarda os dados mais
+recentes de cada post. A chave (post_id, snapshot_at) faz a consulta de histórico de um post ler apenas
+um intervalo do índice de cada partição do período, independente do total de linhas.
+
+O SQLite (aiosqlite) tem o mesmo esquema sem particionamento nem retenção, para testes e uso local:
+SNAPSHOT_DATABASE_URL=sqlite:///caminho/arquivo.db (ou sqlite:///:memory:).
+"""
+from datetime import datetime, timedelta, timezone
+from metrics.instrumentation import Metrics
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import time
+import os
+
+def _default_database_url() -> str:
+    if not os.getenv("POSTGRES_HOST"):
+        return ""
+    return (
+        f"postgresql://{os.getenv('POSTGRES_USER', 'postgres')}:{os.getenv('POSTGRES_PASSWORD', '')}"
+        f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT', 5432)}/{os.getenv('POSTGRES_DB', 'postgres')}"
+    )
+
+SNAPSHOT_DATABASE_URL = os.getenv("SNAPSHOT_DATABASE_URL", _default_database_url())
+SNAPSHOTS_ENABLED = os.getenv("SNAPSHOTS_ENABLED", "true" if SNAPSHOT_DATABASE_URL else "false").lower() == "true"
+SNAPSHOT_POOL_MIN_SIZE = int(os.getenv("SNAPSHOT_POOL_MIN_SIZE", 1))
+SNAPSHOT_POOL_MAX_SIZE = int(os.getenv("SNAPSHOT_POOL_MAX_SIZE", 5))
+SNAPSHOT_QUEUE_SIZE = int(os.getenv("SNAPSHOT_QUEUE_SIZE", 20000))
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", 2000))
+SNAPSHOT_FLUSH_INTERVAL = float(os.getenv("SNAPSHOT_FLUSH_INTERVAL", 2))
+SNAPSHOT_SHUTDOWN_TIMEOUT = float(os.getenv("SNAPSHOT_SHUTDOWN_TIMEOUT", 10))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("SNAPSHOT_RETENTION_DAYS", 90))
+# Intervalo consultado quando o cliente não informa `since` (limita as partições lidas)
+SNAPSHOT_HISTORY_DAYS = int(os.getenv("SNAPSHOT_HISTORY_DAYS", 30))
+SNAPSHOT_CONNECT_MAX_DELAY = float(os.getenv("SNAPSHOT_CONNECT_MAX_DELAY", 30))
+
+logger = logging.getLogger(__name__)
+
+# (post_id, snapshot_at em segundos desde a época, subreddit, title, author, url, created_utc, score)
+SnapshotRow = Tuple[str, float, Optional[str], str, str, str, int, int]
+
+STAGING_COLUMNS = ["post_id", "snapshot_at", "subreddit", "title", "author", "url", "created_utc", "score"]
+
+def partition_name(day: datetime) -> str:
+    return f"post_snapshots_p{day:%Y%m%d}"
+
+def partition_bounds(snapshot_at: float) -> Tuple[datetime, datetime]:
+    """Início (inclusivo) e fim (exclusivo), em UTC, da partição diária que contém o instante."""
+    start = datetime.fromtimestamp(snapshot_at, tz=timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return start, start + timedelta(days=1)
+
+class PostgresSnapshotBackend:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS posts (
+            id text PRIMARY KEY,
+            subreddit text,
+            title text,
+            author text,
+            url text,
+            created_utc bigint,
+            last_score integer,
+            last_seen timestamptz
+        );
+        CREATE TABLE IF NOT EXISTS post_snapshots (
+            post_id text NOT NULL,
+            snapshot_at timestamptz NOT NULL,
+            subreddit text,
+            score integer NOT NULL,
+            PRIMARY KEY (post_id, snapshot_at)
+        ) PARTITION BY RANGE (snapshot_at);
+    """
+
+    def __init__(self, dsn: str, min_size: int = SNAPSHOT_POOL_MIN_SIZE, max_size: int = SNAPSHOT_POOL_MAX_SIZE):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.pool = None
+        self.partitions = set()
+
+    async def connect(self) -> None:
+        import asyncpg
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        async with self.pool.acquire() as conn:
+            await conn.execute(self.SCHEMA)
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    async def ping(self) -> bool:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval("SELECT 1") == 1
+
+    async def _ensure_partitions(self, conn, rows: List[SnapshotRow]) -> bool:
+        """Cria as partições diárias que faltam para o lote; retorna True se alguma foi criada."""
+        import asyncpg
+        created = False
+        for start, end in {partition_bounds(row[1]) for row in rows}:
+            name = partition_name(start)
+            if name in self.partitions:
+                continue
+            try:
+                await conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF post_snapshots "
+                    f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+                )
+                created = True
+            except (asyncpg.DuplicateTableError, asyncpg.UniqueViolationError):
+                # Outro worker criou a mesma partição ao mesmo tempo; na corrida o Postgres pode acusar o
+                # tipo da tabela duplicado em pg_type (UniqueViolation) em vez da tabela
+                pass
+            self.partitions.add(name)
+        return created
+
+    async def write(self, rows: List[SnapshotRow]) -> None:
+        records = [
+            (post_id, datetime.fromtimestamp(snapshot_at, tz=timezone.utc), subreddit, title, author, url, created_utc, score)
+            for post_id, snapshot_at, subreddit, title, author, url, created_utc, score in rows
+        ]
+        async with self.pool.acquire() as conn:
+            if await self._ensure_partitions(conn, rows):
+                await self.drop_expired(conn)
+            async with conn.transaction():
+                await conn.execute(
+                    "CREATE TEMP TABLE IF NOT EXISTS snapshot_staging ("
+                    "post_id text, snapshot_at timestamptz, subreddit text, title text, author text, "
+                    "url text, created_utc bigint, score integer) ON COMMIT DELETE ROWS"
+                )
+                await conn.copy_records_to_table("snapshot_staging", records=records, columns=STAGING_COLUMNS)
+                await conn.execute(
+                    "INSERT INTO post_snapshots (post_id, snapshot_at, subreddit, score) "
+                    "SELECT post_id, snapshot_at, subreddit, score FROM snapshot_staging "
+                    "ON CONFLICT (post_id, snapshot_at) DO NOTHING"
+                )
+                await conn.execute(
+                    "INSERT INTO posts (id, subreddit, title, author, url, created_utc, last_score, last_seen) "
+                    "SELECT DISTINCT ON (post_id) post_id, subreddit, title, author, url, created_utc, score, snapshot_at "
+                    "FROM snapshot_staging ORDER BY post_id, snapshot_at DESC "
+                    "ON CONFLICT (id) DO UPDATE SET title = EXCLUDED.title, url = EXCLUDED.url, "
+                    "last_score = EXCLUDED.last_score, last_seen = EXCLUDED.last_seen "
+                    "WHERE posts.last_seen <= EXCLUDED.last_seen"
+                )
+
+    async def drop_expired(self, conn, retention_days: int = SNAPSHOT_RETENTION_DAYS) -> List[str]:
+        """Descarta as partições inteiramente mais antigas que o período de retenção (DROP em vez de DELETE)."""
+        cutoff = f"post_snapshots_p{datetime.now(timezone.utc) - timedelta(days=retention_days):%Y%m%d}"
+        names = await conn.fetch(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'post_snapshots'"
+        )
+        expired = sorted(row["relname"] for row in names if row["relname"] < cutoff)
+        for name in expired:
+            await conn.execute(f"DROP TABLE IF EXISTS {name}")
+            self.partitions.discard(name)
+        return expired
+
+    async def post(self, post_id: str) -> Optional[Dict]:
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow("SELECT id, subreddit, title FROM posts WHERE id = $1", post_id)
+        return dict(row) if row else None
+
+    async def history(self, post_id: str, since: float, until: float, bucket: Optional[int], limit: int) -> List[Tuple[int, int]]:
+        start = datetime.fromtimestamp(since, tz=timezone.utc)
+        end = datetime.fromtimestamp(until, tz=timezone.utc)
+        async with self.pool.acquire() as conn:
+            if bucket:
+                rows = await conn.fetch(
+                    "SELECT (floor(extract(epoch FROM snapshot_at) / $4) * $4)::bigint AS ts, max(score) AS score "
+                    "FROM post_snapshots WHERE post_id = $1 AND snapshot_at >= $2 AND snapshot_at < $3 "
+                    "GROUP BY 1 ORDER BY 1 DESC LIMIT $5",
+                    post_id, start, end, bucket, limit
+                )
+            else:
+                rows = await conn.fetch(
+                    "SELECT extract(epoch FROM snapshot_at)::bigint AS ts, score "
+                    "FROM post_snapshots WHERE post_id = $1 AND snapshot_at >= $2 AND snapshot_at < $3 "
+                    "ORDER BY snapshot_at DESC LIMIT $4",
+                    post_id, start, end, limit
+                )
+        return [(row["ts"], row["score"]) for row in reversed(rows)]
+
+class SqliteSnapshotBackend:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS posts (
+            id TEXT PRIMARY KEY,
+            subreddit TEXT,
+            title TEXT,
+            author TEXT,
+            url TEXT,
+            created_utc INTEGER,
+            last_score INTEGER,
+            last_seen REAL
+        );
+        CREATE TABLE IF NOT EXISTS post_snapshots (
+            post_id TEXT NOT NULL,
+            snapshot_at REAL NOT NULL,
+            subreddit TEXT,
+            score INTEGER NOT NULL,
+            PRIMARY KEY (post_id, snapshot_at)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self.db = None
+
+    async def connect(self) -> None:
+        import aiosqlite
+        self.db = await aiosqlite.connect(self.path)
+        await self.db.executescript(self.SCHEMA)
+        await self.db.commit()
+
+    async def close(self) -> None:
+        if self.db is not None:
+            await self.db.close()
+            self.db = None
+
+    async def ping(self) -> bool:
+        async with self.db.execute("SELECT 1") as cursor:
+            return (await cursor.fetchone())[0] == 1
+
+    async def write(self, rows: List[SnapshotRow]) -> None:
+        await self.db.executemany(
+            "INSERT OR IGNORE INTO post_snapshots (post_id, snapshot_at, subreddit, score) VALUES (?, ?, ?, ?)",
+            [(row[0], row[1], row[2], row[7]) for row in rows]
+        )
+        await self.db.executemany(
+            "INSERT INTO posts (id, subreddit, title, author, url, created_utc, last_score, last_seen) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET title = excluded.title, url = excluded.url, "
+            "last_score = excluded.last_score, last_seen = excluded.last_seen "
+            "WHERE posts.last_seen <= excluded.last_seen",
+            [(post_id, subreddit, title, author, url, created_utc, score, snapshot_at)
+             for post_id, snapshot_at, subreddit, title, author, url, created_utc, score in rows]
+        )
+        await self.db.commit()
+
+    async def post(self, post_id: str) -> Optional[Dict]:
+        async with self.db.execute("SELECT id, subreddit, title FROM posts WHERE id = ?", (post_id,)) as cursor:
+            row = await cursor.fetchone()
+        return {"id": row[0], "subreddit": row[1], "title": row[2]} if row else None
+
+    async def history(self, post_id: str, since: float, until: float, bucket: Optional[int], limit: int) -> List[Tuple[int, int]]:
+        if bucket:
+            query = (
+                "SELECT CAST(snapshot_at / ? AS INTEGER) * ? AS ts, max(score) FROM post_snapshots "
+                "WHERE post_id = ? AND snapshot_at >= ? AND snapshot_at < ? GROUP BY 1 ORDER BY 1 DESC LIMIT ?"
+            )
+            params = (bucket, bucket, post_id, since, until, limit)
+        else:
+            query = (
+                "SELECT CAST(snapshot_at AS INTEGER), score FROM post_snapshots "
+                "WHERE post_id = ? AND snapshot_at >= ? AND snapshot_at < ? ORDER BY snapshot_at DESC LIMIT ?"
+            )
+            params = (post_id, since, until, limit)
+        async with self.db.execute(query, params) as cursor:
+            rows = await cursor.fetchall()
+        return [(int(ts), score) for ts, score in reversed(rows)]
+
+def build_backend(url: str = SNAPSHOT_DATABASE_URL):
+    if url.startswith("sqlite:///"):
+        return SqliteSnapshotBackend(url[len("sqlite:///"):])
+    return PostgresSnapshotBackend(url)
+
+class SnapshotStoreUnavailable(Exception):
+    """Lançada quando o histórico está desabilitado ou o banco ainda não está acessível."""
+
+_FLUSH = object()
+
+_backend = None
+_connected = False
+_queue: Optional[asyncio.Queue] = None
+_worker: Optional[asyncio.Task] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_stats = {"recorded": 0, "written": 0, "failed": 0, "dropped": 0, "batches": 0, "last_latency_ms": 0.0}
+
+class SnapshotStore:
+    """
+    Fila e worker que gravam os snapshots em lote, fora do caminho da requisição.
+
+    O worker conecta ao banco em background (com backoff exponencial), de forma que um Postgres ainda
+    subindo não atrasa o início da API; até lá os snapshots se acumulam na fila limitada.
+    """
+    @staticmethod
+    def set_backend(backend) -> None:
+        """Substitui o backend (usado em testes, ex: SQLite em memória já conectado)."""
+        global _backend, _connected
+        _backend = backend
+        _connected = backend is not None
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return _backend is not None
+
+    @staticmethod
+    def record(posts: List[Dict], fetched_at: Optional[float] = None) -> None:
+        """Agenda um snapshot de cada post da listagem, sem bloquear o chamador."""
+        if _backend is None or not posts:
+            return
+        SnapshotStore._ensure_worker()
+        fetched_at = fetched_at or time.time()
+        for post in posts:
+            try:
+                _queue.put_nowait((
+                    post["id"], fetched_at, post.get("subreddit"), post.get("title", ""), post.get("author", ""),
+                    post.get("url", ""), int(post.get("created_utc", 0)), int(post.get("score", 0))
+                ))
+                _stats["recorded"] += 1
+            except asyncio.QueueFull:
+                _stats["dropped"] += 1
+
+    @staticmethod
+    def _ensure_worker() -> None:
+        global _queue, _worker, _loop
+        loop = asyncio.get_running_loop()
+        if _worker is None or _worker.done() or _loop is not loop:
+            _queue = asyncio.Queue(maxsize=SNAPSHOT_QUEUE_SIZE)
+            _loop = loop
+            _worker = loop.create_task(SnapshotStore._run())
+
+    @staticmethod
+    async def _connect() -> None:
+        global _connected
+        delay = 0.5
+        while not _connected:
+            try:
+                await _backend.connect()
+                _connected = True
+                logger.info("Histórico de posts conectado ao banco.")
+            except Exception as e:
+                logger.warning(f"Banco do histórico indisponível, tentando novamente em {delay:.1f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, SNAPSHOT_CONNECT_MAX_DELAY)
+
+    @staticmethod
+    async def _next_batch() -> List[SnapshotRow]:
+        batch = []
+        deadline = time.monotonic() + SNAPSHOT_FLUSH_INTERVAL
+        while len(batch) < SNAPSHOT_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if batch and remaining <= 0:
+                break
+            try:
+                if batch:
+                    item = await asyncio.wait_for(_queue.get(), timeout=remaining)
+                else:
+                    item = await _queue.get()
+            except asyncio.TimeoutError:
+                break
+            if item is _FLUSH:
+                _queue.task_done()
+                break
+            batch.append(item)
+        return batch
+
+    @staticmethod
+    async def _run() -> None:
+        queue = _queue
+        await SnapshotStore._connect()
+        while True:
+            batch = await SnapshotStore._next_batch()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            try:
+                with Metrics.stage("db_write"):
+                    await _backend.write(batch)
+                _stats["written"] += len(batch)
+            except Exception as e:
+                _stats["failed"] += len(batch)
+                logger.error(f"Erro ao gravar lote de {len(batch)} snapshots: {e}")
+            finally:
+                _stats["batches"] += 1
+                _stats["last_latency_ms"] = (time.perf_counter() - start) * 1000
+                for _ in batch:
+                    queue.task_done()
+
+    @staticmethod
+    async def history(
+        post_id: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        bucket: Optional[int] = None,
+        limit: int = 500
+    ) -> Optional[Dict]:
+        """
+        Histórico de score de um post entre `since` e `until` (segundos desde a época).
+
+        Com `bucket` (segundos) os pontos são agregados pelo maior score de cada intervalo; sempre
+        são retornados os `limit` pontos mais recentes, em ordem cronológica.
+
+        Returns:
+            Optional[Dict]: `post_id`, `subreddit`, `title` e `history`, ou None se não houver snapshots no período.
+
+        Raises:
+            SnapshotStoreUnavailable: Se o histórico estiver desabilitado ou o banco ainda não estiver acessível.
+        """
+        if _backend is None or not _connected:
+            raise SnapshotStoreUnavailable("Histórico de posts indisponível.")
+        until = until or time.time()
+        since = since if since is not None else until - SNAPSHOT_HISTORY_DAYS * 86400
+        points = await _backend.history(post_id, since, until, bucket, limit)
+        if not points:
+            return None
+        post = await _backend.post(post_id) or {}
+        return {
+            "post_id": post_id,
+            "subreddit": post.get("subreddit"),
+            "title": post.get("title"),
+            "history": [{"snapshot_utc": ts, "score": score} for ts, score in points]
+        }
+
+    @staticmethod
+    async def ping() -> bool:
+        if _backend is None or not _connected:
+            return False
+        try:
+            return await _backend.ping()
+        except Exception:
+            return False
+
+    @staticmethod
+    def stats() -> Dict:
+        return {**_stats, "connected": _connected, "queued": _queue.qsize() if _queue is not None else 0}
+
+    @staticmethod
+    async def startup() -> None:
+        global _backend
+        if SNAPSHOTS_ENABLED and _backend is None:
+            _backend = build_backend()
+        if _backend is not None:
+            SnapshotStore._ensure_worker()
+
+    @staticmethod
+    async def flush(timeout: float = SNAPSHOT_SHUTDOWN_TIMEOUT) -> None:
+        """Grava imediatamente os snapshots da fila e aguarda (até `timeout` segundos) a conclusão."""
+        if _worker is None or _loop is not asyncio.get_running_loop() or not _connected:
+            return
+        try:
+            _queue.put_nowait(_FLUSH)
+        except asyncio.QueueFull:
+            pass
+        try:
+            await asyncio.wait_for(_queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"{_queue.qsize()} snapshots ainda não foram gravados.")
+
+    @staticmethod
+    async def shutdown(timeout: float = SNAPSHOT_SHUTDOWN_TIMEOUT) -> None:
+        """Aguarda a gravação dos snapshots pendentes (até `timeout` segundos), encerra o worker e fecha o banco."""
+        global _worker, _connected
+        if _worker is not None and _loop is asyncio.get_running_loop():
+            await SnapshotStore.flush(timeout)
+            _worker.cancel()
+        _worker = None
+        if _backend is not None and _connected:
+            await _backend.close()
+            _connected = False
@@ -0,0 +1,230 @@
+from cache.cache_handler import CacheHandler
+from metrics.instrumentation import Metrics
+from typing import Dict, List, Optional
+from redis.exceptions import RedisError
+import asyncio
+import logging
+import time
+import json
+import os
+
+TRENDING_ENABLED = os.getenv("TRENDING_ENABLED", "true").lower() == "true"
+TRENDING_KEY_PREFIX = os.getenv("TRENDING_KEY_PREFIX", "trending")
+# Intervalo mínimo (segundos) entre duas observações de um post para medir a velocidade do score
+TRENDING_MIN_INTERVAL = float(os.getenv("TRENDING_MIN_INTERVAL", 60))
+# Posts não observados há mais que esta janela (segundos) saem do ranking
+TRENDING_WINDOW = float(os.getenv("TRENDING_WINDOW", 6 * 3600))
+# Limite de posts acompanhados no Redis; acima dele os observados há mais tempo são descartados
+TRENDING_MAX_POSTS = int(os.getenv("TRENDING_MAX_POSTS", 10000))
+TRENDING_FLUSH_INTERVAL = float(os.getenv("TRENDING_FLUSH_INTERVAL", 1))
+# Observações pendentes por processo entre dois envios (uma por post; acima disso são descartadas)
+TRENDING_BUFFER_MAX = int(os.getenv("TRENDING_BUFFER_MAX", 5000))
+TRENDING_MAX_LIMIT = int(os.getenv("TRENDING_MAX_LIMIT", 100))
+
+OBSERVATIONS_KEY = f"{TRENDING_KEY_PREFIX}:observations"
+POSTS_KEY = f"{TRENDING_KEY_PREFIX}:posts"
+AUTHORS_KEY = f"{TRENDING_KEY_PREFIX}:authors"
+SEEN_KEY = f"{TRENDING_KEY_PREFIX}:seen"
+META_KEY = f"{TRENDING_KEY_PREFIX}:meta"
+
+# Aplica um lote de observações de forma atômica (vários workers enviam ao mesmo tempo):
+#   observations: post -> "score instante autor" da última observação usada como base
+#   posts / authors: sorted sets de velocidade (pontos por hora); a do autor é a soma das de seus posts
+#   seen: sorted set post -> instante da última observação, usado para expirar e limitar os posts
+#   meta: post -> JSON do post, devolvido pelo /trending
+# A velocidade só é recalculada depois de TRENDING_MIN_INTERVAL desde a base, e fica em zero quando o
+# score cai: o ranking é de posts em alta. Posts esquecidos descontam sua velocidade do autor.
+UPDATE_SCRIPT = """
+local min_interval = tonumber(ARGV[1])
+local cutoff = tonumber(ARGV[2])
+local max_posts = tonumber(ARGV[3])
+local updated = 0
+
+local function forget(id)
+    local previous = redis.call('HGET', KEYS[1], id)
+    if previous then
+        local author = string.match(previous, '^%S+ %S+ (.*)$')
+        local velocity = tonumber(redis.call('ZSCORE', KEYS[2], id) or 0)
+        if velocity > 0 and author ~= '' then
+            redis.call('ZINCRBY', KEYS[3], -velocity, author)
+        end
+    end
+    redis.call('HDEL', KEYS[1], id)
+    redis.call('HDEL', KEYS[5], id)
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('ZREM', KEYS[4], id)
+end
+
+for i = 4, #ARGV, 5 do
+    local id, score, ts, author = ARGV[i], tonumber(ARGV[i + 1]), tonumber(ARGV[i + 2]), ARGV[i + 3]
+    redis.call('HSET', KEYS[5], id, ARGV[i + 4])
+    redis.call('ZADD', KEYS[4], 'GT', ts, id)
+    local previous = redis.call('HGET', KEYS[1], id)
+    if not previous then
+        redis.call('HSET', KEYS[1], id, score .. ' ' .. ts .. ' ' .. author)
+    else
+        local previous_score, previous_ts = string.match(previous, '^(%S+) (%S+)')
+        local elapsed = ts - tonumber(previous_ts)
+        if elapsed >= min_interval then
+            local velocity = math.max((score - tonumber(previous_score)) * 3600 / elapsed, 0)
+            local old = tonumber(redis.call('ZSCORE', KEYS[2], id) or 0)
+            redis.call('ZADD', KEYS[2], velocity, id)
+            if author ~= '' and velocity ~= old then
+                redis.call('ZINCRBY', KEYS[3], velocity - old, author)
+            end
+            redis.call('HSET', KEYS[1], id, score .. ' ' .. ts .. ' ' .. author)
+            updated = updated + 1
+        end
+    end
+end
+
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[4], '-inf', '(' .. cutoff)) do
+    forget(id)
+end
+local excess = redis.call('ZCARD', KEYS[4]) - max_posts
+if excess > 0 then
+    for _, id in ipairs(redis.call('ZRANGE', KEYS[4], 0, excess - 1)) do
+        forget(id)
+    end
+end
+-- Autores sem nenhum post em alta (a soma fica em zero, a menos de erro de arredondamento)
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', 1e-6)
+return updated
+"""
+
+logger = logging.getLogger(__name__)
+
+_buffer: Dict[str, tuple] = {}
+_flush_task: Optional[asyncio.Task] = None
+# UPDATE_SCRIPT registrado uma vez: cada envio usa EVALSHA (só o SHA1 trafega) e o redis-py recarrega
+# o script com SCRIPT LOAD se o Redis responder NOSCRIPT (ex: após um restart)
+_update_script = None
+_stats = {"recorded": 0, "dropped": 0, "flushes": 0, "updated": 0, "failed": 0}
+
+class TrendingUnavailable(Exception):
+    """Lançada quando o ranking está desabilitado ou o Redis não está acessível."""
+
+class TrendingService:
+    """
+    Ranking de posts e autores pela velocidade do score (pontos por hora), entre todos os subreddits.
+
+    Cada listagem buscada no Reddit registra uma observação por post. As observações ficam em memória
+    e são enviadas em lote ao Redis a cada TRENDING_FLUSH_INTERVAL segundos, onde um script atualiza
+    os sorted sets de forma incremental: a consulta do top-N é um ZREVRANGEBYSCORE, sem varrer o
+    Elasticsearch. A memória é limitada pela janela TRENDING_WINDOW e por TRENDING_MAX_POSTS.
+    """
+    @staticmethod
+    def record(posts: List[Dict], fetched_at: Optional[float] = None) -> None:
+        """Registra uma observação de cada post da listagem, sem bloquear o chamador."""
+        if not TRENDING_ENABLED or not posts:
+            return
+        fetched_at = fetched_at or time.time()
+        for post in posts:
+            post_id = post.get("id")
+            if not post_id:
+                continue
+            if post_id not in _buffer and len(_buffer) >= TRENDING_BUFFER_MAX:
+                _stats["dropped"] += 1
+                continue
+            _buffer[post_id] = (int(post.get("score", 0)), fetched_at, post.get("author") or "", post)
+            _stats["recorded"] += 1
+        TrendingService._schedule_flush()
+
+    @staticmethod
+    def _schedule_flush() -> None:
+        global _flush_task
+        if _flush_task is None or _flush_task.done() or _flush_task.get_loop() is not asyncio.get_running_loop():
+            _flush_task = asyncio.ensure_future(TrendingService._flush_later())
+
+    @staticmethod
+    async def _flush_later() -> None:
+        await asyncio.sleep(TRENDING_FLUSH_INTERVAL)
+        try:
+            await TrendingService.flush()
+        except Exception:
+            logger.exception("Erro ao enviar as observações do ranking ao Redis.")
+
+    @staticmethod
+    def _update_script():
+        global _update_script
+        if _update_script is None:
+            _update_script = CacheHandler.get_client().register_script(UPDATE_SCRIPT)
+        return _update_script
+
+    @staticmethod
+    async def flush(now: Optional[float] = None) -> int:
+        """Envia ao Redis as observações pendentes e retorna quantas velocidades foram atualizadas."""
+        if not _buffer:
+            return 0
+        observations = list(_buffer.items())
+        _buffer.clear()
+        if not CacheHandler.is_available():
+            _stats["failed"] += len(observations)
+            return 0
+        now = now or time.time()
+        args = [TRENDING_MIN_INTERVAL, now - TRENDING_WINDOW, TRENDING_MAX_POSTS]
+        for post_id, (score, observed_at, author, post) in observations:
+            args.extend([post_id, score, observed_at, author, json.dumps(post)])
+        try:
+            with Metrics.stage("cache_set"):
+                updated = await TrendingService._update_script()(
+                    keys=[OBSERVATIONS_KEY, POSTS_KEY, AUTHORS_KEY, SEEN_KEY, META_KEY],
+                    args=args,
+                    client=CacheHandler.get_client()
+                )
+        except (RedisError, OSError) as e:
+            _stats["failed"] += len(observations)
+            CacheHandler._mark_unavailable(e)
+            return 0
+        _stats["flushes"] += 1
+        _stats["updated"] += updated
+        return updated
+
+    @staticmethod
+    async def top(limit: int = 10) -> Dict[str, List[Dict]]:
+        """
+        Retorna os `limit` posts e autores com maior velocidade positiva.
+
+        Raises:
+            TrendingUnavailable: Se o ranking estiver desabilitado ou o Redis indisponível.
+        """
+        if not TRENDING_ENABLED:
+            raise TrendingUnavailable("Ranking de trending desabilitado (TRENDING_ENABLED=false).")
+        if not CacheHandler.is_available():
+            raise TrendingUnavailable("Redis indisponível para o ranking de trending.")
+        client = CacheHandler.get_client()
+        try:
+            with Metrics.stage("cache_get"):
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.zrevrangebyscore(POSTS_KEY, "+inf", "(0", start=0, num=limit, withscores=True)
+                    pipe.zrevrangebyscore(AUTHORS_KEY, "+inf", "(0", start=0, num=limit, withscores=True)
+                    posts, authors = await pipe.execute()
+                metadata = await client.hmget(META_KEY, [post_id for post_id, _ in posts]) if posts else []
+        except (RedisError, OSError) as e:
+            CacheHandler._mark_unavailable(e)
+            raise TrendingUnavailable(f"Falha ao consultar o ranking no Redis: {e}")
+
+        return {
+            "posts": [
+                {**json.loads(raw), "velocity": round(velocity, 2)}
+                for (_, velocity), raw in zip(posts, metadata) if raw is not None
+            ],
+            "authors": [{"author": author, "velocity": round(velocity, 2)} for author, velocity in authors]
+        }
+
+    @staticmethod
+    def stats() -> Dict:
+        return {**_stats, "buffered": len(_buffer)}
+
+    @staticmethod
+    async def shutdown() -> None:
+        """Cancela o envio agendado e envia as observações pendentes."""
+        global _flush_task
+        if _flush_task is not None:
+            _flush_task.cancel()
+            try:
+                await _flush_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            _flush_task = None
+        await TrendingService.flush()
@@ -1,42 +1,29 @@
-from elasticsearch import Elasticsearch
-import os
-import time
-import requests
+"""
+Espera o Elasticsearch e o Kibana ficarem disponíveis, em paralelo e com backoff exponencial.
 
-ES_HOST = os.getenv("ELASTICSEARCH_HOST", "localhost")
-ES_PORT = os.getenv("ELASTICSEARCH_PORT", 9200)
-KIBANA_HOST = os.getenv("KIBANA_HOST", "localhost")
-KIBANA_PORT = os.getenv("KIBANA_PORT", 5601)
+Uso: `python -m services.wait_for_services [elasticsearch,kibana] [--timeout 60]`; sai com código 1
+se alguma dependência não responder a tempo.
+"""
+from services.readiness import Readiness
+from services.elasticsearch_service import ElasticsearchService
+import argparse
+import asyncio
+import sys
 
-ELASTICSEARCH_URL = f"http://{ES_HOST}:{ES_PORT}"
-KIBANA_URL = f"http://{KIBANA_HOST}:{KIBANA_PORT}"
-
-def wait_for_elasticsearch():
-    print("Aguardando Elasticsearch...")
-    es = Elasticsearch([ELASTICSEARCH_URL])
-    for _ in range(30):  # Tenta por 30 segundos
-        try:
-            if es.ping():
-                print("Elasticsearch está pronto!")
-                return True
-        except Exception:
-            pass
-        time.sleep(1)
-    raise Exception("Elasticsearch não está disponível")
-
-def wait_for_kibana():
-    print("Aguardando Kibana...")
-    for _ in range(30):  # Tenta por 60 segundos
-        try:
-            response = requests.get(f"{KIBANA_URL}/api/status")
-            if response.status_code == 200:
-                print("Kibana está pronto!")
-                return True
-        except Exception:
-            pass
-        time.sleep(1)
-    raise Exception("Kibana não está disponível")
+async def wait_for_services(names, timeout: float) -> bool:
+    print(f"Aguardando {', '.join(names)}...")
+    try:
+        ready = await Readiness.wait_for_all(names, timeout=timeout)
+    finally:
+        await ElasticsearchService.close_async_client()
+    for name, ok in ready.items():
+        print(f"{name} está pronto!" if ok else f"{name} não está disponível")
+    return all(ready.values())
 
 if __name__ == "__main__":
-    wait_for_elasticsearch()
-    wait_for_kibana()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Espera as dependências ficarem disponíveis.")
+    parser.add_argument("services", nargs="?", default="elasticsearch,kibana")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+    names = [name.strip() for name in args.services.split(",") if name.strip()]
+    sys.exit(0 if asyncio.run(wait_for_services(names, args.timeout)) else 1)
@@ -0,0 +1,45 @@
+import pytest
+from unittest.mock import patch
+import fakeredis
+import redis.asyncio as redis
+from redis.backoff import NoBackoff
+from redis.asyncio.retry import Retry
+from cache.cache_handler import CacheHandler
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    CacheHandler.set_client(client)
+    yield client
+    CacheHandler.set_client(None)
+
+@pytest.mark.asyncio
+async def test_set_and_get_cache(fake_redis):
+    """Testa que valores gravados são lidos de volta com o TTL configurado."""
+    await CacheHandler.set_cache("chave", [{"title": "Post"}], ttl=60)
+
+    assert await CacheHandler.get_cache("chave") == [{"title": "Post"}]
+    assert 0 < await fake_redis.ttl("chave") <= 60
+    assert await CacheHandler.get_cache("inexistente") is None
+
+@pytest.mark.asyncio
+async def test_get_many_and_set_many(fake_redis):
+    """Testa a leitura e gravação em lote via MGET e pipeline."""
+    await CacheHandler.set_many({"a": {"valor": 1}, "b": {"valor": 2}}, ttl=60)
+
+    assert await CacheHandler.get_many(["a", "x", "b"]) == [{"valor": 1}, None, {"valor": 2}]
+    assert await CacheHandler.get_many([]) == []
+
+@pytest.mark.asyncio
+@patch("cache.cache_handler.CACHE_L1_ENABLED", False)
+async def test_fallback_when_redis_is_unreachable():
+    """Testa que, com o Redis fora do ar (e sem L1), o cache vira no-op em vez de propagar o erro."""
+    CacheHandler.set_client(redis.Redis(host="127.0.0.1", port=1, socket_connect_timeout=0.2, retry=Retry(NoBackoff(), 0)))
+    try:
+        await CacheHandler.set_cache("chave", {"valor": 1})
+        assert not CacheHandler.is_available()
+        assert await CacheHandler.get_cache("chave") is None
+        assert await CacheHandler.get_many(["chave"]) == [None]
+    finally:
+        await CacheHandler.close()
+        CacheHandler.set_client(None)
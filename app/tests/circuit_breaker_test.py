@@ -0,0 +1,152 @@
+import time
+import httpx
+import pytest
+import fakeredis
+from unittest.mock import patch
+from cache.cache_handler import CacheHandler
+from services import listing_service
+from services.circuit_breaker import CircuitBreaker, CircuitOpen, get_breaker, set_breaker, CLOSED, HALF_OPEN, OPEN
+from services.http_client import RedditHttpClient
+from services.listing_service import ListingService
+from services.rate_limit_governor import RateLimitGovernor, set_governor
+from services.reddit_service import RedditService, RedditAPIError, RedditRateLimitError, RedditUnavailableError, SubredditNotFound
+
+POSTS = [{"id": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1700000000, "score": 10}]
+
+class FailingReddit:
+    """Reddit simulado que responde 503 até `recover()` ser chamado."""
+    def __init__(self):
+        self.calls = 0
+        self.healthy = False
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if not self.healthy:
+            return httpx.Response(503, text="indisponível")
+        listing = {"data": {"children": [{"data": {"name": "t3_1", "title": "Post", "score": 1}}], "after": None}}
+        return httpx.Response(200, json=listing)
+
+@pytest.fixture
+def failing_reddit():
+    reddit = FailingReddit()
+    RedditHttpClient.set_client(httpx.AsyncClient(transport=httpx.MockTransport(reddit.handler)))
+    set_governor(RateLimitGovernor(["token"]))
+    set_breaker(CircuitBreaker(failure_threshold=3, open_seconds=0.05, half_open_probes=1, enabled=True))
+    CacheHandler.set_client(fakeredis.FakeAsyncRedis(decode_responses=True))
+    with patch("services.reddit_service.PostIndexer.enqueue"), \
+         patch("services.reddit_service.SnapshotStore.record"), \
+         patch("services.reddit_service.TrendingService.record"):
+        yield reddit
+    RedditHttpClient.set_client(None)
+    CacheHandler.set_client(None)
+    set_governor(None)
+    set_breaker(None)
+
+def test_breaker_opens_half_opens_and_closes():
+    """Testa o ciclo fechado → aberto → half-open (uma chamada de teste) → fechado."""
+    breaker = CircuitBreaker(failure_threshold=2, open_seconds=0.05, half_open_probes=1, enabled=True)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == HALF_OPEN
+    # Só uma chamada de teste por vez; uma falha nela reabre o circuito
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.opened == 2
+
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.stats() == {"state": 0, "consecutive_failures": 0, "opened": 2, "rejected": 2, "failures": 3, "successes": 1}
+
+def test_success_resets_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2, enabled=True)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+@pytest.mark.asyncio
+async def test_open_circuit_fails_fast_and_probes_after_cooldown(failing_reddit):
+    """Testa que com o circuito aberto o Reddit não é chamado e que a chamada de teste fecha o circuito."""
+    for _ in range(3):
+        with pytest.raises(RedditAPIError):
+            await RedditService.fetch_page("python")
+    assert failing_reddit.calls == 3
+
+    with pytest.raises(RedditUnavailableError) as error:
+        await RedditService.fetch_page("python")
+    assert failing_reddit.calls == 3
+    assert error.value.status_code == 503 and error.value.retry_after <= 0.05
+
+    failing_reddit.healthy = True
+    time.sleep(0.06)
+    assert (await RedditService.fetch_page("python"))["posts"][0]["id"] == "t3_1"
+
+@pytest.mark.asyncio
+async def test_open_circuit_serves_stale_listing(failing_reddit):
+    """Testa que, com o circuito aberto, a listagem antiga do cache é servida sem esperar pelo Reddit."""
+    key = ListingService.cache_key("python", "day", "hot")
+    entry = {"posts": POSTS, "after": None, "fetched_at": time.time() - listing_service.CACHE_HARD_TTL - 1}
+    await CacheHandler.set_cache(key, entry)
+    for _ in range(3):
+        with pytest.raises(RedditAPIError):
+            await RedditService.fetch_page("django")
+
+    assert await ListingService.get_posts("python") == (POSTS, "cache", "stale")
+    assert failing_reddit.calls == 3
+
+@pytest.fixture
+def empty_listing_reddit():
+    """Reddit simulado com listagem vazia; a resposta de `/about` é definida por cada teste."""
+    about = {"status": 404, "calls": 0}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if not request.url.path.endswith("/about"):
+            return httpx.Response(200, json={"data": {"children": [], "after": None}})
+        about["calls"] += 1
+        if about["status"] is None:
+            raise httpx.ConnectError("conexão recusada", request=request)
+        return httpx.Response(about["status"], text="{}")
+
+    RedditHttpClient.set_client(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    set_governor(RateLimitGovernor(["token"]))
+    set_breaker(CircuitBreaker(failure_threshold=3, open_seconds=60, enabled=True))
+    CacheHandler.set_client(fakeredis.FakeAsyncRedis(decode_responses=True))
+    yield about
+    RedditHttpClient.set_client(None)
+    CacheHandler.set_client(None)
+    set_governor(None)
+    set_breaker(None)
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status, error", [(503, RedditAPIError), (429, RedditRateLimitError), (None, RedditAPIError)])
+async def test_reddit_failure_on_existence_check_is_not_negatively_cached(empty_listing_reddit, status, error):
+    """Testa que 5xx, 429 e erros de conexão no `/about` viram erro da API, sem marcar o subreddit como inexistente."""
+    empty_listing_reddit["status"] = status
+    with pytest.raises(error) as raised:
+        await ListingService.get_posts("python")
+
+    assert not isinstance(raised.value, SubredditNotFound)
+    assert await CacheHandler.get_cache(ListingService.not_found_key("python")) is None
+    if status != 429:
+        assert get_breaker().consecutive_failures == 1
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("status", [403, 404])
+async def test_definitive_not_found_is_negatively_cached(empty_listing_reddit, status):
+    empty_listing_reddit["status"] = status
+    for _ in range(2):
+        with pytest.raises(SubredditNotFound):
+            await ListingService.get_posts("privado")
+
+    assert empty_listing_reddit["calls"] == 1
+    assert await CacheHandler.get_cache(ListingService.not_found_key("privado")) is not None
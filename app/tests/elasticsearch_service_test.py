@@ -0,0 +1,58 @@
+import pytest
+from elastic_transport import ApiResponseMeta, HttpHeaders, ObjectApiResponse
+from services.elasticsearch_service import ElasticsearchService, POST_FIELDS
+
+class StubAsyncElasticsearch:
+    """Cliente assíncrono simulado que devolve as páginas configuradas e guarda as buscas recebidas."""
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.searches = []
+
+    async def search(self, **kwargs):
+        self.searches.append(kwargs)
+        meta = ApiResponseMeta(status=200, http_version="1.1", headers=HttpHeaders(), duration=0.0, node=None)
+        return ObjectApiResponse(body=self.pages.pop(0), meta=meta)
+
+def hit(post_id: str, sort):
+    return {"_source": {"id": post_id, "title": "Post"}, "sort": sort}
+
+def test_build_search_multi_field_ranges_sort_and_source():
+    """Testa a montagem da busca: vários campos, filtros de intervalo, ordenação com desempate e _source filtrado."""
+    search = ElasticsearchService.build_search(
+        query="python", fields=["title", "author"], score_min=10, created_from=1700000000, created_to=1700086400,
+        sort="created_utc", order="asc", size=25
+    )
+
+    assert search["query"]["bool"]["must"] == [{"multi_match": {"query": "python", "fields": ["title", "author"], "lenient": True}}]
+    assert search["query"]["bool"]["filter"] == [
+        {"range": {"score": {"gte": 10}}},
+        {"range": {"created_utc": {"gte": 1700000000, "lte": 1700086400, "format": "epoch_second"}}}
+    ]
+    assert search["sort"] == [{"created_utc": "asc"}, {"id": "asc"}]
+    assert search["size"] == 25
+    assert search["source"] == POST_FIELDS
+    assert "search_after" not in search
+
+def test_build_search_rejects_invalid_parameters():
+    """Testa que campos, ordenações, tamanhos e cursores inválidos geram ValueError (400 na rota)."""
+    for kwargs in ({"fields": ["body"]}, {"sort": "comments"}, {"size": 0}, {"cursor": "não-é-base64"}):
+        with pytest.raises(ValueError):
+            ElasticsearchService.build_search(query="python", **kwargs)
+
+@pytest.mark.asyncio
+async def test_search_posts_pages_with_search_after_cursor():
+    """Testa a paginação: o cursor da página cheia vira o search_after da próxima; a última página não tem cursor."""
+    client = StubAsyncElasticsearch([
+        {"hits": {"hits": [hit("t3_1", [5.0, "t3_1"]), hit("t3_2", [4.0, "t3_2"])]}},
+        {"hits": {"hits": [hit("t3_3", [3.0, "t3_3"])]}}
+    ])
+    ElasticsearchService.set_async_client(client)
+    try:
+        first, cursor = await ElasticsearchService.search_posts(fields=["title"], query="python", size=2)
+        second, last_cursor = await ElasticsearchService.search_posts(fields=["title"], query="python", size=2, cursor=cursor)
+    finally:
+        ElasticsearchService.set_async_client(None)
+
+    assert [post["id"] for post in first + second] == ["t3_1", "t3_2", "t3_3"]
+    assert client.searches[1]["search_after"] == [4.0, "t3_2"]
+    assert last_cursor is None
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import pytest
+import pytest_asyncio
+from unittest.mock import patch
+from services.http_client import RedditHttpClient
+from services.reddit_service import RedditService
+
+LISTING = json.dumps({
+    "data": {
+        "children": [
+            {"data": {"name": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com/p", "created_utc": 1700000000, "score": 42}}
+        ]
+    }
+}).encode()
+
+def http_response(body: bytes) -> bytes:
+    return (
+        b"HTTP/1.1 200 OK\r\n"
+        b"Content-Type: application/json\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+
+class CountingServer:
+    """Servidor HTTP/1.1 local com keep-alive que conta as conexões TCP recebidas."""
+    def __init__(self):
+        self.connections = 0
+        self.server = None
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                writer.write(http_response(LISTING))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+@pytest_asyncio.fixture
+async def counting_server():
+    server = CountingServer()
+    server.server = await asyncio.start_server(server.handle, "127.0.0.1", 0)
+    # Cliente real (pool, keep-alive), apontado para o servidor local
+    RedditHttpClient.set_client(RedditHttpClient.build())
+    with patch("services.reddit_service.REDDIT_API_URL", server.url):
+        yield server
+    await RedditHttpClient.shutdown()
+    server.server.close()
+    await server.server.wait_closed()
+
+@pytest.mark.asyncio
+async def test_connection_reused_across_calls(counting_server):
+    """Testa que chamadas consecutivas ao Reddit reaproveitam a mesma conexão do pool."""
+    with patch("services.reddit_service.PostIndexer.enqueue"):
+        for _ in range(3):
+            posts = await RedditService.fetch_posts(subreddit="python", token="token")
+            assert posts[0]["score"] == 42
+
+    assert counting_server.connections == 1
+
+@pytest.mark.asyncio
+async def test_shared_client_is_singleton():
+    """Testa que o cliente compartilhado é criado uma única vez até o shutdown."""
+    client = RedditHttpClient.get_client()
+    assert RedditHttpClient.get_client() is client
+
+    await RedditHttpClient.shutdown()
+    assert client.is_closed
+    assert RedditHttpClient.get_client() is not client
+    await RedditHttpClient.shutdown()
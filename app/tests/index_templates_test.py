@@ -0,0 +1,118 @@
+from unittest.mock import Mock
+from elasticsearch import BadRequestError
+import pytest
+from services.index_templates import (
+    put_templates, ensure_posts_index, ensure_logs_index, migrate_posts, migrate_logs, POSTS_TEMPLATE_VERSION
+)
+
+def es_with(indices=(), aliases=None):
+    """Cliente Elasticsearch simulado com os índices concretos e aliases informados."""
+    aliases = aliases or {}
+    es = Mock()
+    es.indices.exists.side_effect = lambda index: index in indices or index in aliases
+    es.indices.exists_alias.side_effect = lambda name: name in aliases
+    es.indices.get_alias.side_effect = lambda name: Mock(body={index: {} for index in aliases[name]})
+    es.reindex.return_value = Mock(body={"created": 1})
+    return es
+
+def test_put_templates_are_versioned_with_keyword_subfields_and_ilm():
+    """Testa que os templates de posts e logs são versionados e que os logs usam ILM com rollover pelo alias."""
+    es = es_with()
+    put_templates(es, "posts", "logs_sistema")
+
+    templates = {call.kwargs["name"]: call.kwargs for call in es.indices.put_index_template.call_args_list}
+    posts = templates["posts_template"]
+    assert posts["index_patterns"] == ["posts_v*"]
+    assert posts["version"] == POSTS_TEMPLATE_VERSION
+    properties = posts["template"]["mappings"]["properties"]
+    assert properties["author"]["fields"]["keyword"]["type"] == "keyword"
+    assert properties["subreddit"]["type"] == "keyword"
+    assert posts["template"]["settings"]["refresh_interval"]
+    logs_settings = templates["logs_sistema_template"]["template"]["settings"]
+    assert logs_settings["index.lifecycle.rollover_alias"] == "logs_sistema"
+    assert es.ilm.put_lifecycle.call_args.kwargs["policy"]["phases"]["hot"]["actions"]["rollover"]
+
+def test_ensure_posts_index_creates_versioned_index_behind_alias():
+    """Testa que o índice é criado com versão e alias de escrita, e que um alias existente não é recriado."""
+    es = es_with()
+    assert ensure_posts_index(es, "posts") is True
+    es.indices.create.assert_called_once_with(index=f"posts_v{POSTS_TEMPLATE_VERSION}", aliases={"posts": {"is_write_index": True}})
+
+    es = es_with(indices={"posts_v2"}, aliases={"posts": ["posts_v2"]})
+    assert ensure_posts_index(es, "posts") is False
+    es.indices.create.assert_not_called()
+
+def test_index_created_by_another_worker_is_not_an_error():
+    """Testa que `resource_already_exists_exception` (corrida entre workers) conta como sucesso."""
+    es = es_with()
+    body = {"error": {"type": "resource_already_exists_exception"}, "status": 400}
+    es.indices.create.side_effect = BadRequestError(message="resource_already_exists_exception", meta=None, body=body)
+    assert ensure_posts_index(es, "posts") is False
+    assert ensure_logs_index(es, "logs_sistema") is False
+
+    es.indices.create.side_effect = BadRequestError(message="mapper_parsing_exception", meta=None, body={"error": {"type": "mapper_parsing_exception"}})
+    with pytest.raises(BadRequestError):
+        ensure_posts_index(es, "posts")
+
+def test_ensure_posts_index_leaves_legacy_index_for_migrate_command():
+    """Testa que o bootstrap não migra um índice legado com o nome do alias: só avisa e segue."""
+    es = es_with(indices={"posts"})
+    assert ensure_posts_index(es, "posts") is False
+
+    es.indices.create.assert_not_called()
+    es.reindex.assert_not_called()
+    es.indices.put_settings.assert_not_called()
+    es.indices.update_aliases.assert_not_called()
+
+def test_migrate_posts_from_legacy_index_swaps_alias_atomically():
+    """Testa a migração de um índice legado: cópia, bloqueio de escrita, segunda passada e troca atômica."""
+    es = es_with(indices={"posts"})
+    target = migrate_posts(es, "posts", version=3)
+
+    assert target == "posts_v3"
+    assert es.reindex.call_count == 2
+    assert es.reindex.call_args.kwargs["source"] == {"index": ["posts"]}
+    es.indices.update_aliases.assert_called_once_with(actions=[
+        {"remove_index": {"index": "posts"}},
+        {"add": {"index": "posts_v3", "alias": "posts", "is_write_index": True}}
+    ])
+    # O índice legado some na troca; não há o que desbloquear
+    es.indices.put_settings.assert_called_once_with(index=["posts"], settings={"index.blocks.write": True})
+
+def test_migrate_posts_between_versions_copies_updates_before_swap():
+    """Testa que a segunda passada copia também atualizações, com a escrita bloqueada, antes da troca do alias."""
+    es = es_with(indices={"posts_v2"}, aliases={"posts": ["posts_v2"]})
+    assert migrate_posts(es, "posts", version=3) == "posts_v3"
+
+    calls = [name for name, _, _ in es.method_calls if name in ("reindex", "indices.put_settings", "indices.update_aliases")]
+    assert calls == ["reindex", "indices.put_settings", "reindex", "indices.update_aliases", "indices.put_settings"]
+    es.indices.update_aliases.assert_called_once_with(actions=[
+        {"remove": {"index": "posts_v2", "alias": "posts"}},
+        {"add": {"index": "posts_v3", "alias": "posts", "is_write_index": True}}
+    ])
+    assert es.reindex.call_args.kwargs["dest"] == {"index": "posts_v3"}
+    assert es.indices.put_settings.call_args.kwargs == {"index": ["posts_v2"], "settings": {"index.blocks.write": False}}
+    es.indices.delete.assert_not_called()
+
+    es = es_with(indices={"posts_v3"}, aliases={"posts": ["posts_v3"]})
+    assert migrate_posts(es, "posts", version=3) is None
+
+def test_failed_swap_unblocks_sources():
+    es = es_with(indices={"posts_v2"}, aliases={"posts": ["posts_v2"]})
+    es.indices.update_aliases.side_effect = RuntimeError("falha na troca")
+    with pytest.raises(RuntimeError):
+        migrate_posts(es, "posts", version=3)
+    assert es.indices.put_settings.call_args.kwargs["settings"] == {"index.blocks.write": False}
+
+def test_migrate_logs_moves_legacy_index_to_rollover_series():
+    """Testa que o índice de logs legado vira o primeiro índice da série, sem perder os logs gravados na cópia."""
+    es = es_with(indices={"logs_sistema"})
+    assert migrate_logs(es, "logs_sistema") == "logs_sistema-000001"
+
+    calls = [name for name, _, _ in es.method_calls if name in ("reindex", "indices.put_settings", "indices.update_aliases")]
+    assert calls == ["reindex", "indices.put_settings", "reindex", "indices.update_aliases"]
+    assert es.reindex.call_args.kwargs["dest"] == {"index": "logs_sistema-000001", "op_type": "create"}
+    es.indices.update_aliases.assert_called_once_with(actions=[
+        {"remove_index": {"index": "logs_sistema"}},
+        {"add": {"index": "logs_sistema-000001", "alias": "logs_sistema", "is_write_index": True}}
+    ])
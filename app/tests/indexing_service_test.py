@@ -0,0 +1,75 @@
+import pytest
+import fakeredis
+from unittest.mock import patch
+from cache.cache_handler import CacheHandler
+from services import indexing_service
+from services.indexing_service import PostIndexer
+
+@pytest.fixture(autouse=True)
+def fake_redis():
+    # Os digests dos posts gravados ficam no Redis, compartilhados entre os workers
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    CacheHandler.set_client(client)
+    yield client
+    CacheHandler.set_client(None)
+
+def make_posts(n: int):
+    return [
+        {"id": f"t3_{i}", "title": f"Post {i}", "author": "autor", "url": "https://reddit.com", "created_utc": 1700000000, "score": 10}
+        for i in range(n)
+    ]
+
+@pytest.mark.asyncio
+async def test_posts_are_indexed_in_a_single_bulk_request():
+    """Testa que posts enfileirados são gravados com uma única chamada _bulk, keyed pelo fullname."""
+    posts = make_posts(3)
+    bulk_response = {"errors": False, "items": [{"index": {"status": 201}} for _ in posts]}
+
+    with patch("services.indexing_service.ElasticsearchService.bulk_index_posts", return_value=bulk_response) as mock_bulk:
+        indexed_before = PostIndexer.stats()["indexed"]
+        PostIndexer.enqueue(posts)
+        await PostIndexer.shutdown()
+
+    mock_bulk.assert_called_once()
+    sent = mock_bulk.call_args.args[0]
+    assert [post["id"] for post in sent] == ["t3_0", "t3_1", "t3_2"]
+    assert PostIndexer.stats()["indexed"] == indexed_before + 3
+
+@pytest.mark.asyncio
+async def test_indexing_failures_are_counted():
+    """Testa que erros do Elasticsearch são contabilizados sem propagar para quem enfileirou."""
+    with patch("services.indexing_service.ElasticsearchService.bulk_index_posts", side_effect=ConnectionError("offline")):
+        failed_before = PostIndexer.stats()["failed"]
+        PostIndexer.enqueue(make_posts(2))
+        await PostIndexer.shutdown()
+
+    assert PostIndexer.stats()["failed"] == failed_before + 2
+    assert indexing_service._worker is None
+
+@pytest.mark.asyncio
+async def test_unchanged_posts_are_not_reindexed(fake_redis):
+    """Testa que só posts novos ou alterados desde a última gravação bem-sucedida (em qualquer worker) vão ao Elasticsearch."""
+    posts = make_posts(3)
+    bulk_response = {"errors": False, "items": [{"index": {"status": 201}}, {"index": {"error": {"type": "mapper_parsing_exception"}}}, {"index": {"status": 201}}]}
+    with patch("services.indexing_service.ElasticsearchService.bulk_index_posts", return_value=bulk_response):
+        PostIndexer.enqueue(posts)
+        await PostIndexer.shutdown()
+
+    assert await fake_redis.get(PostIndexer.dedup_key("t3_0")) == f'"{PostIndexer.content_hash(posts[0])}"'
+    assert await fake_redis.get(PostIndexer.dedup_key("t3_1")) is None
+
+    unchanged_before = PostIndexer.stats()["unchanged"]
+    changed = {**posts[2], "score": 11}
+    with patch("services.indexing_service.ElasticsearchService.bulk_index_posts", return_value={"items": []}) as mock_bulk:
+        PostIndexer.enqueue([posts[0], posts[1], changed])
+        await PostIndexer.shutdown()
+
+    # O post que falhou é regravado, o alterado também; o que não mudou fica de fora
+    assert [post["id"] for post in mock_bulk.call_args.args[0]] == ["t3_1", "t3_2"]
+    assert PostIndexer.stats()["unchanged"] == unchanged_before + 1
+
+def test_content_hash_is_stable_across_processes():
+    """Testa que o digest não depende do processo (seed do `hash` nativo) nem da ordem das chaves."""
+    post = make_posts(1)[0]
+    assert PostIndexer.content_hash(post) == "0a6cc56c0805df1e"
+    assert PostIndexer.content_hash(dict(reversed(list(post.items())))) == "0a6cc56c0805df1e"
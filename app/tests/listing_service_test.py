@@ -0,0 +1,254 @@
+import asyncio
+import json
+import time
+import pytest
+import fakeredis
+from unittest.mock import patch
+from cache.cache_handler import CacheHandler
+from cache.single_flight import SingleFlight
+from services import listing_service
+from services.listing_service import ListingService
+from services.reddit_service import RedditRateLimitError, RedditAPIError, SubredditNotFound
+
+POSTS = [{"id": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1700000000, "score": 10}]
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    CacheHandler.set_client(client)
+    yield client
+    CacheHandler.set_client(None)
+
+def page(posts, after=None):
+    return {"posts": posts, "after": after}
+
+def slow_fetch(calls: list, delay: float = 0.05):
+    async def fetch_page(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(delay)
+        return page(POSTS)
+    return fetch_page
+
+@pytest.mark.asyncio
+async def test_single_flight_runs_once_for_concurrent_calls():
+    """Testa que chamadas concorrentes com a mesma chave executam a corrotina uma única vez."""
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "resultado"
+
+    results = await asyncio.gather(*[flight.do("chave", work) for _ in range(5)])
+
+    assert results == ["resultado"] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "in_flight": 0}
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors_to_all_callers():
+    """Testa que a exceção da busca compartilhada chega a todos os chamadores."""
+    flight = SingleFlight()
+
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise ValueError("falhou")
+
+    results = await asyncio.gather(*[flight.do("chave", failing) for _ in range(3)], return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_share_one_upstream_fetch(fake_redis):
+    """Testa que misses concorrentes na mesma chave geram apenas uma chamada ao Reddit."""
+    calls = []
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=slow_fetch(calls)):
+        results = await asyncio.gather(*[ListingService.get_posts("python", "token") for _ in range(10)])
+
+    assert len(calls) == 1
+    assert all(result == (POSTS, "api", "miss") for result in results)
+    assert await ListingService.get_posts("python", "token") == (POSTS, "cache", "hit")
+
+@pytest.mark.asyncio
+async def test_distributed_lock_waits_for_other_worker(fake_redis):
+    """Testa que, com o lock de outro worker ativo, a listagem é lida do cache quando ele termina."""
+    cache_key = ListingService.cache_key("python", "day", "hot")
+    await fake_redis.set(f"lock:{cache_key}", "outro-worker", px=5000)
+
+    async def other_worker_finishes():
+        await asyncio.sleep(0.05)
+        await CacheHandler.set_cache(cache_key, {"posts": POSTS, "fetched_at": time.time()})
+
+    calls = []
+    with patch("services.listing_service.CACHE_DISTRIBUTED_LOCK", True), \
+         patch("services.listing_service.CACHE_LOCK_POLL_INTERVAL", 0.01), \
+         patch("services.listing_service.RedditService.fetch_page", side_effect=slow_fetch(calls)):
+        result, _ = await asyncio.gather(ListingService.get_posts("python", "token"), other_worker_finishes())
+
+    assert result == (POSTS, "cache", "hit")
+    assert calls == []
+    assert listing_service._lock_stats["served_after_wait"] >= 1
+
+async def seed_cache(age: float):
+    cache_key = ListingService.cache_key("python", "day", "hot")
+    await CacheHandler.set_cache(cache_key, {"posts": POSTS, "fetched_at": time.time() - age})
+
+@pytest.mark.asyncio
+async def test_soft_expired_entry_is_served_stale_and_refreshed(fake_redis):
+    """Testa que, após o soft TTL, a listagem antiga é servida e atualizada em background."""
+    await seed_cache(age=listing_service.CACHE_SOFT_TTL + 1)
+    fresh = [dict(POSTS[0], score=99)]
+
+    async def fetch_page(**kwargs):
+        return page(fresh)
+
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=fetch_page):
+        assert await ListingService.get_posts("python", "token") == (POSTS, "cache", "stale")
+        await asyncio.gather(*listing_service._background_refreshes)
+
+    assert await ListingService.get_posts("python", "token") == (fresh, "cache", "hit")
+
+@pytest.mark.asyncio
+async def test_hard_expired_entry_requires_sync_fetch(fake_redis):
+    """Testa que, após o hard TTL, a busca no Reddit é feita antes de responder."""
+    await seed_cache(age=listing_service.CACHE_HARD_TTL + 1)
+    calls = []
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=slow_fetch(calls, delay=0)):
+        assert await ListingService.get_posts("python", "token") == (POSTS, "api", "miss")
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", [RedditRateLimitError(), RedditAPIError("Erro no servidor", status_code=503)])
+async def test_stale_entry_served_when_reddit_fails(fake_redis, error):
+    """Testa que erros 429/5xx do Reddit servem a listagem antiga em vez de falhar."""
+    await seed_cache(age=listing_service.CACHE_HARD_TTL + 1)
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=error):
+        assert await ListingService.get_posts("python", "token") == (POSTS, "cache", "stale")
+
+@pytest.mark.asyncio
+async def test_not_found_is_not_masked_by_stale_entry(fake_redis):
+    """Testa que um 404 continua sendo propagado mesmo com listagem antiga no cache."""
+    await seed_cache(age=listing_service.CACHE_HARD_TTL + 1)
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=SubredditNotFound("python")):
+        with pytest.raises(SubredditNotFound):
+            await ListingService.get_posts("python", "token")
+
+@pytest.mark.asyncio
+async def test_different_limits_share_one_canonical_listing(fake_redis):
+    """Testa que limites diferentes são servidos (recortados) da mesma listagem canônica."""
+    listing = [dict(POSTS[0], id=f"t3_{i}", score=i) for i in range(100)]
+    calls = []
+
+    async def fetch_page(**kwargs):
+        calls.append(kwargs)
+        return page(listing)
+
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=fetch_page):
+        first, _, first_status = await ListingService.get_posts("Python", "token", limit=10)
+        second, _, second_status = await ListingService.get_posts("python", "token", limit=25)
+
+    assert len(calls) == 1
+    assert calls[0]["limit"] == 100
+    assert (first, first_status) == (listing[:10], "miss")
+    assert (second, second_status) == (listing[:25], "hit")
+
+def test_period_is_ignored_for_periodless_sort_types():
+    """Testa que o período só faz parte da chave nas ordenações em que o Reddit o considera."""
+    assert ListingService.cache_key("python", "day", "hot") == ListingService.cache_key("python", "week", "hot")
+    assert ListingService.cache_key("python", "day", "top") != ListingService.cache_key("python", "week", "top")
+
+def make_listing(start: int, count: int):
+    return [dict(POSTS[0], id=f"t3_{i}", score=i) for i in range(start, start + count)]
+
+def paged_fetch(calls: list, pages: int = 3):
+    async def fetch_page(**kwargs):
+        calls.append(kwargs.get("after"))
+        index = 0 if kwargs.get("after") is None else int(kwargs["after"].split("_")[1])
+        after = f"cursor_{index + 1}" if index + 1 < pages else None
+        return page(make_listing(index * 100, 100), after=after)
+    return fetch_page
+
+async def collect(stream):
+    return [json.loads(line) async for line in stream]
+
+@pytest.mark.asyncio
+async def test_stream_follows_after_cursor_and_caches_pages(fake_redis):
+    """Testa que o stream percorre as páginas pelo cursor e que um segundo consumidor reaproveita o cache."""
+    calls = []
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=paged_fetch(calls)):
+        posts = await collect(ListingService.stream_posts("python", "token", max_posts=250))
+        again = await collect(ListingService.stream_posts("python", "token", max_posts=250))
+
+    assert len(posts) == 250
+    assert [post["id"] for post in posts] == [f"t3_{i}" for i in range(250)]
+    assert calls == [None, "cursor_1", "cursor_2"]
+    assert again == posts
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("subreddit, first_is_page", [("python", True), ("django", False)])
+async def test_first_page_and_listing_share_one_fetch_concurrently(fake_redis, subreddit, first_is_page):
+    """Testa que a primeira página do stream e o get_posts da mesma listagem, em paralelo e em qualquer ordem, compartilham a busca."""
+    calls = []
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=slow_fetch(calls)):
+        get_page = ListingService.get_page(subreddit, "token")
+        get_posts = ListingService.get_posts(subreddit, "token")
+        results = await asyncio.gather(*((get_page, get_posts) if first_is_page else (get_posts, get_page)))
+
+    first_page, listing = results if first_is_page else results[::-1]
+    assert first_page["posts"] == POSTS and first_page["after"] is None
+    assert listing == (POSTS, "api", "miss")
+    assert len(calls) == 1
+
+@pytest.mark.asyncio
+async def test_stream_reports_errors_as_last_line(fake_redis):
+    """Testa que um erro no meio do stream é enviado como última linha NDJSON."""
+    async def fetch_page(**kwargs):
+        if kwargs.get("after"):
+            raise RedditRateLimitError()
+        return page(make_listing(0, 100), after="cursor_1")
+
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=fetch_page):
+        lines = await collect(ListingService.stream_posts("python", "token", max_posts=500))
+
+    assert len(lines) == 101
+    assert lines[-1]["status_code"] == 429
+
+@pytest.mark.asyncio
+async def test_batch_resolves_hits_and_misses_with_per_item_errors(fake_redis):
+    """Testa o lote: hits do cache, misses buscados em paralelo e erros por item sem falhar o lote."""
+    await CacheHandler.set_cache(ListingService.cache_key("cached", "day", "hot"), {"posts": POSTS, "fetched_at": time.time()})
+    in_flight, peak = [0], [0]
+
+    async def fetch_page(**kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.02)
+        in_flight[0] -= 1
+        if kwargs["subreddit"] == "missing":
+            raise SubredditNotFound("missing")
+        return page(make_listing(0, 100))
+
+    items = [{"subreddit": name, "period": "day", "limit": 5, "sort_type": "hot"}
+             for name in ["cached", "missing", "a", "b", "c", "d", "a"]]
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=fetch_page) as mock_fetch:
+        results = await ListingService.get_posts_batch(items, "token", concurrency=2)
+
+    assert results[0] == (POSTS, "cache", "hit")
+    assert isinstance(results[1], SubredditNotFound)
+    assert all(result[2] == "miss" and len(result[0]) == 5 for result in results[2:])
+    assert mock_fetch.call_count == 5
+    assert peak[0] == 2
+
+@pytest.mark.asyncio
+async def test_not_found_subreddit_is_negatively_cached(fake_redis):
+    """Testa que um subreddit inexistente fica marcado no cache e as consultas seguintes não chamam o Reddit."""
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=SubredditNotFound("bots")) as fetch:
+        for _ in range(3):
+            with pytest.raises(SubredditNotFound):
+                await ListingService.get_posts("Bots")
+        with pytest.raises(SubredditNotFound):
+            await ListingService.get_page("bots")
+
+    assert fetch.call_count == 1
+    assert await fake_redis.ttl(ListingService.not_found_key("bots")) <= listing_service.CACHE_NOT_FOUND_TTL
+    assert ListingService.stats()["not_found"]["hits"] >= 3
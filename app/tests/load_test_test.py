@@ -0,0 +1,36 @@
+import pytest
+from benchmarks.load_test import compare, percentile, run_suite
+
+def test_percentile():
+    """Testa o cálculo de percentis usado no relatório."""
+    values = list(range(1, 101))
+
+    assert percentile(values, 0.50) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([7.0], 0.95) == 7.0
+
+def test_compare_flags_regressions():
+    """Testa que a comparação marca quedas de vazão e aumentos de latência acima do limite."""
+    baseline = {"scenarios": {"posts_hit": {"throughput_rps": 1000, "p50_ms": 1.0, "p95_ms": 2.0, "p99_ms": 3.0}}}
+    current = {"scenarios": {
+        "posts_hit": {"throughput_rps": 700, "p50_ms": 1.05, "p95_ms": 2.0, "p99_ms": 6.0},
+        "novo_cenario": {"throughput_rps": 1, "p50_ms": 1, "p95_ms": 1, "p99_ms": 1}
+    }}
+
+    lines = compare(current, baseline)
+
+    assert len(lines) == 4
+    assert "regressão" in lines[0] and "throughput_rps" in lines[0]
+    assert "regressão" not in lines[1]
+    assert "regressão" in lines[3] and "p99_ms" in lines[3]
+
+@pytest.mark.asyncio
+async def test_suite_runs_offline():
+    """Testa uma rodada curta do benchmark: todos os cenários respondem sem depender de serviços externos."""
+    result = await run_suite(requests=10, concurrency=2, reddit_latency=0.0, rate_limited=0.0)
+
+    assert set(result["scenarios"]) == {"posts_hit", "posts_miss", "search_cached", "search_uncached"}
+    for metrics in result["scenarios"].values():
+        assert metrics["requests"] == 10
+        assert metrics["errors"] == 0
+        assert metrics["p50_ms"] <= metrics["p99_ms"]
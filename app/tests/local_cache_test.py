@@ -0,0 +1,79 @@
+import asyncio
+import json
+import time
+import pytest
+import fakeredis
+from cache.local_cache import LocalCache
+from cache.cache_handler import CacheHandler, CACHE_INVALIDATION_CHANNEL
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    CacheHandler.set_client(client)
+    yield client
+    CacheHandler.set_client(None)
+
+def test_lru_evicts_least_recently_used_by_size():
+    """Testa que o limite de memória descarta as entradas menos usadas recentemente."""
+    cache = LocalCache(max_bytes=30, ttl=60)
+    cache.set("a", "A", size=10)
+    cache.set("b", "B", size=10)
+    cache.set("c", "C", size=10)
+    cache.get("a")
+    cache.set("d", "D", size=10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] == 30
+
+def test_entries_expire_after_ttl():
+    """Testa que entradas expiradas não são servidas."""
+    cache = LocalCache(max_bytes=100, ttl=60)
+    cache.set("a", "A", size=1, ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+@pytest.mark.asyncio
+async def test_l1_serves_hits_without_redis(fake_redis):
+    """Testa que, após a primeira leitura, a chave é servida pelo L1 e contada por camada."""
+    await fake_redis.set("chave", json.dumps({"valor": 1}))
+
+    assert await CacheHandler.get_cache("chave") == {"valor": 1}
+    await fake_redis.delete("chave")
+    assert await CacheHandler.get_cache("chave") == {"valor": 1}
+
+    stats = CacheHandler.stats()
+    assert stats["redis"]["hits"] >= 1
+    assert stats["l1"]["hits"] >= 1
+
+@pytest.mark.asyncio
+async def test_invalidation_from_other_worker_drops_local_copy(fake_redis):
+    """Testa que uma invalidação publicada por outro worker remove a entrada do L1."""
+    await CacheHandler.set_cache("chave", {"valor": 1})
+    await CacheHandler.start_invalidation_listener()
+    try:
+        await asyncio.sleep(0.05)
+        await fake_redis.set("chave", json.dumps({"valor": 2}))
+        await fake_redis.publish(CACHE_INVALIDATION_CHANNEL, json.dumps({"key": "chave", "origin": "outro-worker"}))
+        await asyncio.sleep(0.05)
+
+        assert await CacheHandler.get_cache("chave") == {"valor": 2}
+    finally:
+        await CacheHandler.stop_invalidation_listener()
+
+@pytest.mark.asyncio
+async def test_own_invalidation_keeps_local_copy(fake_redis):
+    """Testa que o worker que gravou a chave mantém sua cópia no L1."""
+    await CacheHandler.start_invalidation_listener()
+    try:
+        await asyncio.sleep(0.05)
+        await CacheHandler.set_cache("chave", {"valor": 1})
+        await asyncio.sleep(0.05)
+        await fake_redis.delete("chave")
+
+        assert await CacheHandler.get_cache("chave") == {"valor": 1}
+    finally:
+        await CacheHandler.stop_invalidation_listener()
@@ -0,0 +1,92 @@
+import json
+import logging
+import threading
+from unittest.mock import Mock, patch
+from loggers.log_handler import ElasticsearchLogHandler
+
+class FakeSession:
+    """Sessão HTTP falsa que registra os corpos enviados para a API _bulk."""
+    def __init__(self, release: threading.Event = None):
+        self.bodies = []
+        self.release = release
+
+    def post(self, url, data, headers, timeout):
+        if self.release is not None:
+            self.release.wait(5)
+        lines = data.decode().strip().split("\n")
+        self.bodies.append(lines)
+        response = Mock()
+        response.raise_for_status.return_value = None
+        response.json.return_value = {"items": [{"index": {"status": 201}} for _ in lines[::2]]}
+        return response
+
+def make_record(message: str, level: int = logging.INFO):
+    return logging.LogRecord("teste", level, __file__, 1, message, None, None)
+
+def test_records_are_shipped_in_bulk():
+    """Testa que os registros são agrupados e enviados em uma única chamada _bulk."""
+    session = FakeSession()
+    handler = ElasticsearchLogHandler(batch_size=10, flush_interval=0.2, session=session)
+
+    for i in range(5):
+        handler.emit(make_record(f"mensagem {i}"))
+    handler.flush()
+
+    assert len(session.bodies) == 1
+    lines = session.bodies[0]
+    assert lines[0] == '{"index":{}}'
+    assert json.loads(lines[1])["message"] == "mensagem 0"
+    assert handler.stats()["shipped"] == 5
+    handler.close()
+
+def test_full_queue_drops_records():
+    """Testa que registros são descartados (e contados) quando a fila está cheia."""
+    release = threading.Event()
+    session = FakeSession(release=release)
+    handler = ElasticsearchLogHandler(queue_size=2, batch_size=1, flush_interval=0.05, session=session)
+
+    for i in range(10):
+        handler.emit(make_record(f"mensagem {i}"))
+    stats = handler.stats()
+    release.set()
+    handler.close()
+
+    assert stats["dropped"] > 0
+    assert handler.stats()["shipped"] + stats["dropped"] == 10
+
+def test_sample_policy_keeps_warnings():
+    """Testa que a política de amostragem nunca descarta registros WARNING ou acima por amostragem."""
+    release = threading.Event()
+    handler = ElasticsearchLogHandler(queue_size=100, batch_size=1, flush_interval=0.05,
+                                      full_policy="sample", sample_rate=10, session=FakeSession(release=release))
+    for i in range(90):
+        handler.emit(make_record(f"info {i}"))
+    dropped_before = handler.stats()["dropped"]
+    assert dropped_before > 0
+    handler.emit(make_record("atenção", logging.WARNING))
+
+    assert handler.stats()["dropped"] == dropped_before
+    release.set()
+    handler.close()
+
+def test_sampling_counters_are_exact_across_threads():
+    """Testa que amostragem e descartes feitos por várias threads ao mesmo tempo são contados sem perdas."""
+    release = threading.Event()
+    handler = ElasticsearchLogHandler(queue_size=1000, batch_size=1, flush_interval=0.05,
+                                      full_policy="sample", sample_rate=10, session=FakeSession(release=release))
+
+    def emit_many():
+        for i in range(1000):
+            handler.emit(make_record(f"info {i}"))
+
+    with patch("loggers.log_handler.LOG_SAMPLE_WATERMARK", 0):
+        threads = [threading.Thread(target=emit_many) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert handler._sample_counter == 8000
+    assert handler.stats()["dropped"] == 7200
+    release.set()
+    handler.close()
@@ -1,5 +1,10 @@
 from fastapi.testclient import TestClient
+from unittest.mock import patch
 from main import app
+from services.reddit_service import SubredditNotFound, RedditUnavailableError
+from services.trending_service import TrendingUnavailable
+from cache.response_cache import ResponseCache
+from services.listing_service import ListingService
 
 client = TestClient(app)
 
@@ -7,3 +12,121 @@ def test_root():
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": "Teste prático nouslatam backend"}
+
+def test_stream_posts_returns_ndjson():
+    first_page = {"posts": [{"id": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": 1}], "after": None}
+    with patch("main.ListingService.get_page", return_value=first_page):
+        response = client.get("/posts/python/stream?max_posts=10")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.text.strip().split("\n") == ['{"id": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": 1}']
+
+def test_stream_posts_not_found_before_streaming():
+    with patch("main.ListingService.get_page", side_effect=SubredditNotFound("inexistente")):
+        response = client.get("/posts/inexistente/stream")
+    assert response.status_code == 404
+
+def test_invalid_subreddit_name_is_rejected_before_counting():
+    """Testa que nomes de subreddit fora do formato do Reddit são recusados (422) sem chegar ao serviço."""
+    with patch("main.ListingService.get_listing") as mock_get_listing, \
+         patch("main.ListingService.get_page") as mock_get_page, \
+         patch("main.ListingService.get_posts_batch") as mock_batch:
+        assert client.get("/posts/a:b").status_code == 422
+        assert client.get("/posts/x").status_code == 422
+        assert client.get("/posts/a:b/stream").status_code == 422
+        assert client.post("/posts/batch", json={"items": [{"subreddit": "a:b"}]}).status_code == 422
+    mock_get_listing.assert_not_called()
+    mock_get_page.assert_not_called()
+    mock_batch.assert_not_called()
+
+def test_batch_posts_returns_per_item_results_and_errors():
+    post = {"id": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": 1}
+    batch_results = [([post], "cache", "hit"), SubredditNotFound("inexistente")]
+    with patch("main.ListingService.get_posts_batch", return_value=batch_results) as mock_batch:
+        response = client.post("/posts/batch", json={
+            "items": [{"subreddit": "python", "limit": 5}, {"subreddit": "inexistente", "sort_type": "top"}],
+            "period": "week"
+        })
+
+    assert response.status_code == 200
+    items = mock_batch.call_args.args[0]
+    assert items[0] == {"subreddit": "python", "period": "week", "limit": 5, "sort_type": "hot"}
+    assert items[1] == {"subreddit": "inexistente", "period": "week", "limit": 10, "sort_type": "top"}
+    first, second = response.json()["results"]
+    assert first["cache_status"] == "hit" and first["posts"][0]["id"] == "t3_1"
+    assert second["error"]["status_code"] == 404
+
+def test_search_posts_returns_next_cursor_header():
+    post = {"id": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": 1}
+    with patch("main.SearchService.search", return_value=([post], "cursor_2", "miss")) as mock_search:
+        response = client.get("/search/posts?field=title,author&query=python&size=1&sort=score&score_min=1")
+    assert response.status_code == 200
+    assert response.json() == [post]
+    assert response.headers["X-Next-Cursor"] == "cursor_2"
+    assert response.headers["X-Cache-Status"] == "miss"
+    assert mock_search.call_args.kwargs["fields"] == ["title", "author"]
+    assert mock_search.call_args.kwargs["score_min"] == 1
+    assert mock_search.call_args.kwargs["bypass"] is False
+
+def test_search_posts_bypass_header():
+    post = {"id": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": 1}
+    with patch("main.SearchService.search", return_value=([post], None, "bypass")) as mock_search:
+        response = client.get("/search/posts?field=title&query=python", headers={"X-Cache-Bypass": "1"})
+    assert response.status_code == 200
+    assert "X-Next-Cursor" not in response.headers
+    assert mock_search.call_args.kwargs["bypass"] is True
+
+def test_search_posts_not_found():
+    with patch("main.SearchService.search", return_value=([], None, "miss")):
+        response = client.get("/search/posts?field=title&query=inexistente")
+    assert response.status_code == 404
+
+def test_get_posts_serves_ready_body_with_gzip_negotiation():
+    posts = [{"id": f"t3_{n}", "title": "Post " * 20, "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": n} for n in range(20)]
+    stored = ResponseCache.encode({"posts": posts, "origin": "cache", "cache_status": "hit"})
+    with patch("main.ListingService.get_cached_body", return_value=stored), \
+         patch("main.ListingService.get_listing") as mock_get_listing:
+        compressed = client.get("/posts/python", headers={"Accept-Encoding": "gzip"})
+        plain = client.get("/posts/python", headers={"Accept-Encoding": "identity"})
+    mock_get_listing.assert_not_called()
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.json()["posts"] == posts
+    assert "content-encoding" not in plain.headers
+    assert plain.json()["cache_status"] == "hit"
+
+def test_get_posts_etag_and_not_modified():
+    posts = [{"id": "t3_1", "subreddit": "python", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": 1}]
+    etag = ListingService.etag({"posts": posts}, 10)
+    with patch("main.ListingService.get_cached_body", return_value=None), \
+         patch("main.ListingService.get_listing", return_value=(posts, "api", "miss", etag)):
+        first = client.get("/posts/python")
+        assert first.headers["etag"] == etag
+        revalidated = client.get("/posts/python", headers={"If-None-Match": etag})
+
+    assert first.status_code == 200 and first.json()["posts"] == posts
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+
+    # O corpo pronto do cache carrega o mesmo ETag
+    stored = ResponseCache.encode({"posts": posts, "origin": "cache", "cache_status": "hit"}, etag)
+    with patch("main.ListingService.get_cached_body", return_value=stored):
+        assert client.get("/posts/python", headers={"If-None-Match": etag}).status_code == 304
+
+def test_trending_returns_rankings_and_503_when_unavailable():
+    post = {"id": "t3_1", "subreddit": "python", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": 10, "velocity": 120.5}
+    ranking = {"posts": [post], "authors": [{"author": "autor", "velocity": 120.5}]}
+    with patch("main.TrendingService.top", return_value=ranking) as mock_top:
+        response = client.get("/trending?limit=5")
+    assert response.status_code == 200
+    assert response.json() == ranking
+    mock_top.assert_called_once_with(5)
+
+    with patch("main.TrendingService.top", side_effect=TrendingUnavailable("Redis indisponível")):
+        assert client.get("/trending").status_code == 503
+
+def test_open_circuit_returns_503_with_retry_after():
+    with patch("main.ListingService.get_cached_body", return_value=None), \
+         patch("main.ListingService.get_listing", side_effect=RedditUnavailableError(12.4)):
+        response = client.get("/posts/python")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "12"
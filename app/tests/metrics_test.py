@@ -0,0 +1,91 @@
+from fastapi.testclient import TestClient
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+from main import app
+from loggers.log_handler import ElasticsearchLogHandler
+from metrics.stats_collector import StatsCollector, COMPONENTS
+from metrics.instrumentation import Metrics, RequestTimings, Stage
+from services.rate_limit_governor import RateLimitGovernor, set_governor
+
+client = TestClient(app)
+
+POST = {"id": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": 1}
+
+def stage_count(stage: str, route: str, cache_status: str = "", upstream_status: str = "") -> float:
+    labels = {"stage": stage, "route": route, "cache_status": cache_status, "upstream_status": upstream_status}
+    return REGISTRY.get_sample_value("api_stage_duration_seconds_count", labels) or 0.0
+
+async def fake_search(**kwargs):
+    with Metrics.stage("es_search"):
+        pass
+    return [POST], None, "miss"
+
+def test_stage_outside_request_goes_to_background_route():
+    """Testa que etapas fora de uma requisição (indexador, revalidação) são observadas na rota 'background'."""
+    before = stage_count("es_index", "background")
+    with Metrics.stage("es_index"):
+        pass
+    assert stage_count("es_index", "background") == before + 1
+
+def test_request_stages_labelled_with_route_and_cache_status():
+    """Testa que as etapas de uma requisição são rotuladas com o template da rota e o status do cache."""
+    before = stage_count("es_search", "/search/posts", "miss")
+    requests_before = REGISTRY.get_sample_value(
+        "api_request_duration_seconds_count",
+        {"route": "/search/posts", "method": "GET", "status_code": "200", "cache_status": "miss"}
+    ) or 0.0
+
+    with patch("main.SearchService.search", side_effect=fake_search):
+        response = client.get("/search/posts?field=title&query=python")
+
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+    assert stage_count("es_search", "/search/posts", "miss") == before + 1
+    assert REGISTRY.get_sample_value(
+        "api_request_duration_seconds_count",
+        {"route": "/search/posts", "method": "GET", "status_code": "200", "cache_status": "miss"}
+    ) == requests_before + 1
+
+def test_server_timing_header():
+    """Testa o header Server-Timing opcional, com a soma e o número de ocorrências de cada etapa."""
+    with patch("metrics.instrumentation.SERVER_TIMING_ENABLED", True), \
+         patch("main.SearchService.search", side_effect=fake_search):
+        response = client.get("/search/posts?field=title&query=python")
+
+    entries = [entry.strip() for entry in response.headers["server-timing"].split(",")]
+    assert entries[0].startswith("es_search;dur=")
+    assert entries[-1].startswith("total;dur=")
+
+    timings = RequestTimings()
+    for duration in (0.001, 0.002):
+        stage = Stage("cache_get")
+        stage.duration = duration
+        timings.stages.append(stage)
+    assert timings.server_timing(0.01) == 'cache_get;dur=3.00;desc="x2", total;dur=10.00'
+
+def test_metrics_endpoint_exposes_histograms_and_service_stats():
+    """Testa que o /metrics expõe os histogramas e as estatísticas dos serviços, com as credenciais como rótulo."""
+    set_governor(RateLimitGovernor(["token_a"], capacity=10, window=60))
+    try:
+        response = client.get("/metrics")
+    finally:
+        set_governor(None)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "api_stage_duration_seconds_bucket" in body
+    assert "api_search_cache_hits " in body
+    assert "api_listing_single_flight_leaders " in body
+    assert 'api_rate_limit_credential_available{credential="credential_0"} 10.0' in body
+
+def test_log_handler_stats_are_exported():
+    """Testa que os contadores do handler de logs (enviados, descartados, com falha) aparecem no /metrics."""
+    handler = ElasticsearchLogHandler()
+    handler.shipped, handler.dropped, handler.failed = 7, 3, 2
+    with patch("metrics.stats_collector.get_es_log_handler", return_value=handler):
+        samples = {sample.name: sample.value for family in StatsCollector({"logs": COMPONENTS["logs"]}).collect() for sample in family.samples}
+    assert samples == {"api_logs_shipped": 7.0, "api_logs_dropped": 3.0, "api_logs_failed": 2.0, "api_logs_queued": 0.0}
+
+    with patch("metrics.stats_collector.get_es_log_handler", return_value=None):
+        assert list(StatsCollector({"logs": COMPONENTS["logs"]}).collect()) == []
@@ -0,0 +1,118 @@
+import asyncio
+import time
+import pytest
+import fakeredis
+from unittest.mock import patch
+from cache.cache_handler import CacheHandler
+from services.listing_service import ListingService
+from services.prewarm_scheduler import PrewarmScheduler, PrewarmKey, PREWARM_POPULARITY_KEY, PREWARM_LOCK_KEY
+
+POSTS = [{"id": "t3_1", "title": "Post", "author": "autor", "url": "https://reddit.com", "created_utc": 1700000000, "score": 10}]
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    CacheHandler.set_client(client)
+    ListingService.drain_popularity()
+    yield client
+    CacheHandler.set_client(None)
+
+async def seed(subreddit: str, sort_type: str, period: str, age: float) -> None:
+    key = ListingService.cache_key(subreddit, period, sort_type)
+    await CacheHandler.set_cache(key, {"posts": POSTS, "after": None, "fetched_at": time.time() - age})
+
+def test_configured_keys_parse_defaults_and_weights():
+    """Testa o formato de PREWARM_KEYS: ordenação/período opcionais, peso opcional e entradas inválidas ignoradas."""
+    keys = PrewarmScheduler.configured_keys("Python, django:top:week=5, :hot, a:b:c:d")
+
+    assert keys == {
+        PrewarmKey("python", "hot", "none"): 1.0,
+        PrewarmKey("django", "top", "week"): 5.0
+    }
+
+@pytest.mark.asyncio
+async def test_popularity_from_requests_orders_candidates(fake_redis):
+    """Testa que os acessos contados pelos workers viram pesos no Redis e ordenam as listagens do ciclo."""
+    await seed("python", "hot", "day", age=0)
+    await seed("django", "top", "week", age=0)
+    for _ in range(3):
+        await ListingService.get_posts("python")
+    await ListingService.get_posts("django", period="week", sort_type="top")
+    await PrewarmScheduler.flush_popularity()
+
+    with patch("services.prewarm_scheduler.PREWARM_KEYS", "rust=10"):
+        candidates = await PrewarmScheduler.candidates()
+
+    assert candidates == [
+        (PrewarmKey("rust", "hot", "none"), 10.0),
+        (PrewarmKey("python", "hot", "none"), 3.0),
+        (PrewarmKey("django", "top", "week"), 1.0)
+    ]
+
+    await CacheHandler.decay_scores(PREWARM_POPULARITY_KEY, 0.5)
+    assert await fake_redis.zscore(PREWARM_POPULARITY_KEY, "python:hot:none") == 1.5
+
+@pytest.mark.asyncio
+async def test_invalid_popularity_member_is_skipped(fake_redis):
+    """Testa que um membro inválido no ranking de popularidade é ignorado em vez de derrubar o ciclo."""
+    await fake_redis.zadd(PREWARM_POPULARITY_KEY, {"a:b:c:d": 50, "python:hot:none": 2})
+
+    with patch("services.prewarm_scheduler.PREWARM_KEYS", ""):
+        assert await PrewarmScheduler.candidates() == [(PrewarmKey("python", "hot", "none"), 2.0)]
+
+@pytest.mark.asyncio
+async def test_run_once_refreshes_only_due_keys_with_concurrency_cap(fake_redis):
+    """Testa que o ciclo busca apenas listagens ausentes ou perto de expirar, respeitando o limite de concorrência."""
+    await seed("fresh", "hot", "day", age=0)
+    await seed("old", "hot", "day", age=10_000)
+    in_flight, peak, fetched = [0], [0], []
+
+    async def fetch_page(**kwargs):
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.02)
+        in_flight[0] -= 1
+        fetched.append(kwargs["subreddit"])
+        return {"posts": POSTS, "after": None}
+
+    with patch("services.prewarm_scheduler.PREWARM_KEYS", "fresh,old,missing1,missing2,missing3"), \
+         patch("services.prewarm_scheduler.PREWARM_CONCURRENCY", 2), \
+         patch("services.prewarm_scheduler.get_governor") as get_governor, \
+         patch("services.listing_service.RedditService.fetch_page", side_effect=fetch_page):
+        get_governor.return_value.budget_fraction.return_value = 1.0
+        refreshed = await PrewarmScheduler.run_once()
+
+    assert refreshed == 4
+    assert sorted(fetched) == ["missing1", "missing2", "missing3", "old"]
+    assert peak[0] == 2
+    entry = await CacheHandler.get_cache(ListingService.cache_key("old", "day", "hot"))
+    assert time.time() - entry["fetched_at"] < 5
+
+@pytest.mark.asyncio
+async def test_run_once_stops_when_budget_share_is_used(fake_redis):
+    """Testa que o pré-aquecimento não consome o orçamento de requisições reservado aos usuários."""
+    with patch("services.prewarm_scheduler.PREWARM_KEYS", "python,django"), \
+         patch("services.prewarm_scheduler.get_governor") as get_governor, \
+         patch("services.listing_service.RedditService.fetch_page") as fetch_page:
+        get_governor.return_value.budget_fraction.return_value = 0.5
+        refreshed = await PrewarmScheduler.run_once()
+
+    assert refreshed == 0
+    fetch_page.assert_not_called()
+    assert PrewarmScheduler.stats()["skipped_budget"] >= 2
+
+@pytest.mark.asyncio
+async def test_cycle_lock_is_renewed_while_refreshes_run(fake_redis):
+    """Testa que um ciclo mais longo que o TTL do lock continua exclusivo: o lock é renovado até o ciclo terminar."""
+    async def slow_cycle():
+        await asyncio.sleep(0.5)
+        assert await CacheHandler.acquire_lock(PREWARM_LOCK_KEY, 300) is None
+        return 0
+
+    token = await CacheHandler.acquire_lock(PREWARM_LOCK_KEY, 300)
+    with patch("services.prewarm_scheduler.PrewarmScheduler.run_once", side_effect=slow_cycle):
+        await PrewarmScheduler._run_locked(token, 300)
+
+    assert await fake_redis.get(PREWARM_LOCK_KEY) == token
+    assert not await CacheHandler.extend_lock(PREWARM_LOCK_KEY, "outro", 300)
+    assert PrewarmScheduler.stats()["lock_lost"] == 0
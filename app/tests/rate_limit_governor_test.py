@@ -0,0 +1,84 @@
+import httpx
+import pytest
+from unittest.mock import patch
+from services.http_client import RedditHttpClient
+from services.rate_limit_governor import RateLimitGovernor, RateLimitExceeded, set_governor
+from services.reddit_service import RedditService, RedditRateLimitError
+
+class FakeReddit:
+    """Reddit simulado que aplica um limite de requisições por token, como a API real."""
+    def __init__(self, limit: int, reset: float = 60):
+        self.limit = limit
+        self.reset = reset
+        self.used = {}
+        self.rejected = 0
+
+    def handler(self, request: httpx.Request) -> httpx.Response:
+        token = request.headers["Authorization"].removeprefix("Bearer ")
+        self.used[token] = self.used.get(token, 0) + 1
+        remaining = self.limit - self.used[token]
+        headers = {
+            "X-Ratelimit-Used": str(self.used[token]),
+            "X-Ratelimit-Remaining": str(max(remaining, 0)),
+            "X-Ratelimit-Reset": str(self.reset)
+        }
+        if remaining < 0:
+            self.rejected += 1
+            return httpx.Response(429, headers=headers)
+        listing = {"data": {"children": [{"data": {"name": "t3_1", "title": "Post", "score": 1}}], "after": None}}
+        return httpx.Response(200, json=listing, headers=headers)
+
+@pytest.fixture
+def fake_reddit():
+    reddit = FakeReddit(limit=5)
+    RedditHttpClient.set_client(httpx.AsyncClient(transport=httpx.MockTransport(reddit.handler)))
+    with patch("services.reddit_service.PostIndexer.enqueue"):
+        yield reddit
+    RedditHttpClient.set_client(None)
+    set_governor(None)
+
+@pytest.mark.asyncio
+async def test_requests_are_spread_across_credentials(fake_reddit):
+    """Testa que o governor reveza as credenciais do pool e descarta chamadas antes de gerar 429."""
+    governor = RateLimitGovernor(["a", "b"], capacity=100, window=60, max_wait=0)
+    set_governor(governor)
+
+    # Com a reserva padrão de 2 requisições, cada token (limite 5) atende 3 e o resto é descartado
+    served = 0
+    with pytest.raises(RedditRateLimitError):
+        for _ in range(20):
+            await RedditService.fetch_posts("python")
+            served += 1
+
+    assert fake_reddit.rejected == 0
+    assert fake_reddit.used["a"] == fake_reddit.used["b"]
+    assert served == sum(fake_reddit.used.values()) == 6
+    stats = governor.stats()
+    assert stats["shed"] == 1
+    assert stats["credentials"]["credential_0"]["remaining"] == 2
+
+@pytest.mark.asyncio
+async def test_local_bucket_queues_until_refill():
+    """Testa que, sem orçamento, a chamada espera a reposição do bucket em vez de falhar."""
+    governor = RateLimitGovernor(["a"], capacity=1, window=0.05, max_wait=1)
+    await governor.acquire()
+    credential = await governor.acquire()
+
+    assert credential.requests == 2
+    assert governor.stats()["queued"] == 0
+
+    with pytest.raises(RateLimitExceeded):
+        await governor.acquire(max_wait=0)
+
+@pytest.mark.asyncio
+async def test_429_pauses_credential_until_reset():
+    """Testa que um 429 do Reddit tira a credencial de uso até o reset informado."""
+    governor = RateLimitGovernor(["a", "b"], capacity=100, window=60, max_wait=0)
+    credential = await governor.acquire("a")
+    governor.record_response(credential, 429, {"X-Ratelimit-Reset": "30"})
+
+    for _ in range(3):
+        assert (await governor.acquire()).token == "b"
+    with pytest.raises(RateLimitExceeded):
+        await governor.acquire("a")
+    assert governor.stats()["credentials"]["credential_0"]["throttled"] == 1
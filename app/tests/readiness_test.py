@@ -0,0 +1,100 @@
+import asyncio
+import time
+import pytest
+import fakeredis
+from unittest.mock import patch
+from cache.cache_handler import CacheHandler
+from fastapi.testclient import TestClient
+from main import app
+from services.readiness import Readiness, CHECKS, ES_BOOTSTRAP_LOCK_KEY
+
+client = TestClient(app)
+
+def flaky_check(failures: int, delay: float = 0.0):
+    """Verificação que falha `failures` vezes antes de responder."""
+    calls = []
+
+    async def check():
+        calls.append(time.monotonic())
+        if delay:
+            await asyncio.sleep(delay)
+        return len(calls) > failures
+    return check, calls
+
+@pytest.mark.asyncio
+async def test_wait_for_retries_with_exponential_backoff():
+    """Testa que a espera repete a verificação com intervalos crescentes até a dependência responder."""
+    check, calls = flaky_check(failures=3)
+    with patch.dict(CHECKS, {"elasticsearch": check}), patch("services.readiness.random.uniform", return_value=1.0):
+        assert await Readiness.wait_for("elasticsearch", timeout=5, initial_delay=0.01, max_delay=1)
+
+    assert len(calls) == 4
+    gaps = [after - before for before, after in zip(calls, calls[1:])]
+    assert gaps[0] < gaps[1] < gaps[2]
+
+@pytest.mark.asyncio
+async def test_wait_for_gives_up_after_timeout():
+    """Testa que a espera desiste após o tempo limite quando a dependência não responde."""
+    check, calls = flaky_check(failures=1000)
+    with patch.dict(CHECKS, {"kibana": check}):
+        start = time.monotonic()
+        assert not await Readiness.wait_for("kibana", timeout=0.1, initial_delay=0.01, max_delay=0.02)
+    assert time.monotonic() - start < 0.5
+    assert len(calls) > 1
+
+@pytest.mark.asyncio
+async def test_wait_for_all_runs_checks_concurrently():
+    """Testa que as dependências são esperadas em paralelo: o tempo total é o da mais lenta."""
+    redis_check, _ = flaky_check(failures=0, delay=0.2)
+    es_check, _ = flaky_check(failures=0, delay=0.2)
+    with patch.dict(CHECKS, {"redis": redis_check, "elasticsearch": es_check}):
+        start = time.monotonic()
+        ready = await Readiness.wait_for_all(["redis", "elasticsearch"], timeout=1)
+
+    assert ready == {"redis": True, "elasticsearch": True}
+    assert time.monotonic() - start < 0.35
+
+@pytest.mark.asyncio
+async def test_check_timeout_counts_as_unavailable():
+    """Testa que uma verificação que não responde dentro do tempo limite conta como indisponível."""
+    slow_check, _ = flaky_check(failures=0, delay=1)
+    with patch.dict(CHECKS, {"elasticsearch": slow_check}):
+        assert not await Readiness.check("elasticsearch", timeout=0.05)
+
+def test_healthz_and_readyz():
+    """Testa que o /healthz não depende de nada e o /readyz só falha pelas dependências obrigatórias."""
+    async def up():
+        return True
+
+    async def down():
+        return False
+
+    assert client.get("/healthz").json() == {"status": "ok"}
+
+    with patch.dict(CHECKS, {"redis": up, "elasticsearch": down}):
+        response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["checks"] == {"redis": "ok", "elasticsearch": "unavailable"}
+
+    with patch.dict(CHECKS, {"redis": down, "elasticsearch": up}):
+        response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.json()["ready"] is False
+
+@pytest.mark.asyncio
+async def test_bootstrap_indices_runs_once_across_workers():
+    """Testa que, com vários workers subindo juntos, só um aplica os templates e cria os índices."""
+    CacheHandler.set_client(fakeredis.FakeAsyncRedis(decode_responses=True))
+    try:
+        with patch("services.readiness.ElasticsearchService.create_index_if_not_exists") as create:
+            results = await asyncio.gather(*[Readiness.bootstrap_indices() for _ in range(4)])
+        assert sorted(results) == [False, False, False, True]
+        create.assert_called_once()
+
+        # Uma falha libera o lock para o próximo worker tentar de novo
+        await CacheHandler.get_client().delete(ES_BOOTSTRAP_LOCK_KEY)
+        with patch("services.readiness.ElasticsearchService.create_index_if_not_exists", side_effect=RuntimeError("es")):
+            assert await Readiness.bootstrap_indices() is False
+        assert await CacheHandler.get_client().get(ES_BOOTSTRAP_LOCK_KEY) is None
+    finally:
+        CacheHandler.set_client(None)
@@ -0,0 +1,55 @@
+import json
+import httpx
+import pytest
+from benchmarks import parser_bench
+from services.http_client import RedditHttpClient
+from services.rate_limit_governor import RateLimitGovernor, set_governor
+from services.reddit_parser import parse_listing, InvalidListing
+from services.reddit_service import RedditService, RedditAPIError
+
+def test_lean_parser_matches_full_tree_on_recorded_listing():
+    """Testa que o decoder enxuto produz os mesmos posts que a árvore JSON completa no fixture de 100 posts."""
+    body = parser_bench.load_fixture()
+    lean = parser_bench.parse_lean(body)
+
+    assert len(lean) == 100
+    assert lean == parser_bench.parse_full_tree(body)
+    assert parse_listing(body).after == lean[-1]["id"]
+
+def test_missing_and_null_fields_use_defaults():
+    """Testa os valores padrão para campos ausentes ou nulos e a tolerância a score enviado como float."""
+    body = json.dumps({"data": {"children": [
+        {"kind": "t3", "data": {"id": "abc", "title": None, "score": 12.0, "created_utc": 1700000000.5, "preview": {"images": []}}}
+    ]}}).encode()
+
+    [post] = [record.to_post("python") for record in parse_listing(body).posts]
+    assert post == {"id": "t3_abc", "subreddit": "python", "title": "", "author": "", "url": "", "created_utc": 1700000000, "score": 12}
+    assert parse_listing(b'{"data": {"children": []}}').after is None
+
+def test_records_without_name_or_id_are_skipped():
+    """Testa que registros sem `name` nem `id` são descartados em vez de virarem posts com o id "t3_"."""
+    body = json.dumps({"data": {"children": [
+        {"kind": "t3", "data": {"title": "sem id"}},
+        {"kind": "t3", "data": {"name": None, "id": None, "title": "nulos"}},
+        {"kind": "t3", "data": {"name": "t3_abc", "title": "ok"}}
+    ]}}).encode()
+
+    assert [record.to_post("python")["id"] for record in parse_listing(body).posts] == ["t3_abc"]
+
+@pytest.mark.parametrize("body", [b"<html>erro</html>", b'{"data": {"children": {"x": 1}}}'])
+def test_invalid_listing_raises(body):
+    with pytest.raises(InvalidListing):
+        parse_listing(body)
+
+@pytest.mark.asyncio
+async def test_invalid_listing_becomes_reddit_api_error():
+    """Testa que um corpo que não é listagem vira RedditAPIError (502) em vez de erro interno."""
+    RedditHttpClient.set_client(httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text="<html>"))))
+    set_governor(RateLimitGovernor(["token"]))
+    try:
+        with pytest.raises(RedditAPIError) as error:
+            await RedditService.fetch_page("python")
+        assert error.value.status_code == 502
+    finally:
+        RedditHttpClient.set_client(None)
+        set_governor(None)
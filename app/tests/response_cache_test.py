@@ -0,0 +1,84 @@
+import gzip
+import json
+import pytest
+import fakeredis
+from unittest.mock import patch
+from cache.cache_handler import CacheHandler
+from cache.response_cache import ResponseCache
+from services.indexing_service import PostIndexer
+from services.listing_service import ListingService
+
+POSTS = [{"id": f"t3_{n}", "title": "Post " * 20, "author": "autor", "url": "https://reddit.com", "created_utc": 1700000000, "score": n} for n in range(20)]
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    CacheHandler.set_client(client)
+    yield client
+    CacheHandler.set_client(None)
+
+def test_small_bodies_are_not_compressed():
+    """Testa que corpos pequenos são guardados crus e os grandes com gzip."""
+    small = ResponseCache.encode({"posts": []})
+    large = ResponseCache.encode({"posts": POSTS})
+
+    assert small[:1] == b"r" and json.loads(small[1:]) == {"posts": []}
+    assert large[:1] == b"g" and json.loads(gzip.decompress(large[1:])) == {"posts": POSTS}
+
+def test_gzip_negotiation():
+    """Testa a negociação do Accept-Encoding: gzip só para quem aceita, inclusive com q-values."""
+    stored = ResponseCache.encode({"posts": POSTS})
+
+    assert ResponseCache.accepts_gzip("br, gzip;q=0.8")
+    assert ResponseCache.accepts_gzip("*")
+    assert not ResponseCache.accepts_gzip("gzip;q=0")
+    assert not ResponseCache.accepts_gzip(None)
+
+    compressed = ResponseCache.response(stored, "gzip, deflate")
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    plain = ResponseCache.response(stored, "identity")
+    assert "content-encoding" not in plain.headers
+    assert json.loads(plain.body) == {"posts": POSTS}
+
+@pytest.mark.asyncio
+async def test_get_posts_stores_ready_body_for_next_hit(fake_redis):
+    """Testa que um miss grava o corpo pronto da resposta, servido nas chamadas seguintes sem passar pela listagem."""
+    digests = [PostIndexer.content_hash(post) for post in POSTS]
+
+    async def fetch_page(**kwargs):
+        return {"posts": POSTS, "after": None, "digests": digests}
+
+    with patch("services.listing_service.RedditService.fetch_page", side_effect=fetch_page):
+        assert await ListingService.get_cached_body("python", limit=5) is None
+        _, _, _, etag = await ListingService.get_listing("python", limit=5)
+
+    # Também a partir do Redis, sem o L1 do processo
+    with patch("cache.cache_handler.CACHE_L1_ENABLED", False):
+        stored = await ListingService.get_cached_body("Python", limit=5)
+    body = json.loads(ResponseCache.response(stored, "identity").body)
+    assert body == {"posts": POSTS[:5], "origin": "cache", "cache_status": "hit"}
+    assert await ListingService.get_cached_body("python", limit=6) is None
+    # O ETag vem dos digests calculados na busca, guardados na entrada canônica
+    assert ResponseCache.split_etag(stored)[0] == etag == ResponseCache.digest_etag(digests[:5])
+    entry = await CacheHandler.get_cache(ListingService.cache_key("python", "day", "hot"))
+    assert entry["digests"] == digests
+
+def test_etag_is_stored_with_body_and_answers_304():
+    """Testa que o ETag guardado junto do corpo vira header e que um If-None-Match igual recebe 304 sem corpo."""
+    etag = ListingService.etag({"posts": POSTS}, 5)
+    stored = ResponseCache.encode({"posts": POSTS[:5]}, etag)
+
+    assert ResponseCache.split_etag(stored)[0] == etag
+    # Valores gravados antes do ETag continuam válidos
+    assert ResponseCache.split_etag(ResponseCache.encode({"posts": []})) == (None, ResponseCache.encode({"posts": []}))
+
+    fresh = ResponseCache.response(stored, "gzip")
+    assert fresh.status_code == 200 and fresh.headers["etag"] == etag
+    assert "must-revalidate" in fresh.headers["cache-control"]
+
+    assert ResponseCache.response(stored, "gzip", if_none_match=f'"other", {etag}').status_code == 304
+    assert ResponseCache.response(stored, "gzip", if_none_match=etag.removeprefix("W/")).status_code == 304
+    assert ResponseCache.response(stored, "gzip", if_none_match="*").body == b""
+    assert ResponseCache.response(stored, "gzip", if_none_match='W/"other"').status_code == 200
+    assert ListingService.etag({"posts": POSTS}, 5) != ListingService.etag({"posts": POSTS}, 6)
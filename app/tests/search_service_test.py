@@ -0,0 +1,64 @@
+import pytest
+import fakeredis
+from unittest.mock import patch
+from cache.cache_handler import CacheHandler
+from services import search_service
+from services.search_service import SearchService
+from services.indexing_service import PostIndexer
+
+RESULTS = [{"id": "t3_1", "title": "Post"}]
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    CacheHandler.set_client(client)
+    for counter in search_service._stats:
+        search_service._stats[counter] = 0
+    yield client
+    CacheHandler.set_client(None)
+
+def test_equivalent_searches_share_a_key():
+    """Testa que ordem dos campos, espaços e caixa da consulta não mudam a chave do cache."""
+    first = SearchService.normalize(fields=["title", "author"], query="  Python  Async ", size=10, sort="score", score_min=None)
+    second = SearchService.normalize(fields=["author", "title"], query="python async", size=10, sort="score")
+    other_page = SearchService.normalize(fields=["author", "title"], query="python async", size=10, sort="score", cursor="abc")
+
+    assert SearchService.cache_key(first) == SearchService.cache_key(second)
+    assert SearchService.cache_key(first) != SearchService.cache_key(other_page)
+
+@pytest.mark.asyncio
+async def test_cached_results_until_generation_bump(fake_redis):
+    """Testa que a busca é servida do cache até o indexador incrementar a geração do índice."""
+    with patch("services.search_service.ElasticsearchService.search_posts", return_value=(RESULTS, "cursor")) as search:
+        assert await SearchService.search(fields=["title"], query="python") == (RESULTS, "cursor", "miss")
+        assert await SearchService.search(fields=["title"], query="Python") == (RESULTS, "cursor", "hit")
+        assert search.call_count == 1
+
+        await SearchService.bump_generation()
+        assert (await SearchService.search(fields=["title"], query="python"))[2] == "miss"
+        assert search.call_count == 2
+
+    stats = SearchService.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["invalidated"] == 1
+    assert stats["hit_ratio"] == pytest.approx(1 / 3, abs=1e-4)
+
+@pytest.mark.asyncio
+async def test_bypass_skips_cached_entry_but_refreshes_it(fake_redis):
+    """Testa que o bypass consulta o Elasticsearch mesmo com entrada válida e regrava o resultado."""
+    with patch("services.search_service.ElasticsearchService.search_posts", return_value=(RESULTS, None)) as search:
+        await SearchService.search(fields=["title"], query="python")
+        assert (await SearchService.search(bypass=True, fields=["title"], query="python"))[2] == "bypass"
+        assert (await SearchService.search(fields=["title"], query="python"))[2] == "hit"
+
+    assert search.call_count == 2
+    assert SearchService.stats()["bypassed"] == 1
+
+@pytest.mark.asyncio
+async def test_indexer_bumps_generation_after_bulk_write(fake_redis):
+    """Testa que uma gravação em lote bem-sucedida incrementa a geração usada pelo cache da busca."""
+    with patch("services.indexing_service.ElasticsearchService.bulk_index_posts", return_value={"items": [{"index": {}}]}), \
+         patch("services.indexing_service.INDEXER_REFRESH_DELAY", 0):
+        await PostIndexer._index_batch([({"id": "t3_1"}, "digest")])
+        await PostIndexer._bump_after_refresh()
+
+    assert await fake_redis.get(search_service.SEARCH_GENERATION_KEY) == "2"
@@ -0,0 +1,31 @@
+import fakeredis
+import httpx
+from server import ProductionUvicornWorker, reset_worker_state
+from cache.cache_handler import CacheHandler
+from services.http_client import RedditHttpClient
+from services.rate_limit_governor import get_governor, set_governor, REDDIT_RATELIMIT_REQUESTS
+
+def test_worker_uses_uvloop_and_httptools():
+    """Testa que o worker de produção fixa o uvloop e o httptools, com drenagem das requisições no shutdown."""
+    assert ProductionUvicornWorker.CONFIG_KWARGS["loop"] == "uvloop"
+    assert ProductionUvicornWorker.CONFIG_KWARGS["http"] == "httptools"
+    assert ProductionUvicornWorker.CONFIG_KWARGS["timeout_graceful_shutdown"] > 0
+
+def test_reset_worker_state_discards_inherited_clients_and_splits_budget():
+    """Testa que o estado herdado do master é descartado após o fork e o orçamento do Reddit é dividido entre os workers."""
+    inherited_redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    inherited_http = httpx.AsyncClient()
+    CacheHandler.set_client(inherited_redis)
+    RedditHttpClient.set_client(inherited_http)
+    set_governor(None)
+
+    try:
+        reset_worker_state(workers=4)
+
+        assert CacheHandler.get_client() is not inherited_redis
+        assert RedditHttpClient.get_client() is not inherited_http
+        assert get_governor().capacity == REDDIT_RATELIMIT_REQUESTS / 4
+    finally:
+        CacheHandler.set_client(None)
+        RedditHttpClient.set_client(None)
+        set_governor(None)
@@ -0,0 +1,131 @@
+import time
+import httpx
+import pytest
+import pytest_asyncio
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+from main import app
+from services.snapshot_store import (
+    SnapshotStore, SqliteSnapshotBackend, PostgresSnapshotBackend, partition_bounds, partition_name, build_backend
+)
+
+def posts(score: int, count: int = 3):
+    return [
+        {"id": f"t3_{n}", "subreddit": "python", "title": f"Post {n}", "author": "autor", "url": "https://reddit.com", "created_utc": 1, "score": score + n}
+        for n in range(count)
+    ]
+
+@pytest_asyncio.fixture
+async def store():
+    backend = SqliteSnapshotBackend(":memory:")
+    await backend.connect()
+    SnapshotStore.set_backend(backend)
+    yield backend
+    await SnapshotStore.shutdown()
+    SnapshotStore.set_backend(None)
+
+@pytest.mark.asyncio
+async def test_record_writes_snapshots_in_background_batches(store):
+    """Testa que as listagens viram snapshots gravados em lote, com a chave (post, instante) deduplicada."""
+    now = time.time()
+    SnapshotStore.record(posts(10), fetched_at=now - 120)
+    SnapshotStore.record(posts(10), fetched_at=now - 120)
+    SnapshotStore.record(posts(20), fetched_at=now - 60)
+    SnapshotStore.record(posts(30), fetched_at=now)
+    await SnapshotStore.flush()
+
+    history = await SnapshotStore.history("t3_1")
+    assert [point["score"] for point in history["history"]] == [11, 21, 31]
+    assert history["title"] == "Post 1" and history["subreddit"] == "python"
+    assert SnapshotStore.stats()["written"] == 12
+
+@pytest.mark.asyncio
+async def test_history_window_bucket_and_limit(store):
+    """Testa o período consultado, a agregação por intervalo (maior score) e o limite dos pontos mais recentes."""
+    base = 1_700_000_000
+    for offset, score in [(0, 5), (600, 7), (3600, 9), (4200, 4), (7200, 12)]:
+        await store.write([("t3_x", base + offset, "python", "Post", "autor", "url", 1, score)])
+
+    everything = await SnapshotStore.history("t3_x", since=base, until=base + 10_000)
+    assert [point["score"] for point in everything["history"]] == [5, 7, 9, 4, 12]
+
+    hourly = await SnapshotStore.history("t3_x", since=base, until=base + 10_000, bucket=3600)
+    assert [(point["snapshot_utc"], point["score"]) for point in hourly["history"]] == [
+        (base // 3600 * 3600, 7), (base // 3600 * 3600 + 3600, 9), (base // 3600 * 3600 + 7200, 12)
+    ]
+
+    latest = await SnapshotStore.history("t3_x", since=base, until=base + 10_000, limit=2)
+    assert [point["score"] for point in latest["history"]] == [4, 12]
+
+    assert await SnapshotStore.history("t3_x", since=base + 20_000, until=base + 30_000) is None
+
+def test_daily_partitions():
+    """Testa o nome e os limites (UTC) da partição diária de um instante."""
+    start, end = partition_bounds(datetime(2026, 10, 18, 23, 59, tzinfo=timezone.utc).timestamp())
+    assert start == datetime(2026, 10, 18, tzinfo=timezone.utc)
+    assert end == datetime(2026, 10, 19, tzinfo=timezone.utc)
+    assert partition_name(start) == "post_snapshots_p20261018"
+    assert isinstance(build_backend("sqlite:///:memory:"), SqliteSnapshotBackend)
+    assert isinstance(build_backend("postgresql://user:pass@db:5432/app"), PostgresSnapshotBackend)
+
+@pytest.mark.asyncio
+async def test_postgres_write_copies_into_staging_and_creates_partitions_once():
+    """Testa que o lote vai por COPY para a tabela temporária e as partições só são criadas uma vez."""
+    conn = MagicMock()
+    conn.execute = AsyncMock()
+    conn.fetch = AsyncMock(return_value=[])
+    conn.copy_records_to_table = AsyncMock()
+    conn.transaction.return_value.__aenter__ = AsyncMock()
+    conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    backend = PostgresSnapshotBackend("postgresql://test")
+    backend.pool = MagicMock()
+    backend.pool.acquire.return_value.__aenter__ = AsyncMock(return_value=conn)
+    backend.pool.acquire.return_value.__aexit__ = AsyncMock(return_value=False)
+
+    day = datetime(2026, 10, 18, 12, tzinfo=timezone.utc).timestamp()
+    rows = [("t3_1", day, "python", "Post", "autor", "url", 1, 10), ("t3_1", day + 86400, "python", "Post", "autor", "url", 1, 20)]
+    await backend.write(rows)
+    await backend.write(rows)
+
+    statements = [call.args[0] for call in conn.execute.call_args_list]
+    partitions = [statement for statement in statements if "PARTITION OF" in statement]
+    assert len(partitions) == 2
+    assert any("post_snapshots_p20261018" in statement for statement in partitions)
+    assert conn.copy_records_to_table.call_count == 2
+    copied = conn.copy_records_to_table.call_args.kwargs["records"]
+    assert copied[0][0] == "t3_1" and copied[0][1] == datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+    assert sum("ON CONFLICT (post_id, snapshot_at) DO NOTHING" in statement for statement in statements) == 2
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("error", ["DuplicateTableError", "UniqueViolationError"])
+async def test_partition_created_concurrently_does_not_drop_batch(error):
+    """Testa que a corrida na criação da partição do dia (entre workers) não descarta o lote."""
+    import asyncpg
+    async def execute(statement, *args):
+        if "PARTITION OF" in statement:
+            raise getattr(asyncpg, error)("relação já existe")
+
+    conn = MagicMock()
+    conn.execute = AsyncMock(side_effect=execute)
+    backend = PostgresSnapshotBackend("postgresql://test")
+
+    day = datetime(2026, 10, 18, 12, tzinfo=timezone.utc).timestamp()
+    assert await backend._ensure_partitions(conn, [("t3_1", day, "python", "Post", "autor", "url", 1, 10)]) is False
+    assert backend.partitions == {"post_snapshots_p20261018"}
+
+@pytest.mark.asyncio
+async def test_history_endpoint(store):
+    """Testa a rota de histórico: 200 com os pontos, 404 sem snapshots e 503 com o histórico desabilitado."""
+    SnapshotStore.record(posts(10, count=1), fetched_at=time.time() - 60)
+    await SnapshotStore.flush()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        found = await client.get("/history/t3_0")
+        missing = await client.get("/history/t3_inexistente")
+        SnapshotStore.set_backend(None)
+        disabled = await client.get("/history/t3_0")
+
+    assert found.status_code == 200
+    assert found.json()["history"][0]["score"] == 10
+    assert missing.status_code == 404
+    assert disabled.status_code == 503
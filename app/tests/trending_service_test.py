@@ -0,0 +1,96 @@
+import pytest
+import fakeredis
+from unittest.mock import patch
+from cache.cache_handler import CacheHandler
+from services import trending_service
+from services.trending_service import TrendingService, TrendingUnavailable, SEEN_KEY, AUTHORS_KEY
+
+T0 = 1700000000.0
+
+def post(post_id: str, score: int, author: str = "autor") -> dict:
+    return {"id": post_id, "subreddit": "python", "title": f"Post {post_id}", "author": author,
+            "url": "https://reddit.com", "created_utc": 1, "score": score}
+
+@pytest.fixture
+def fake_redis():
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    CacheHandler.set_client(client)
+    trending_service._buffer.clear()
+    for counter in trending_service._stats:
+        trending_service._stats[counter] = 0
+    yield client
+    CacheHandler.set_client(None)
+
+async def observe(posts: list, at: float) -> int:
+    TrendingService.record(posts, fetched_at=at)
+    return await TrendingService.flush(now=at)
+
+@pytest.mark.asyncio
+async def test_velocity_ranks_posts_and_authors(fake_redis):
+    """Testa que a velocidade é o ganho de score por hora entre observações e que o autor soma a de seus posts."""
+    await observe([post("t3_1", 100), post("t3_2", 10), post("t3_3", 50, "outro")], T0)
+    assert (await TrendingService.top())["posts"] == []
+
+    # Abaixo do intervalo mínimo a base é mantida; depois dele, a velocidade é medida desde a primeira observação
+    assert await observe([post("t3_1", 150)], T0 + 30) == 0
+    updated = await observe([post("t3_1", 400), post("t3_2", 70), post("t3_3", 20, "outro")], T0 + 1800)
+    assert updated == 3
+
+    top = await TrendingService.top(limit=10)
+    assert [(item["id"], item["velocity"], item["score"]) for item in top["posts"]] == [("t3_1", 600.0, 400), ("t3_2", 120.0, 70)]
+    # Posts com score em queda ficam fora do ranking, e o autor deles também
+    assert top["authors"] == [{"author": "autor", "velocity": 720.0}]
+    assert TrendingService.stats()["updated"] == 3
+
+@pytest.mark.asyncio
+async def test_stale_and_excess_posts_are_forgotten(fake_redis):
+    """Testa que posts fora da janela ou acima do limite saem do ranking e descontam a velocidade do autor."""
+    await observe([post("t3_1", 0), post("t3_2", 0, "outro")], T0)
+    await observe([post("t3_1", 100), post("t3_2", 50, "outro")], T0 + 3600)
+
+    with patch("services.trending_service.TRENDING_WINDOW", 3599):
+        await observe([post("t3_2", 80, "outro")], T0 + 3600 * 2)
+
+    top = await TrendingService.top()
+    assert [item["id"] for item in top["posts"]] == ["t3_2"]
+    assert top["authors"] == [{"author": "outro", "velocity": 30.0}]
+
+    with patch("services.trending_service.TRENDING_MAX_POSTS", 1):
+        await observe([post("t3_9", 1)], T0 + 3600 * 3)
+    assert await fake_redis.zrange(SEEN_KEY, 0, -1) == ["t3_9"]
+    assert await fake_redis.zcard(AUTHORS_KEY) == 0
+
+@pytest.mark.asyncio
+async def test_buffer_keeps_latest_observation_and_is_bounded(fake_redis):
+    """Testa que o buffer guarda uma observação por post e descarta posts novos quando está cheio."""
+    with patch("services.trending_service.TRENDING_BUFFER_MAX", 2), \
+         patch("services.trending_service.TRENDING_FLUSH_INTERVAL", 3600):
+        TrendingService.record([post("t3_1", 1), post("t3_2", 2)])
+        TrendingService.record([post("t3_1", 5), post("t3_3", 3)])
+        stats = TrendingService.stats()
+        assert stats["buffered"] == 2 and stats["dropped"] == 1
+        assert trending_service._buffer["t3_1"][0] == 5
+        await TrendingService.shutdown()
+    assert TrendingService.stats()["buffered"] == 0
+    assert await fake_redis.zcard(SEEN_KEY) == 2
+
+@pytest.mark.asyncio
+async def test_top_raises_when_redis_is_unavailable(fake_redis):
+    with patch("services.trending_service.CacheHandler.is_available", return_value=False):
+        with pytest.raises(TrendingUnavailable):
+            await TrendingService.top()
+
+@pytest.mark.asyncio
+async def test_update_script_is_sent_by_sha_and_reloaded_after_script_flush(fake_redis):
+    """Testa que os envios usam EVALSHA (o script não trafega a cada lote) e sobrevivem a um SCRIPT FLUSH."""
+    with patch.object(fake_redis, "eval", wraps=fake_redis.eval) as full_eval, \
+         patch.object(fake_redis, "evalsha", wraps=fake_redis.evalsha) as by_sha:
+        await observe([post("t3_1", 10)], T0)
+        await observe([post("t3_1", 70)], T0 + 3600)
+        await fake_redis.script_flush()
+        await observe([post("t3_1", 130)], T0 + 7200)
+
+    full_eval.assert_not_called()
+    # Três envios; no primeiro e após o flush o Redis responde NOSCRIPT e o script é carregado e reenviado
+    assert by_sha.call_count == 5
+    assert (await TrendingService.top(1))["posts"][0]["velocity"] == pytest.approx(60.0)